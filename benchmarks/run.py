@@ -0,0 +1,160 @@
+"""
+Benchmark pylicenses on synthetic environments and a local pypi/github stand-in
+
+    $ python -m benchmarks.run --sizes 100,1000,5000 --output bench.json
+    $ python -m benchmarks.run --sizes 100,1000,5000 --compare bench.json
+
+Timings (wall and cpu seconds, best of --repeat) are written as JSON,
+together with the commit, so that runs can be compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from pylicenses.cache import LicenseCache
+from pylicenses.licensefiles import LicenseFileIndex
+from pylicenses.providers.condalocal import CondaProvider
+from pylicenses.providers.piplocal import PipProvider
+from pylicenses.providers.pypi import PyPiProvider
+from pylicenses.records import PackageRecord, PackageStore
+from pylicenses.report import write_license_trail
+
+from benchmarks.synthetic import make_site_packages, make_conda_env, package_names
+from benchmarks.upstream import UpstreamServer
+
+
+def timed(func, repeat=1):
+    """
+    return the tuple (result, wall, cpu) of the fastest of repeat calls of func
+    """
+    best = None
+    for i in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = func()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        if best is None or wall < best[1]:
+            best = result, wall, cpu
+    return best
+
+
+def bench_pip(prefix):
+    provider = PipProvider(license_index=LicenseFileIndex(), prefix=prefix)
+    return provider.get_packages_info(PackageStore())
+
+
+def bench_conda(prefix):
+    provider = CondaProvider(license_index=LicenseFileIndex(), conda_prefix=prefix)
+    return provider.get_packages_info(PackageStore())
+
+
+def bench_pypi(server, names, concurrency):
+    provider = PyPiProvider(cache=LicenseCache(':memory:'), concurrency=concurrency)
+    provider.PYPI_URL = provider.GITHUB_API_URL = server.url
+    return provider.get_packages_info({name: PackageRecord(name=name) for name in names})
+
+
+def bench_report(packages, dedup):
+    with tempfile.TemporaryFile('w') as fout:
+        write_license_trail(packages.items(), fout, dedup=dedup)
+        return fout.tell()
+
+
+def run(sizes, latency=0.005, rate_limit=5000, network_packages=200, concurrency=8, repeat=3):
+    """
+    run all benchmarks for every size
+
+    :return: list of result dicts (name, size, wall, cpu, packages)
+    """
+    results = []
+    server = UpstreamServer(latency=latency, rate_limit=rate_limit).start()
+    try:
+        for size in sizes:
+            root = tempfile.mkdtemp(prefix='pylicenses-bench-')
+            try:
+                pip_prefix = make_site_packages(os.path.join(root, 'venv'), size)
+                conda_prefix = make_conda_env(os.path.join(root, 'conda'), size)
+                network_names = package_names(min(size, network_packages))
+                packages = {}
+                benchmarks = [
+                    ('pip', lambda: bench_pip(pip_prefix), repeat),
+                    ('conda', lambda: bench_conda(conda_prefix), repeat),
+                    # the provider memoizes, every repetition would be the same
+                    ('pypi', lambda: bench_pypi(server, network_names, concurrency), 1),
+                    ('report', lambda: bench_report(packages['pip'], dedup=False), repeat),
+                    ('report-dedup', lambda: bench_report(packages['pip'], dedup=True), repeat),
+                ]
+                for name, func, times in benchmarks:
+                    result, wall, cpu = timed(func, repeat=times)
+                    packages[name] = result
+                    count = len(network_names) if name == 'pypi' else size
+                    results.append({'name': name, 'size': size, 'wall': wall, 'cpu': cpu,
+                                    'packages': count})
+                    print('{:>12} {:>6} packages {:8.3f}s wall {:8.3f}s cpu'.format(name, count, wall, cpu))
+            finally:
+                shutil.rmtree(root)
+    finally:
+        server.stop()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """
+    print the wall time ratio new/old of every benchmark in both runs
+    """
+    old_walls = {(r['name'], r['size']): r['wall'] for r in old['results']}
+    print('\n{:>12} {:>6} {:>9} {:>9} {:>7}'.format('benchmark', 'size', 'old', 'new', 'ratio'))
+    for r in new['results']:
+        old_wall = old_walls.get((r['name'], r['size']))
+        if old_wall:
+            print('{:>12} {:>6} {:9.3f} {:9.3f} {:7.2f}'.format(r['name'], r['size'], old_wall, r['wall'],
+                                                                 r['wall'] / old_wall))
+
+
+if __name__ == '__main__':
+    args = argparse.ArgumentParser(description='benchmark pylicenses')
+    args.add_argument('--sizes', default='100,1000',
+                      help='comma separated numbers of distributions, e.g. 100,1000,20000')
+    args.add_argument('--latency', type=float, default=0.005,
+                      help='seconds of latency of the pypi/github stand-in')
+    args.add_argument('--rate-limit', type=int, default=5000,
+                      help='github requests per minute of the stand-in')
+    args.add_argument('--network-packages', type=int, default=200,
+                      help='max number of packages resolved from the pypi/github stand-in')
+    args.add_argument('--concurrency', type=int, default=8,
+                      help='number of packages resolved in parallel from pypi/github')
+    args.add_argument('--repeat', type=int, default=3,
+                      help='number of repetitions, the fastest is reported')
+    args.add_argument('--output', help='write results as json to this file')
+    args.add_argument('--compare', metavar='FILE', help='compare to the json results in FILE')
+    options = args.parse_args()
+    results = run([int(size) for size in options.sizes.split(',')], latency=options.latency,
+                  rate_limit=options.rate_limit, network_packages=options.network_packages,
+                  concurrency=options.concurrency, repeat=options.repeat)
+    data = {
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'options': vars(options),
+        'results': results,
+    }
+    if options.output:
+        with open(options.output, 'w') as fout:
+            json.dump(data, fout, indent=2)
+    if options.compare:
+        with open(options.compare) as fin:
+            compare(json.load(fin), data)
@@ -0,0 +1,89 @@
+"""
+Synthetic site-packages and conda environments of configurable size
+"""
+import json
+import os
+import random
+
+from pylicenses.spdx import get_corpus
+
+# license names as found in package metadata, known to the corpus or not
+LICENSE_NAMES = ['MIT', 'BSD', 'BSD 3-Clause', 'Apache 2.0', 'GPLv3', 'LGPL-2.1', 'MPL-2.0', 'PSF',
+                 'ISC', 'Artistic-2.0', 'EPL-2.0', 'WTFPL']
+
+
+def license_text(i, name):
+    """
+    return a license text for package i, corpus texts with a varying copyright
+    """
+    corpus = get_corpus()
+    spdx_id = corpus.lookup(name) or 'MIT'
+    return 'Copyright (c) {} Author {}\n\n{}'.format(2000 + i % 20, i, corpus.text(spdx_id))
+
+
+def package_names(size, prefix='pkg'):
+    return ['{}{:05d}'.format(prefix, i) for i in range(size)]
+
+
+def make_site_packages(root, size, license_ratio=0.8, max_deps=4, seed=42):
+    """
+    create a prefix with a site-packages of size distributions
+
+    Every distribution has a METADATA file with a License and Requires-Dist
+    headers and a RECORD file. license_ratio of them include a LICENSE file.
+
+    :return: the prefix
+    """
+    rnd = random.Random(seed)
+    site_packages = os.path.join(root, 'lib', 'python3.6', 'site-packages')
+    names = package_names(size)
+    for i, name in enumerate(names):
+        distinfo = os.path.join(site_packages, '{}-1.{}.dist-info'.format(name, i % 10))
+        os.makedirs(distinfo)
+        license_name = LICENSE_NAMES[i % len(LICENSE_NAMES)]
+        deps = rnd.sample(names[i + 1:], min(max_deps, len(names) - i - 1)) if i % 3 else []
+        lines = ['Metadata-Version: 2.1', 'Name: ' + name, 'Version: 1.{}'.format(i % 10),
+                 'License: ' + license_name]
+        lines.extend('Requires-Dist: {} (>=1.0)'.format(dep) for dep in deps)
+        with open(os.path.join(distinfo, 'METADATA'), 'w') as fout:
+            fout.write('\n'.join(lines) + '\n\n' + 'description ' * 50)
+        record = ['{}/__init__.py,,'.format(name)]
+        if rnd.random() < license_ratio:
+            with open(os.path.join(distinfo, 'LICENSE'), 'w') as fout:
+                fout.write(license_text(i, license_name))
+            record.append('{}/LICENSE,,'.format(os.path.basename(distinfo)))
+        with open(os.path.join(distinfo, 'RECORD'), 'w') as fout:
+            fout.write('\n'.join(record) + '\n')
+    return root
+
+
+def make_conda_env(root, size, license_ratio=0.8, seed=42):
+    """
+    create a conda root with size packages in pkgs and conda-meta
+
+    :return: the prefix
+    """
+    rnd = random.Random(seed)
+    conda_meta = os.path.join(root, 'conda-meta')
+    pkgs = os.path.join(root, 'pkgs')
+    os.makedirs(conda_meta)
+    names = package_names(size, prefix='cpkg')
+    for i, name in enumerate(names):
+        version, build = '1.{}'.format(i % 10), 'h{:07x}_0'.format(i)
+        dist_name = '{}-{}-{}'.format(name, version, build)
+        info = os.path.join(pkgs, dist_name, 'info')
+        os.makedirs(info)
+        license_name = LICENSE_NAMES[i % len(LICENSE_NAMES)]
+        with open(os.path.join(info, 'about.json'), 'w') as fout:
+            json.dump({'home': 'https://example.com/' + name, 'license': license_name}, fout)
+        if rnd.random() < license_ratio:
+            with open(os.path.join(info, 'LICENSE.txt'), 'w') as fout:
+                fout.write(license_text(i, license_name))
+        meta = {
+            'name': name, 'version': version, 'build': build, 'build_number': 0,
+            'license': license_name, 'depends': ['python >=3.6'] + names[i + 1:i + 3],
+            'extracted_package_dir': os.path.join(pkgs, dist_name),
+        }
+        with open(os.path.join(conda_meta, dist_name + '.json'), 'w') as fout:
+            json.dump(meta, fout)
+    return root
@@ -0,0 +1,106 @@
+"""
+A local stand-in for the pypi.org json and api.github.com license endpoints
+"""
+import base64
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import LICENSE_NAMES
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    """
+    serve /pypi/<pkg>/json, /repos/<org>/<repo>/license and /licenses/<key>
+
+    Every other package's home page is a github repository. Responses are
+    delayed by server.latency seconds, github responses count against the
+    server.rate_limit per server.rate_window seconds.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        server.hits[self.path.split('/')[1]] += 1
+        parts = self.path.strip('/').split('/')
+        headers = {}
+        if parts[0] in ('repos', 'licenses'):
+            remaining, reset = server.take()
+            headers = {'X-RateLimit-Remaining': str(max(remaining, 0)), 'X-RateLimit-Reset': str(reset)}
+            if remaining < 0:
+                return self.respond(403, {'message': 'API rate limit exceeded'}, headers)
+        if parts[0] == 'pypi' and len(parts) == 3:
+            pkg = parts[1]
+            i = int(''.join(c for c in pkg if c.isdigit()) or 0)
+            home_page = 'https://github.com/org/' + pkg if i % 2 else 'https://example.com/' + pkg
+            body = {'info': {'author': 'someone', 'license': LICENSE_NAMES[i % len(LICENSE_NAMES)],
+                             'home_page': home_page}}
+        elif parts[0] == 'repos' and len(parts) == 4:
+            text = '{} license text'.format(parts[2])
+            body = {'content': base64.b64encode(text.encode('utf8')).decode('ascii'),
+                    'license': {'name': 'MIT License', 'spdx_id': 'MIT'}}
+        elif parts[0] == 'licenses' and len(parts) == 2:
+            body = {'body': '{} license text'.format(parts[1]),
+                    'html_url': 'https://choosealicense.com/licenses/{}/'.format(parts[1])}
+        else:
+            return self.respond(404, {'message': 'Not Found'}, headers)
+        self.respond(200, body, headers)
+
+    def respond(self, status, body, headers):
+        content = json.dumps(body).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class UpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, rate_limit=5000, rate_window=60.0):
+        """
+
+        :param latency: seconds to delay every response
+        :param rate_limit: github requests per rate_window
+        :param rate_window: seconds of the github rate limit window
+        """
+        super().__init__(('127.0.0.1', 0), UpstreamHandler)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.hits = Counter()
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._used = 0
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_port)
+
+    def take(self):
+        """
+        count a github request, return the tuple (remaining, reset time)
+        """
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.rate_window:
+                self._window_start, self._used = now, 0
+            self._used += 1
+            return self.rate_limit - self._used, self._window_start + self.rate_window
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -1,104 +1,389 @@
-from collections import defaultdict, Counter
+from collections import defaultdict
+from contextlib import ExitStack
 
-from pylicenses.providers.condachannel import CondaChannelProvider
-from pylicenses.providers.condalocal import CondaProvider
-from pylicenses.providers.piplocal import PipProvider
-from pylicenses.providers.pypi import PyPiProvider
-from pylicenses.providers.static import StaticProvider
+from pylicenses import profile
+
+from pylicenses.cache import LicenseCache
+from pylicenses.licensefiles import LicenseFileIndex
+from pylicenses.normalize import package_expression
+from pylicenses.pipeline import merge_stream, consume, LicenseStats
+from pylicenses.plugins import registry, BUILTIN_PROVIDERS
+from pylicenses.providers import normalize_subset, in_subset, canonical_name, iter_packages_info
+from pylicenses.records import PackageStore
+from pylicenses.scheduler import ProviderScheduler, is_resolved
+from pylicenses.spdx import get_matcher
+from pylicenses.state import ScanState
 
 version = '0.1'
 
 
+def __getattr__(name):
+    # provider classes are imported on first access, e.g. pylicenses.PipProvider
+    for spec in BUILTIN_PROVIDERS.values():
+        if spec.endswith(':' + name):
+            return registry.resolve(spec)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
 class PyLicenses(object):
     """
     Extensible dependencies license finder
     """
+    # provider names, 'module:Class' or classes, see pylicenses.plugins
     PROVIDERS = {
-        'primary': [PipProvider, CondaProvider],
-        'fallback': [StaticProvider,
-                     CondaChannelProvider,
-                     PyPiProvider,
+        'primary': ['pip', 'conda'],
+        'fallback': ['archive',
+                     'static',
+                     'condachannel',
+                     'pypi',
         ]
     }
+    # the kinds of providers that plugins are added to
+    PLUGIN_KINDS = ('primary', 'fallback')
 
-    def __init__(self, github_auth=None):
+    def __init__(self, github_auth=None, cache=None, concurrency=8, repodata=None, prefix=None,
+                 profiler=None, wheelhouse=None, policy=None, consumers=None):
         """
 
         :param github_auth: the tuple (user,password), defaults to None
+        :param cache: the LicenseCache shared by network providers, defaults
+           to a non-persistent in-memory cache
+        :param concurrency: the number of packages resolved in parallel by
+           network providers, defaults to 8
+        :param repodata: list of conda repodata.json files, directories or
+           channel urls, defaults to conda's pkgs/cache
+        :param prefix: the python or conda environment to scan, defaults to
+           the running interpreter's environment
+        :param profiler: the pylicenses.profile.Profiler to record timings and
+           counters of discovery into, defaults to None
+        :param wheelhouse: list of directories or files of wheel, sdist and
+           conda package archives to take licenses from, defaults to None
+        :param policy: the pylicenses.policy.Policy evaluated on packages as
+           soon as their license is known, defaults to None
+        :param consumers: list of callables called as consumer(pkg, data)
+           with each package once it is discovered, see pylicenses.pipeline
         """
-        # a pipeline of providers
-        # TODO unify all providers into one pipeline and use an n-pass strategy to execute
-        #      until no progress is made (progress = reduce #missing packages)
         self.github_auth = tuple(github_auth) if github_auth else None
-        self._packages = defaultdict(dict)
+        self.cache = cache or LicenseCache(':memory:')
+        self.concurrency = concurrency
+        self.repodata = repodata
+        self.prefix = prefix
+        self.conda_prefix = prefix
+        self.profiler = profiler
+        self.wheelhouse = wheelhouse
+        self.policy = policy
+        self.consumers = list(consumers or [])
+        # scanned license files, shared by local providers
+        self.license_index = LicenseFileIndex()
+        self._packages = PackageStore()
+        # names of the packages passed to the consumers
+        self._finalized = set()
+        self.scheduler = None
+        self.graph = None
         self.providers = defaultdict(list)
         # initialize providers, passing information
-        for kind, provs in PyLicenses.PROVIDERS.items():
+        for kind, provs in self.provider_classes().items():
             for provCls in provs:
                 kwargs = {
                     kwarg: getattr(self, kwarg) for kwarg in provCls.init_kwargs
                 }
                 self.providers[kind].append(provCls(**kwargs))
 
+    @classmethod
+    def provider_classes(cls):
+        """
+        return dict of kind => list of provider classes, including plugins
+        """
+        classes = {kind: [registry.resolve(prov) for prov in provs] for kind, provs in cls.PROVIDERS.items()}
+        for name, provCls in registry.plugin_classes() if cls.PLUGIN_KINDS else []:
+            kind = getattr(provCls, 'kind', 'fallback')
+            if kind in cls.PLUGIN_KINDS and provCls not in classes.setdefault(kind, []):
+                classes[kind].append(provCls)
+        return classes
+
     @property
     def packages(self):
         return self._packages
 
-    def discover(self, subset=None):
+    def discover(self, subset=None, closure=False):
         """
         return dict of all packages including license files
+
+        :param subset: the names of the packages to discover, defaults to all.
+           Providers look up only these packages, not the whole environment.
+        :param closure: if True, also discover the packages the subset
+           requires, recursively
+        """
+        subset = normalize_subset(subset)
+        with self.profiling():
+            # get packages and licenses dicts from primary providers, cheapest first
+            with profile.timed('phase', 'primary'):
+                if subset and closure:
+                    subset = self.discover_closure(subset)
+                else:
+                    self.discover_primary(subset=subset)
+            self.reset_finalized(subset)
+            # packages with license texts are done, pass them on before the fallback providers run
+            with profile.timed('phase', 'normalize'):
+                self.finalize_packages(subset=subset, resolved=True)
+            # resolve those with missing license files by fallback providers
+            with profile.timed('phase', 'fallback'):
+                on_update = self.policy.evaluate if self.policy is not None else None
+                self.scheduler = ProviderScheduler(self.providers['fallback'], on_update=on_update,
+                                                   on_resolved=self.finalize)
+                self.scheduler.run(self.missing_licenses(subset=subset))
+            with profile.timed('phase', 'normalize'):
+                self.finalize_packages(subset=subset)
+        return self
+
+    def discover_primary(self, subset=None):
+        """
+        get packages and licenses from the primary providers, cheapest first
+
+        The partial records the providers yield are merged into packages as
+        they arrive. The policy is evaluated on each, so that a denied
+        license fails before the next, possibly slower provider runs.
         """
-        # get packages and licenses dicts from primary providers
         packages = self._packages
-        for prov in self.providers['primary']:
-            prov.get_packages_info(packages, subset=subset)
-        # find those with missing license files
-        for prov in self.providers['fallback']:
-            missing = self.missing_licenses(subset=subset)
-            infos = prov.get_packages_info(missing)
-            for pkg, missing_data in infos.items():
-                if subset and not pkg in subset:
+        for prov in sorted(self.providers['primary'], key=lambda prov: prov.cost):
+            resolved = len(self.resolved_licenses(subset=subset)) if self.profiler else 0
+            with profile.timed('provider', type(prov).__name__):
+                stream = merge_stream(packages, iter_packages_info(prov, packages, subset=subset))
+                for pkg, data in stream:
+                    if self.policy is not None and in_subset(pkg, subset):
+                        self.policy.evaluate(pkg, data)
+            if self.profiler:
+                self.profiler.resolved(type(prov).__name__, len(packages),
+                                       len(self.resolved_licenses(subset=subset)) - resolved)
+        return self
+
+    def discover_closure(self, subset):
+        """
+        get packages and licenses of subset and the packages it requires
+
+        The primary providers are asked for the subset, then for the newly
+        required packages of what they found, until nothing new is required.
+        Extras are followed as well, a package requested with a new extra
+        has its requirements evaluated again.
+
+        :param subset: the normalized subset, see normalize_subset()
+        :return: the normalized subset including all required packages
+        """
+        from pylicenses.graph import marker_environment, required_packages
+
+        environment = marker_environment(self.prefix)
+        # canonical name => extras it is requested with, e.g. requests[socks]
+        extras = {canonical_name(name): {''} for name in subset}
+        discovered = set()
+        pending = set(extras)
+        while pending:
+            if pending - discovered:
+                self.discover_primary(subset=normalize_subset(pending - discovered))
+                discovered |= pending
+            required = {}
+            for pkg, data in self.packages.items():
+                node = canonical_name(pkg)
+                if pkg == data.get('name') and node in pending:
+                    for name, req_extras in required_packages(data, environment, extras[node]).items():
+                        required.setdefault(canonical_name(name), set()).update(req_extras)
+            # packages required for the first time or with new extras
+            pending = set()
+            for node, req_extras in required.items():
+                if not req_extras <= extras.setdefault(node, set()):
+                    extras[node] |= req_extras
+                    pending.add(node)
+        return subset | normalize_subset(list(extras))
+
+    def profiling(self):
+        """
+        return a context that activates the profiler, if any
+        """
+        return self.profiler.activate() if self.profiler else ExitStack()
+
+    def normalize_licenses(self, subset=None):
+        """
+        set license_expression of packages to the SPDX expression of their license
+
+        See pylicenses.normalize.package_expression()
+        """
+        subset = normalize_subset(subset)
+        for pkg, data in self.packages.items():
+            if in_subset(pkg, subset):
+                self.normalize_license(data)
+        return self
+
+    @staticmethod
+    def normalize_license(data):
+        expression = package_expression(data)
+        if expression:
+            data['license_expression'] = expression
+
+    def reset_finalized(self, subset=None):
+        """
+        discover the packages of subset as new, i.e. pass them to the consumers again
+        """
+        if subset is None:
+            self._finalized.clear()
+        else:
+            self._finalized = {name for name in self._finalized if not in_subset(name, subset)}
+
+    def finalize(self, pkg, data):
+        """
+        finish a package, it is not going to be changed by any provider
+
+        The package's license is normalized and the package is evaluated by
+        the policy and passed to the consumers, once.
+
+        :raises: PolicyViolation if the package is denied and the policy fails fast
+        """
+        name = data.get('name') or pkg
+        if name in self._finalized:
+            return
+        self._finalized.add(name)
+        self.normalize_license(data)
+        if self.policy is not None:
+            self.policy.evaluate(name, data, final=True)
+        consume(self.consumers, name, data)
+
+    def finalize_packages(self, subset=None, resolved=False):
+        """
+        finalize all packages not finalized yet, see finalize()
+
+        :param resolved: if True, only packages that have a license text
+        """
+        subset = normalize_subset(subset)
+        for pkg, data in self.packages.items():
+            if in_subset(pkg, subset) and (not resolved or is_resolved(data)):
+                self.finalize(pkg, data)
+        return self
+
+    def fingerprint(self):
+        """
+        return the fingerprints of all installed distributions
+
+        :return: dict of distribution key => (fingerprint, package name)
+        """
+        fingerprints = {}
+        for provs in self.providers.values():
+            for prov in provs:
+                fingerprints.update(prov.get_fingerprints())
+        return fingerprints
+
+    def watch_paths(self):
+        """
+        return the directories to watch for changes of installed distributions
+        """
+        paths = []
+        for provs in self.providers.values():
+            for prov in provs:
+                paths.extend(path for path in prov.get_watch_paths() if path not in paths)
+        return paths
+
+    def discover_incremental(self, state_path):
+        """
+        discover only packages that changed since the state was saved
+
+        The state file keeps the fingerprints of all installed distributions
+        and the packages found by the previous run. Packages of distributions
+        that were added or changed are discovered again, removed packages are
+        dropped, all other packages are taken from the previous run. The
+        state file is updated with the new results.
+
+        :param state_path: the path of the state file
+        :return: self
+        """
+        state = ScanState.load(state_path)
+        with self.profiling(), profile.timed('phase', 'fingerprint'):
+            fingerprints = self.fingerprint()
+        changed, removed = state.diff(fingerprints)
+        if not state.packages:
+            self.discover()
+        elif changed:
+            self.discover(subset=changed)
+        skip = normalize_subset(changed | removed) or frozenset()
+        packages = self._packages
+        for pkg, data in state.packages.items():
+            if pkg in skip or canonical_name(pkg) in skip:
+                continue
+            packages[pkg].update(data)
+            dist_name = data.get('dist_name')
+            if dist_name and dist_name != pkg:
+                if dist_name in packages:
+                    packages[dist_name].update(data)
+                else:
+                    packages[dist_name] = packages[pkg]
+        self.finalize_packages()
+        state.fingerprints = fingerprints
+        state.packages = {pkg: data for pkg, data in packages.items() if pkg == data.get('name')}
+        state.save(state_path)
+        return self
+
+    def classify_licenses(self, subset=None):
+        """
+        set license_spdx_id of packages by matching their license text
+
+        Only packages that have a license text but no license_spdx_id
+        are classified, against the bundled SPDX license corpus.
+        """
+        with self.profiling(), profile.timed('phase', 'classify'):
+            matcher = get_matcher()
+            for pkg, data in self.resolved_licenses(subset=subset).items():
+                if data.get('license_spdx_id'):
+                    continue
+                license_text = data.get('license_text')
+                if not license_text:
                     continue
-                data = packages.get(pkg)
-                data.update(missing_data) if infos else None
+                spdx_id, score = matcher.match(license_text)
+                if spdx_id:
+                    data['license_spdx_id'] = spdx_id
+                    if not data.get('license_expression'):
+                        data['license_expression'] = spdx_id
         return self
 
     def missing_licenses(self, subset=None):
+        subset = normalize_subset(subset)
         return {pkg: data for pkg, data in self.packages.items()
-                if (subset is None or pkg in subset)
-                and not any(data.get(k) for k in ('license_text', 'license_source'))
+                if in_subset(pkg, subset)
+                and not any(data.get(k) for k in ('license_source', 'license_text'))
                 }
 
     def resolved_licenses(self, subset=None):
+        subset = normalize_subset(subset)
         return {pkg: data for pkg, data in self.packages.items()
-                if (subset is None or pkg in subset)
+                if in_subset(pkg, subset)
                 and any(data.get(k) for k in ('license_source', 'license_text'))
                 }
 
     def get_license_stats(self):
-        c = Counter()
-        by_license = defaultdict(set)
-        for pkg, data in self.resolved_licenses().items():
-            name = data['name']
-            license = data.get('license_family') or data.get('license', 'unknown')
-            c[license] += 1
-            by_license[license].add(name)
-        return c, by_license
+        stats = LicenseStats()
+        for pkg, data in self.packages.items():
+            stats(pkg, data)
+        return stats.counts, stats.by_license
 
     def get_package_dependencies(self, pkg):
-        data = self.packages[pkg]
+        """
+        return the set of names directly required by a package, independent of markers
+        """
+        from pylicenses.graph import parse_requirement, requirement_specs
+
         depends = set()
-        if 'requires_dist' in data:
-            reqs = data['requires_dist']
-            for dist in reqs.split(';'):
-                dep_name = dist.split(' ')[0]
-                depends.add(dep_name) if dep_name else None
-        if 'depends' in data:
-            for dist in data['depends']:
-                dep_name = dist.split(' ')[0]
-                depends.add(dep_name) if dep_name else None
+        for spec in requirement_specs(self.packages[pkg]):
+            req = parse_requirement(spec)
+            depends.add(req[0]) if req else None
         return depends
 
+    def build_dependency_graph(self):
+        """
+        return the DependencyGraph of all packages
+
+        Requirement markers are evaluated against the scanned environment.
+        """
+        from pylicenses.graph import DependencyGraph, marker_environment
+
+        self.graph = DependencyGraph.from_packages(
+            self.packages, environment=marker_environment(self.prefix))
+        return self.graph
+
     def discover_package_dependencies(self):
         """
         for each package determine what required it, from package dependencies
@@ -111,20 +396,12 @@ class PyLicenses(object):
 
         :return: .packages is updated to contain the required_by key for each
            package. If required_by is an empty set the package was not required
-           by any (known) package.
-        """
-        packages = self.packages
-        requireds = defaultdict(set)
-        for pkg, data in packages.items():
-            requireds[pkg]  # ensure we have an empty set for every pkg
-            if pkg != data['name']:
-                # only use basic package names, not versioned
-                continue
-            for dep in self.get_package_dependencies(pkg):
-                requireds[dep].add(pkg)
-        for pkg, required_by in requireds.items():
-            if pkg in packages:
-                # only add to known packages
-                packages[pkg]['required_by'] = required_by
-                packages[pkg]['is_primary'] = not required_by
+           by any (known) package. The graph is available as .graph
+        """
+        graph = self.build_dependency_graph()
+        for pkg, data in self.packages.items():
+            name = data.get('name') or pkg
+            required_by = set(graph.dependents(name)) if canonical_name(name) in graph.index else set()
+            data['required_by'] = required_by
+            data['is_primary'] = not required_by
         return self
@@ -1,23 +1,104 @@
 import argparse
+import os
 
-from tabulate import tabulate
+from pylicenses import PyLicenses, profile
+from pylicenses.cache import LicenseCache, default_cache_dir
+from pylicenses.diff import diff_packages, write_diff_json
+from pylicenses.envs import MultiEnvLicenses, read_envs_file
+from pylicenses.lockfiles import LockfileLicenses
+from pylicenses.pipeline import LicenseStats
+from pylicenses.policy import Policy, PolicyViolation, DENY, REVIEW
+from pylicenses.profile import Profiler
+from pylicenses.report import FORMATS, write_reports
+from pylicenses.transport import Transport
 
-from pylicenses import PyLicenses
+DIFF_FILENAME = 'THIRDPARTY-LICENSES.diff.json'
 
 args = argparse.ArgumentParser()
 args.add_argument('--github',
                   help='specify github user,password')
 args.add_argument('--stats',
                   help='print statistics')
+args.add_argument('--cache-dir', default=default_cache_dir(),
+                  help='directory of the persistent pypi/github cache')
+args.add_argument('--no-cache', action='store_true',
+                  help='do not use the persistent cache')
+args.add_argument('--offline', action='store_true',
+                  help='do not access the network, serve from cache only')
+args.add_argument('--concurrency', type=int, default=8,
+                  help='number of packages resolved in parallel from pypi/github')
+args.add_argument('--timeout', type=float, default=30,
+                  help='seconds to wait for a pypi/github response')
+args.add_argument('--retries', type=int, default=3,
+                  help='number of retries of a failed pypi/github request')
+args.add_argument('--max-requests', type=int,
+                  help='stop accessing the network after this number of requests (per environment)')
+args.add_argument('--max-time', type=float,
+                  help='stop accessing the network after this number of seconds (per environment)')
+args.add_argument('--package', metavar='NAME', action='append',
+                  help='only discover this package instead of the whole environment (repeatable)')
+args.add_argument('--with-dependencies', action='store_true',
+                  help='with --package, also discover the packages it requires')
+args.add_argument('--serve', metavar='ADDRESS',
+                  help='run the license daemon on host:port or a Unix socket path, see pylicenses.client')
+args.add_argument('--watch-interval', type=float, default=5,
+                  help='with --serve, seconds between checks for changed packages, 0 to not watch')
+args.add_argument('--incremental', metavar='STATE_FILE',
+                  help='keep results in STATE_FILE, only rescan changed packages')
+args.add_argument('--dedup', action='store_true',
+                  help='write each distinct license text only once in the report')
+args.add_argument('--classify', action='store_true',
+                  help='identify the SPDX license of every license text')
+args.add_argument('--repodata', action='append',
+                  help='conda repodata.json file, directory or channel url (repeatable)')
+args.add_argument('--env', action='append', default=[],
+                  help='python or conda environment prefix to scan (repeatable)')
+args.add_argument('--envs-from', metavar='FILE',
+                  help='file listing environment prefixes to scan, one per line')
+args.add_argument('--spec', action='append', default=[],
+                  help='requirements.txt, pip-compile lockfile, conda environment.yml or explicit '
+                       'spec file to resolve instead of an installed environment (repeatable)')
+args.add_argument('--wheelhouse', action='append',
+                  help='directory or file of .whl, .tar.gz, .tar.bz2 or .conda archives to take '
+                       'licenses from (repeatable)')
+args.add_argument('--jobs', type=int,
+                  help='number of environments scanned in parallel')
+args.add_argument('--graph', metavar='FILE',
+                  help='write the dependency graph to FILE, .dot or .json')
+args.add_argument('--why', metavar='PACKAGE', action='append',
+                  help='print why PACKAGE is installed (repeatable)')
+args.add_argument('--profile', metavar='FILE',
+                  help='write timings and counters per provider and phase as json to FILE')
+args.add_argument('--format', action='append', choices=sorted(FORMATS),
+                  help='report format, trail (THIRDPARTY-LICENSES, default), jsonl, csv, '
+                       'spdx or cyclonedx (repeatable). Packages are written as they are discovered, '
+                       'dependencies at the end')
+args.add_argument('--policy', metavar='FILE',
+                  help='json file of allowed, denied and reviewed SPDX license ids and per package exceptions')
+args.add_argument('--allow', metavar='SPDX_ID', action='append',
+                  help='allow packages with this license, others need a review (repeatable, e.g. BSD-*)')
+args.add_argument('--deny', metavar='SPDX_ID', action='append',
+                  help='deny packages with this license (repeatable, e.g. GPL-*)')
+args.add_argument('--review', metavar='SPDX_ID', action='append',
+                  help='packages with this license need a review (repeatable)')
+args.add_argument('--fail-fast', action='store_true',
+                  help='stop at the first package denied by the policy')
+args.add_argument('--diff', metavar='OLD',
+                  help='only report changes since a previous THIRDPARTY-LICENSES.jsonl or .csv report, '
+                       'written to {}'.format(DIFF_FILENAME))
 
-def print_license_stats(lic):
-    counts, by_license = lic.get_license_stats()
+def print_license_stats(lic, stats=None):
+    from tabulate import tabulate
+
+    counts, by_license = (stats.counts, stats.by_license) if stats else lic.get_license_stats()
     print("License counts by type\n")
     print(tabulate(counts.items(), headers=('License family', 'Count')))
     print("\n\nPackages by license\n")
     print(tabulate(by_license.items(), headers=('Licency family', 'Packages')))
 
 def print_missing(lic):
+    from tabulate import tabulate
+
     rows = []
     columns = 'name', 'version', 'license', 'url'
     missing = lic.missing_licenses()
@@ -33,6 +114,8 @@ def print_missing(lic):
 
 
 def print_catalog(lic):
+    from tabulate import tabulate
+
     primary_rows = []
     secondary_rows = []
     columns = 'name', 'author', 'license', 'url'
@@ -51,28 +134,110 @@ def print_catalog(lic):
     print(tabulate(secondary_rows, headers=columns))
     print_missing(lic)
 
-def save_license_trail(lic):
-    reportfn = 'THIRDPARTY-LICENSES'
-    with open(reportfn, 'w') as fout:
-        fout.write('\n-- ** THIRDPARTY LICENSES **\n')
-        fout.write('-- report produced by pylicenses [use at your own risk]')
-        fout.write('--')
-        for pkg, data in lic.packages.items():
-            if pkg != data.get('name'):
-                continue
-            license_text = data.get('license_text')
-            if isinstance(license_text, bytes):
-                license_text = license_text.decode('utf8')
-            fout.write('--\n')
-            fout.write('Package: {}\n'.format(pkg))
-            fout.write('Version: {}\n'.format(data.get('version', 'latest')))
-            fout.write('Author: {}\n'.format(data.get('author')))
-            fout.write('License: {}\n'.format(data.get('license')))
-            fout.write('Home-page: {}\n'.format(data.get('home_page')))
-            fout.write('Source: {}\n'.format(data.get('url')))
-            fout.write('Licence Text:\n{}\n'.format(license_text))
-        fout.write('\n-- ** end of report **\n')
-    print("**SUCCESS** The full license report is available in {}\n".format(reportfn))
+def print_diff(lic, old_path):
+    from tabulate import tabulate
+
+    changes = diff_packages(old_path, lic.packages.items())
+    with open(DIFF_FILENAME, 'w') as fout:
+        write_diff_json(changes, fout)
+    if changes:
+        columns = 'name', 'change', 'old', 'new'
+        print("Changes since {}:\n".format(old_path))
+        print(tabulate([[change[k] for k in columns] for change in changes], headers=columns))
+        print()
+    else:
+        print("**SUCCESS** No changes since {}\n".format(old_path))
+    print("**SUCCESS** The changes are available in {}\n".format(DIFF_FILENAME))
+
+def make_policy(options):
+    if not (options.policy or options.allow or options.deny or options.review):
+        return None
+    lists = dict(allow=options.allow, deny=options.deny, review=options.review)
+    if options.policy:
+        return Policy.load(options.policy, fail_fast=options.fail_fast, **lists)
+    return Policy(fail_fast=options.fail_fast, **lists)
+
+def print_policy(policy):
+    from tabulate import tabulate
+
+    columns = 'name', 'version', 'license', 'verdict'
+    findings = policy.violations(verdicts=(DENY, REVIEW))
+    if findings:
+        print("\n**WARNING** Packages denied by the policy or to be reviewed\n")
+        print(tabulate([[finding[k] for k in columns] for finding in findings], headers=columns))
+        print()
+    else:
+        print("\n**SUCCESS** All packages are allowed by the policy\n")
+
+def save_dependency_graph(lic, graphfn):
+    graph = lic.graph or lic.build_dependency_graph()
+    with open(graphfn, 'w') as fout:
+        if graphfn.endswith('.json'):
+            graph.write_json(fout)
+        else:
+            graph.write_dot(fout)
+    print("**SUCCESS** The dependency graph is available in {}\n".format(graphfn))
+
+def print_why(lic, pkgs):
+    graph = lic.graph or lic.build_dependency_graph()
+    for pkg in pkgs:
+        try:
+            path = graph.why(pkg)
+        except KeyError:
+            print("{} is not installed".format(pkg))
+            continue
+        if path is None:
+            print("{} is only required within a dependency cycle".format(pkg))
+        elif len(path) == 1:
+            print("{} is a primary package".format(pkg))
+        else:
+            print(' -> '.join(path))
+
+def open_reports(formats, dedup=False, graph=None):
+    """
+    return the report writers of formats, writing to partial files
+
+    close_reports() moves the partial files to the report files, so that a
+    previous report is only replaced by a complete one
+    """
+    options = {'trail': dict(dedup=dedup)}
+    writers = []
+    for name in dict.fromkeys(formats):
+        cls = FORMATS[name]
+        writers.append(cls(open(cls.filename + '.partial', 'w', newline=''), graph=graph,
+                           **options.get(name, {})))
+    return writers
+
+def close_reports(writers, discard=False):
+    """
+    close the writers' files and replace the reports by them
+
+    :param discard: if True, remove the files instead, the previous reports are kept
+    """
+    for writer in writers:
+        writer.fout.close()
+        if discard:
+            os.remove(writer.fout.name)
+        else:
+            os.replace(writer.fout.name, writer.filename)
+
+def print_reports(writers):
+    for writer in writers:
+        print("**SUCCESS** The license report is available in {}\n".format(writer.filename))
+
+def save_reports(lic, formats, dedup=False):
+    graph = lic.graph
+    if graph is None and any(FORMATS[name].uses_graph for name in formats):
+        graph = lic.build_dependency_graph()
+    writers = open_reports(formats, dedup=dedup, graph=graph)
+    try:
+        # a single pass over all packages for all formats
+        write_reports(lic.packages.items(), writers)
+    except BaseException:
+        close_reports(writers, discard=True)
+        raise
+    close_reports(writers)
+    print_reports(writers)
 
 if __name__ == '__main__':
     # parse args
@@ -80,13 +245,113 @@ if __name__ == '__main__':
     github_auth = None
     if options.github:
         github_auth = options.github.split(',')
+    cache_path = ':memory:' if options.no_cache else options.cache_dir
+    envs = options.env + (read_envs_file(options.envs_from) if options.envs_from else [])
+    if (envs or options.spec or options.package) and options.incremental:
+        args.error('--incremental cannot be used with --env, --envs-from, --spec or --package')
+    if options.with_dependencies and not options.package:
+        args.error('--with-dependencies requires --package')
+    if envs and options.spec:
+        args.error('--spec cannot be used with --env or --envs-from')
+    if options.serve and (options.spec or options.incremental or options.package):
+        args.error('--serve cannot be used with --spec, --incremental or --package')
+    if options.diff and not options.diff.endswith(('.jsonl', '.csv')):
+        args.error('--diff requires a THIRDPARTY-LICENSES.jsonl or .csv report')
+    if options.fail_fast and not (options.policy or options.allow or options.deny or options.review):
+        args.error('--fail-fast requires --policy, --allow, --deny or --review')
+    profiler = Profiler() if options.profile else None
+    policy = make_policy(options)
+    formats = list(dict.fromkeys(options.format or ['trail']))
+    # reports are written as packages are discovered, their dependencies at the end
+    streaming = not (options.serve or options.diff or options.classify)
+    streamed = open_reports(formats if streaming else [], dedup=options.dedup)
+    stats = LicenseStats() if streaming and options.stats else None
+    consumers = [writer.write for writer in streamed] + ([stats] if stats else [])
+    transport_options = dict(timeout=(min(5, options.timeout), options.timeout),
+                             retries=options.retries, pool_size=options.concurrency,
+                             max_requests=options.max_requests, max_time=options.max_time)
+    if options.serve:
+        from pylicenses.daemon import serve
+        # one PyLicenses per environment, kept in memory
+        cache = LicenseCache(cache_path, offline=options.offline,
+                             transport=Transport(**transport_options))
+        lics = [PyLicenses(github_auth=github_auth, cache=cache, prefix=env,
+                           concurrency=options.concurrency, repodata=options.repodata,
+                           wheelhouse=options.wheelhouse)
+                for env in envs or [None]]
+        serve(lics, options.serve, interval=options.watch_interval)
+        args.exit()
     # run
-    lic = PyLicenses(github_auth=github_auth)
-    lic.discover()
-    if options.stats:
-        print_license_stats(lic)
-        print_missing(lic)
+    if envs:
+        lic = MultiEnvLicenses(envs, max_workers=options.jobs, cache_path=cache_path,
+                               offline=options.offline, github_auth=github_auth,
+                               concurrency=options.concurrency, repodata=options.repodata,
+                               profiler=profiler, wheelhouse=options.wheelhouse,
+                               transport_options=transport_options, policy=policy,
+                               consumers=consumers)
+    elif options.spec:
+        cache = LicenseCache(cache_path, offline=options.offline,
+                             transport=Transport(**transport_options))
+        lic = LockfileLicenses(options.spec, github_auth=github_auth, cache=cache,
+                               concurrency=options.concurrency, repodata=options.repodata,
+                               profiler=profiler, wheelhouse=options.wheelhouse, policy=policy,
+                               consumers=consumers)
     else:
+        cache = LicenseCache(cache_path, offline=options.offline,
+                             transport=Transport(**transport_options))
+        lic = PyLicenses(github_auth=github_auth, cache=cache,
+                         concurrency=options.concurrency, repodata=options.repodata,
+                         profiler=profiler, wheelhouse=options.wheelhouse, policy=policy,
+                         consumers=consumers)
+    for writer in streamed:
+        writer.open()
+    try:
+        if options.incremental:
+            lic.discover_incremental(options.incremental)
+        else:
+            lic.discover(subset=options.package, closure=options.with_dependencies)
+    except PolicyViolation as e:
+        # the streamed reports are incomplete, keep the previous ones
+        close_reports(streamed, discard=True)
+        args.exit(1, "\n**ERROR** {}\n".format(e))
+    except BaseException:
+        close_reports(streamed, discard=True)
+        raise
+    # the dependencies of the streamed reports are written by close()
+    dependencies_known = any(writer.uses_graph for writer in streamed)
+    if dependencies_known:
         lic.discover_package_dependencies()
-        print_catalog(lic)
-    save_license_trail(lic)
+        for writer in streamed:
+            writer.graph = lic.graph
+    for writer in streamed:
+        writer.close()
+    close_reports(streamed)
+    if options.classify:
+        lic.classify_licenses()
+    if options.diff:
+        # only the delta, not the catalog and reports
+        with lic.profiling(), profile.timed('phase', 'report'):
+            print_diff(lic, options.diff)
+    else:
+        if options.stats:
+            print_license_stats(lic, stats=stats)
+            print_missing(lic)
+        else:
+            if not dependencies_known:
+                lic.discover_package_dependencies()
+            print_catalog(lic)
+        if options.why:
+            print_why(lic, options.why)
+        if options.graph:
+            save_dependency_graph(lic, options.graph)
+        if not streaming:
+            with lic.profiling(), profile.timed('phase', 'report'):
+                save_reports(lic, formats, dedup=options.dedup)
+        print_reports(streamed)
+    if policy:
+        print_policy(policy)
+    if profiler:
+        profiler.write(options.profile)
+        print("**SUCCESS** The profile is available in {}\n".format(options.profile))
+    if policy and policy.violations():
+        args.exit(1, "**ERROR** {} package(s) denied by the policy\n".format(len(policy.violations())))
@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from pylicenses import profile
+from pylicenses.transport import BudgetExceeded, Transport, TransportError
+
+#: response-like tuple returned by LicenseCache.fetch
+CachedResponse = namedtuple('CachedResponse', ['status_code', 'content', 'headers', 'from_cache'])
+
+
+def default_cache_dir():
+    """
+    return the cache directory, honoring $PYLICENSES_CACHE_DIR and $XDG_CACHE_HOME
+    """
+    if os.environ.get('PYLICENSES_CACHE_DIR'):
+        return os.environ['PYLICENSES_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pylicenses')
+
+
+class LicenseCache(object):
+    """
+    Persistent cache for remote lookups (pypi, github, static urls)
+
+    Entries are stored in a SQLite database, keyed by source and url. Each
+    source has its own time-to-live. Stale entries are revalidated using
+    ETag / Last-Modified headers, so that a 304 reply only refreshes the
+    entry without transferring the body again. The total size of cached
+    content is bounded, least recently used entries are evicted first.
+
+    In offline mode no requests are made. Any cached entry, fresh or stale,
+    is returned, a miss returns a 504 response (as for HTTP only-if-cached).
+    The same applies when a request fails after all retries of the Transport
+    or its request budget is used up.
+    """
+    DEFAULT_TTL = {
+        'pypi': 24 * 3600,
+        'github-repo': 7 * 24 * 3600,
+        'github-license': 30 * 24 * 3600,
+        'static': 30 * 24 * 3600,
+        'repodata': 24 * 3600,
+    }
+    DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            source TEXT NOT NULL,
+            url TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            content BLOB,
+            etag TEXT,
+            last_modified TEXT,
+            fetched REAL NOT NULL,
+            accessed REAL NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (source, url)
+        )
+    """
+
+    def __init__(self, path=None, ttl=None, max_size=None, offline=False, transport=None):
+        """
+
+        :param path: the sqlite file name, or a directory to place cache.sqlite
+           into. Use ':memory:' for a non-persistent cache. Defaults to
+           default_cache_dir()
+        :param ttl: dict of source => seconds, updates DEFAULT_TTL
+        :param max_size: max bytes of cached content, defaults to 256MB
+        :param offline: if True, only serve from cache
+        :param transport: the Transport making requests, defaults to Transport()
+        """
+        path = path or default_cache_dir()
+        if path != ':memory:' and not path.endswith('.sqlite'):
+            os.makedirs(path, exist_ok=True)
+            path = os.path.join(path, 'cache.sqlite')
+        self.path = path
+        self.ttl = dict(self.DEFAULT_TTL, **(ttl or {}))
+        self.max_size = max_size or self.DEFAULT_MAX_SIZE
+        self.offline = offline
+        self.transport = transport or Transport()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if path != ':memory:':
+            # readers do not block the writer, e.g. of several scan processes
+            self._db.execute('PRAGMA journal_mode=WAL')
+        with self._lock, self._db:
+            self._db.execute(self.SCHEMA)
+
+    def get(self, source, url):
+        """
+        return the cached (status, content, etag, last_modified, fetched) or None
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT status, content, etag, last_modified, fetched FROM responses '
+                'WHERE source=? AND url=?', (source, url)).fetchone()
+            if row is not None:
+                with self._db:
+                    self._db.execute('UPDATE responses SET accessed=? WHERE source=? AND url=?',
+                                     (time.time(), source, url))
+        return row
+
+    def put(self, source, url, status, content, etag=None, last_modified=None):
+        content = content or b''
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(source, url, status, content, etag, last_modified, fetched, accessed, size) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (source, url, status, content, etag, last_modified, now, now, len(content)))
+        self.evict()
+
+    def touch(self, source, url):
+        """
+        mark an entry as freshly validated
+        """
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute('UPDATE responses SET fetched=?, accessed=? WHERE source=? AND url=?',
+                             (now, now, source, url))
+
+    def is_fresh(self, source, fetched):
+        return time.time() - fetched < self.ttl.get(source, 0)
+
+    def evict(self):
+        """
+        remove least recently accessed entries until the cache fits max_size
+        """
+        with self._lock, self._db:
+            total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total <= self.max_size:
+                return
+            rows = self._db.execute('SELECT source, url, size FROM responses ORDER BY accessed')
+            victims = []
+            for source, url, size in rows:
+                if total <= self.max_size:
+                    break
+                victims.append((source, url))
+                total -= size
+            self._db.executemany('DELETE FROM responses WHERE source=? AND url=?', victims)
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses')
+
+    def fetch(self, url, source, auth=None):
+        """
+        get url through the cache
+
+        :param url: the url to GET
+        :param source: the source kind, selects the ttl, e.g. 'pypi'
+        :param auth: the auth tuple passed to requests
+        :return: CachedResponse
+        """
+        entry = self.get(source, url)
+        if entry is not None:
+            status, content, etag, last_modified, fetched = entry
+            if self.offline or self.is_fresh(source, fetched):
+                profile.count('cache_hits')
+                return CachedResponse(status, content, {}, True)
+        elif self.offline:
+            profile.count('cache_misses')
+            return CachedResponse(504, b'', {}, True)
+        headers = {}
+        if entry is not None:
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        started = time.perf_counter()
+        try:
+            resp = self.transport.get(url, auth=auth, headers=headers)
+        except (TransportError, BudgetExceeded):
+            # unreachable, or no budget left: a stale answer is better than none
+            profile.count('http_errors')
+            if entry is not None:
+                profile.count('cache_hits')
+                return CachedResponse(status, content, {}, True)
+            profile.count('cache_misses')
+            return CachedResponse(504, b'', {}, False)
+        profile.http(url, time.perf_counter() - started, resp.status_code)
+        if resp.status_code == 304 and entry is not None:
+            profile.count('cache_revalidated')
+            self.touch(source, url)
+            return CachedResponse(status, content, resp.headers, True)
+        profile.count('cache_misses')
+        if self.is_cacheable(resp):
+            # only the server's validators, a client date may not match the server's clock
+            self.put(source, url, resp.status_code, resp.content,
+                     etag=resp.headers.get('ETag'),
+                     last_modified=resp.headers.get('Last-Modified'))
+        return CachedResponse(resp.status_code, resp.content, resp.headers, False)
+
+    def is_cacheable(self, resp):
+        # keep positive and negative (404) answers, but never errors that may be
+        # transient such as rate limiting (403, 429) or server errors
+        return resp.status_code in (200, 404, 410)
@@ -0,0 +1,147 @@
+"""
+Thin client of the license daemon, see pylicenses.daemon
+
+    $ python -m pylicenses.client packages --license GPL
+    $ python -m pylicenses.client package requests --text
+    $ python -m pylicenses.client why urllib3 --env /opt/conda/envs/app
+
+The daemon's address is given by --connect or $PYLICENSES_DAEMON, and
+defaults to 127.0.0.1:8765. Results are printed as json.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+from http.client import HTTPConnection
+from urllib.parse import urlencode, quote
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+
+
+class LicenseClientError(Exception):
+    """
+    the daemon could not answer a query
+    """
+
+    def __init__(self, status, message):
+        super().__init__('{} {}'.format(status, message))
+        self.status = status
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """
+    HTTP over a Unix socket
+    """
+
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class LicenseClient(object):
+    """
+    Query the license daemon
+    """
+
+    def __init__(self, address=None, timeout=30):
+        """
+
+        :param address: host:port or the path of a Unix socket, defaults to
+           $PYLICENSES_DAEMON or 127.0.0.1:8765
+        :param timeout: seconds to wait for an answer
+        """
+        self.address = address or os.environ.get('PYLICENSES_DAEMON') or DEFAULT_ADDRESS
+        self.timeout = timeout
+
+    def connection(self):
+        if os.sep in self.address or ':' not in self.address:
+            return UnixHTTPConnection(self.address, timeout=self.timeout)
+        host, port = self.address.rsplit(':', 1)
+        return HTTPConnection(host or '127.0.0.1', int(port), timeout=self.timeout)
+
+    def request(self, method, path, **params):
+        """
+        return the json result of a query
+
+        :raises: LicenseClientError if the daemon does not know the query,
+           environment or package
+        """
+        params = {k: v for k, v in params.items() if v is not None}
+        url = path + ('?' + urlencode(params) if params else '')
+        conn = self.connection()
+        try:
+            conn.request(method, url)
+            resp = conn.getresponse()
+            result = json.loads(resp.read().decode('utf8'))
+        finally:
+            conn.close()
+        if resp.status != 200:
+            raise LicenseClientError(resp.status, result.get('error'))
+        return result
+
+    def envs(self):
+        return self.request('GET', '/envs')
+
+    def packages(self, env=None, license=None):
+        return self.request('GET', '/packages', env=env, license=license)
+
+    def package(self, name, env=None, text=False):
+        return self.request('GET', '/packages/' + quote(name), env=env, text=1 if text else None)
+
+    def why(self, name, env=None):
+        return self.request('GET', '/why/' + quote(name), env=env)
+
+    def missing(self, env=None):
+        return self.request('GET', '/missing', env=env)
+
+    def refresh(self, env=None):
+        return self.request('POST', '/refresh', env=env)
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(prog='python -m pylicenses.client')
+    args.add_argument('--connect', metavar='ADDRESS',
+                      help='host:port or Unix socket of the daemon, defaults to $PYLICENSES_DAEMON '
+                           'or {}'.format(DEFAULT_ADDRESS))
+    args.add_argument('--env', help='the environment prefix, defaults to the first served environment')
+    commands = args.add_subparsers(dest='command')
+    commands.add_parser('envs', help='list the served environments')
+    packages = commands.add_parser('packages', help='list packages')
+    packages.add_argument('--license', help='only packages with a license id containing LICENSE, e.g. GPL')
+    package = commands.add_parser('package', help='show a package')
+    package.add_argument('name')
+    package.add_argument('--text', action='store_true', help='include the license text')
+    why = commands.add_parser('why', help='show why a package is installed')
+    why.add_argument('name')
+    commands.add_parser('missing', help='list packages without license text')
+    commands.add_parser('refresh', help='rediscover changed packages now')
+    options = args.parse_args(argv)
+    if not options.command:
+        args.error('a command is required')
+    client = LicenseClient(options.connect)
+    try:
+        if options.command == 'envs':
+            result = client.envs()
+        elif options.command == 'packages':
+            result = client.packages(env=options.env, license=options.license)
+        elif options.command == 'package':
+            result = client.package(options.name, env=options.env, text=options.text)
+        elif options.command == 'why':
+            result = client.why(options.name, env=options.env)
+        else:
+            result = getattr(client, options.command)(env=options.env)
+    except (LicenseClientError, OSError) as e:
+        print('**ERROR** {}'.format(e), file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""
+License daemon, keeps the packages of environments warm and answers queries
+
+    $ python -m pylicenses --serve 127.0.0.1:8765 --env /opt/conda/envs/app
+    $ python -m pylicenses.client --connect 127.0.0.1:8765 packages --license GPL
+
+The daemon discovers each environment once and keeps its PyLicenses, i.e.
+the packages, the dependency graph, the license file index and the
+provider caches, in memory. A watcher polls the modification times of the
+environments' site-packages and conda-meta directories and, on a change,
+rediscovers only the distributions whose fingerprints changed.
+
+Queries are served over HTTP on a localhost address (host:port) or a Unix
+socket (a path). All responses are json:
+
+    GET  /envs                      environments, package counts, last refresh
+    GET  /packages?license=GPL      packages with a license id matching GPL
+    GET  /packages/<name>?text=1    the package, with its license text
+    GET  /why/<name>                path from a primary package to name
+    GET  /missing                   packages without license text
+    POST /refresh                   check for changes now
+
+All queries take the environment's prefix as the env parameter, defaulting
+to the first environment.
+"""
+import json
+import os
+import stat
+import sys
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from pylicenses.normalize import license_ids
+from pylicenses.providers import normalize_subset, in_subset
+from pylicenses.state import ScanState, to_json
+
+#: package keys returned by /packages
+SUMMARY_KEYS = ('name', 'version', 'license', 'license_expression', 'license_trace', 'is_primary')
+
+
+class WatchedEnv(object):
+    """
+    The PyLicenses of an environment, kept up to date with the environment
+    """
+
+    def __init__(self, lic):
+        """
+
+        :param lic: the PyLicenses of the environment, not yet discovered
+        """
+        self.lic = lic
+        self.state = ScanState()
+        self.watch_key = None
+        self.refreshed = None
+        self.lock = threading.RLock()
+
+    @property
+    def prefix(self):
+        return os.path.abspath(self.lic.prefix) if self.lic.prefix else sys.prefix
+
+    def current_watch_key(self):
+        key = []
+        for path in self.lic.watch_paths():
+            try:
+                key.append((path, os.stat(path).st_mtime_ns))
+            except OSError:
+                key.append((path, None))
+        return tuple(key)
+
+    def refresh(self, force=False):
+        """
+        rediscover the packages that changed since the last refresh
+
+        :param force: if True, compare fingerprints even if no watched
+           directory changed
+        :return: tuple of sets (changed, removed) package names
+        """
+        with self.lock:
+            watch_key = self.current_watch_key()
+            if self.refreshed is not None and not force and watch_key == self.watch_key:
+                return set(), set()
+            fingerprints = self.lic.fingerprint()
+            changed, removed = self.state.diff(fingerprints)
+            packages = self.lic.packages
+            if self.refreshed is None:
+                self.lic.discover()
+            elif changed or removed:
+                # drop the previous records, they may have keys the new version has not
+                stale = normalize_subset(changed | removed)
+                for pkg in list(packages):
+                    if in_subset(pkg, stale):
+                        del packages[pkg]
+                self.lic.license_index.invalidate()
+                self.lic.discover(subset=changed) if changed else None
+            if self.refreshed is None or changed or removed:
+                self.lic.discover_package_dependencies()
+            self.state.fingerprints = fingerprints
+            self.watch_key = watch_key
+            self.refreshed = time.time()
+        return changed, removed
+
+
+class LicenseService(object):
+    """
+    The queries of the license daemon on a set of watched environments
+    """
+
+    def __init__(self, lics, interval=5):
+        """
+
+        :param lics: the list of PyLicenses, one per environment
+        :param interval: seconds between checks for changes of the
+           environments, 0 to not watch
+        """
+        self.envs = [WatchedEnv(lic) for lic in lics]
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._watcher = None
+
+    def start(self):
+        """
+        discover all environments and start watching them
+        """
+        for env in self.envs:
+            env.refresh()
+        if self.interval:
+            self._watcher = threading.Thread(target=self.watch, name='pylicenses-watcher', daemon=True)
+            self._watcher.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def watch(self):
+        while not self._stopped.wait(self.interval):
+            for env in self.envs:
+                try:
+                    env.refresh()
+                except Exception as e:
+                    # keep serving the previous state
+                    warnings.warn('refreshing {} failed: {}'.format(env.prefix, e))
+
+    def env(self, prefix=None):
+        """
+        return the WatchedEnv of prefix, defaults to the first
+        """
+        if not prefix:
+            return self.envs[0]
+        for env in self.envs:
+            if env.prefix == prefix or env.prefix == os.path.abspath(prefix):
+                return env
+        raise KeyError('unknown environment {}'.format(prefix))
+
+    def query(self, method, path, params):
+        """
+        answer a query
+
+        :param method: GET or POST
+        :param path: the url path, e.g. /packages/requests
+        :param params: dict of query parameter => value
+        :return: tuple (http status, json serializable result)
+        """
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        route = (method, parts[0], len(parts))
+        try:
+            if route == ('GET', 'envs', 1):
+                return 200, self.list_envs()
+            env = self.env(params.get('env'))
+            with env.lock:
+                if route == ('GET', 'packages', 1):
+                    return 200, self.list_packages(env, license=params.get('license'))
+                if route == ('GET', 'packages', 2):
+                    return 200, self.get_package(env, parts[1], text=params.get('text') in ('1', 'true'))
+                if route == ('GET', 'why', 2):
+                    return 200, self.why(env, parts[1])
+                if route == ('GET', 'missing', 1):
+                    return 200, sorted(env.lic.missing_licenses())
+            if route == ('POST', 'refresh', 1):
+                changed, removed = env.refresh(force=True)
+                return 200, {'changed': sorted(changed), 'removed': sorted(removed)}
+        except KeyError as e:
+            return 404, {'error': e.args[0]}
+        return 404, {'error': 'no such query {} {}'.format(method, path)}
+
+    def list_envs(self):
+        return [{'prefix': env.prefix, 'packages': len(env.lic.packages), 'refreshed': env.refreshed}
+                for env in self.envs]
+
+    def list_packages(self, env, license=None):
+        """
+        return the summary of all packages, or of those with a license matching license
+
+        :param license: case insensitive part of a license id, e.g. GPL
+           matches GPL-3.0-only and LGPL-2.1-or-later
+        """
+        result = []
+        for pkg, data in env.lic.packages.items():
+            if license is not None:
+                ids = license_ids(data.get('license_expression')) or [data.get('license') or '']
+                if not any(license.lower() in str(license_id).lower() for license_id in ids):
+                    continue
+            result.append({k: to_json(data.get(k)) for k in SUMMARY_KEYS})
+        return sorted(result, key=lambda data: str(data['name']).lower())
+
+    def get_package(self, env, name, text=False):
+        data = env.lic.packages.get(name)
+        if data is None:
+            raise KeyError('unknown package {}'.format(name))
+        result = {k: to_json(v) for k, v in data.as_dict().items()}
+        if text:
+            result['license_text'] = to_json(data.get('license_text'))
+        else:
+            result.pop('license_text', None)
+        return result
+
+    def why(self, env, name):
+        path = env.lic.graph.why(name)
+        return {'name': name, 'path': path}
+
+
+class LicenseRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serve LicenseService.query as json
+    """
+
+    def do_GET(self):
+        self.respond('GET')
+
+    def do_POST(self):
+        self.respond('POST')
+
+    def respond(self, method):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        status, result = self.server.service.query(method, url.path, params)
+        body = json.dumps(result, default=to_json).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else 'unix'
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def is_unix_address(address):
+    """
+    True if address is the path of a Unix socket, not host:port
+    """
+    return os.sep in address or ':' not in address
+
+
+def make_server(service, address):
+    """
+    return the server of service listening on address
+
+    :param service: the LicenseService
+    :param address: host:port, or the path of a Unix socket
+    """
+    if is_unix_address(address):
+        if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+            # left over by a previous daemon
+            os.unlink(address)
+        server = UnixHTTPServer(address, LicenseRequestHandler)
+    else:
+        host, port = address.rsplit(':', 1)
+        server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), LicenseRequestHandler)
+    server.service = service
+    return server
+
+
+def serve(lics, address, interval=5):
+    """
+    discover the environments and serve queries until interrupted
+
+    :param lics: the list of PyLicenses, one per environment
+    :param address: host:port, or the path of a Unix socket
+    :param interval: seconds between checks for changes of the environments
+    """
+    service = LicenseService(lics, interval=interval).start()
+    server = make_server(service, address)
+    print("**SUCCESS** Serving {} environment(s) on {}\n".format(len(service.envs), address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if is_unix_address(address) and os.path.exists(address):
+            os.unlink(address)
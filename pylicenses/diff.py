@@ -0,0 +1,128 @@
+"""
+Compare the packages of a scan to a previous scan
+
+    $ python -m pylicenses --format jsonl                        # on main
+    $ python -m pylicenses --diff THIRDPARTY-LICENSES.jsonl      # after the bump
+
+Scans are compared by canonical package name. License texts are compared by
+their license_text_id, so only ids need to be kept from the previous scan,
+not the texts.
+"""
+import csv
+import json
+
+from pylicenses.providers import canonical_name
+from pylicenses.report import license_text_id
+
+#: kinds of changes, in the order they are reported for a package
+CHANGES = ('added', 'removed', 'version', 'license', 'license_text')
+
+
+def snapshot_record(pkg, data):
+    """
+    return the values of a package that are compared
+
+    :param pkg: the package name
+    :param data: the package data, either as discovered or as read from a
+       report. license_text_id is used if given, else computed from license_text
+    """
+    text_id = data.get('license_text_id')
+    if text_id is None and data.get('license_text'):
+        text_id = license_text_id(data['license_text'])
+    return {
+        'name': data.get('name') or pkg,
+        'version': data.get('version') or None,
+        'license': data.get('license_expression') or data.get('license') or None,
+        'license_text_id': text_id or None,
+    }
+
+
+def package_snapshot(packages):
+    """
+    return dict of canonical name => snapshot_record of packages
+
+    Records of the same canonical name are compared once.
+
+    License texts that are loaded from local files to compute their id are
+    released again, as in write_reports().
+
+    :param packages: iterable of (pkg, data) tuples, e.g. lic.packages.items()
+    """
+    snapshot = {}
+    for pkg, data in packages:
+        if pkg != data.get('name'):
+            continue
+        loaded = getattr(data, 'is_text_loaded', True)
+        key = canonical_name(pkg)
+        record = snapshot_record(pkg, data)
+        # a package listed by pip and conda (e.g. PyYAML and pyyaml) is compared
+        # once, by the record that has a license
+        if key not in snapshot or not snapshot[key]['license']:
+            snapshot[key] = record
+        if not loaded and data.is_text_loaded:
+            del data['license_text']
+    return snapshot
+
+
+def load_snapshot(path):
+    """
+    return the package_snapshot of a previous scan
+
+    :param path: a THIRDPARTY-LICENSES.jsonl or THIRDPARTY-LICENSES.csv report
+    """
+    if not path.endswith(('.csv', '.jsonl')):
+        raise ValueError('cannot compare to {}, expected a .jsonl or .csv report'.format(path))
+    with open(path, newline='') as fin:
+        if path.endswith('.csv'):
+            records = list(csv.DictReader(fin))
+        else:
+            records = [json.loads(line) for line in fin if line.strip()]
+            # skip the relationships following the packages
+            records = [record for record in records if 'relationships' not in record]
+    return package_snapshot((record.get('name'), record) for record in records)
+
+
+def diff_snapshots(old, new):
+    """
+    return the list of changes from old to new
+
+    Each change is a dict with name, change (one of CHANGES), old and new.
+    For added and removed packages old and new is the version.
+
+    :param old: the package_snapshot of the previous scan
+    :param new: the package_snapshot of the current scan
+    """
+    changes = []
+    for key in sorted(set(old) | set(new)):
+        before, after = old.get(key), new.get(key)
+        if before is None:
+            changes.append(dict(name=after['name'], change='added', old=None, new=after['version']))
+        elif after is None:
+            changes.append(dict(name=before['name'], change='removed', old=before['version'], new=None))
+        else:
+            for change, k in (('version', 'version'), ('license', 'license'),
+                              ('license_text', 'license_text_id')):
+                if before[k] != after[k]:
+                    changes.append(dict(name=after['name'], change=change, old=before[k], new=after[k]))
+    return changes
+
+
+def diff_packages(old_path, packages):
+    """
+    return the list of changes from the report at old_path to packages
+
+    :param old_path: a THIRDPARTY-LICENSES.jsonl or .csv report of a previous scan
+    :param packages: iterable of (pkg, data) tuples, e.g. lic.packages.items()
+    """
+    return diff_snapshots(load_snapshot(old_path), package_snapshot(packages))
+
+
+def write_diff_json(changes, fout):
+    """
+    write the changes as json, with counts by kind of change
+    """
+    counts = {change: 0 for change in CHANGES}
+    for change in changes:
+        counts[change['change']] += 1
+    json.dump({'counts': counts, 'changes': changes}, fout, indent=2, sort_keys=True)
+    fout.write('\n')
@@ -0,0 +1,162 @@
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from pylicenses import PyLicenses, profile
+from pylicenses.cache import LicenseCache
+from pylicenses.normalize import package_expression
+from pylicenses.profile import Profiler
+from pylicenses.providers import canonical_name
+from pylicenses.records import PackageRecord
+from pylicenses.transport import Transport
+
+
+def read_envs_file(path):
+    """
+    return the list of environment prefixes in a file, one per line
+
+    Blank lines and lines starting with # are ignored.
+    """
+    with open(path) as fin:
+        lines = (line.strip() for line in fin)
+        return [line for line in lines if line and not line.startswith('#')]
+
+
+def scan_env(prefix, subset=None, closure=False, cache_path=':memory:', offline=False, profiled=False,
+             transport_options=None, **kwargs):
+    """
+    discover the packages of one environment, run in a worker process
+
+    :param prefix: the environment prefix
+    :param subset: the packages to discover, defaults to all
+    :param closure: if True, also discover the packages the subset requires
+    :param cache_path: the LicenseCache path, shared by all workers
+    :param offline: if True the cache is not refreshed from the network
+    :param profiled: if True, profile the discovery
+    :param transport_options: the kwargs of the worker's Transport
+    :param kwargs: passed to PyLicenses
+    :return: tuple (packages, profile), packages is the list of package dicts,
+       license texts of local files are not included but read from
+       license_source when needed. profile is the Profiler.as_dict() or None
+    """
+    cache = LicenseCache(cache_path, offline=offline, transport=Transport(**(transport_options or {})))
+    profiler = Profiler() if profiled else None
+    lic = PyLicenses(cache=cache, prefix=prefix, profiler=profiler, **kwargs)
+    lic.discover(subset=subset, closure=closure)
+    packages = [data.as_dict() for pkg, data in lic.packages.items() if pkg == data.get('name')]
+    return packages, profiler.as_dict() if profiler else None
+
+
+class MultiEnvLicenses(PyLicenses):
+    """
+    The packages of several environments, discovered in parallel processes
+
+    Each environment is scanned by scan_env in a worker process, all workers
+    share the persistent LicenseCache. The results are merged by canonical
+    package name (e.g. pip's PyYAML and conda's pyyaml), the envs key of each package maps the environments containing it
+    to the installed version, env_licenses to the version and license data
+    of each environment (see ENV_KEYS).
+    """
+    PROVIDERS = {'primary': [], 'fallback': []}
+    # providers run in the scan_env workers
+    PLUGIN_KINDS = ()
+    #: package keys kept per environment in env_licenses
+    ENV_KEYS = ('version', 'license', 'license_expression', 'license_source')
+
+    def __init__(self, envs, max_workers=None, cache_path=':memory:', offline=False,
+                 github_auth=None, concurrency=8, repodata=None, profiler=None, wheelhouse=None,
+                 transport_options=None, policy=None, consumers=None):
+        """
+
+        :param envs: the list of environment prefixes
+        :param max_workers: the number of worker processes, defaults to the
+           number of environments, at most the number of cpus
+        :param cache_path: the LicenseCache path shared by the workers, an
+           in-memory cache is not shared
+        :param offline: if True, do not access the network
+        :param profiler: the Profiler, the workers' profiles are merged into it
+        :param transport_options: the kwargs of each worker's Transport, the
+           request budget applies per worker
+        :param policy: the Policy, evaluated in the workers as packages are
+           found and on the merged packages
+        :param consumers: called with the merged packages, see PyLicenses
+        """
+        super().__init__(github_auth=github_auth, cache=LicenseCache(cache_path, offline=offline),
+                         concurrency=concurrency, repodata=repodata, profiler=profiler,
+                         wheelhouse=wheelhouse, policy=policy, consumers=consumers)
+        self.envs = [os.path.abspath(env) for env in envs]
+        self.max_workers = max_workers or min(len(self.envs), os.cpu_count() or 1) or 1
+        self.cache_path = cache_path
+        self.offline = offline
+        self.transport_options = transport_options
+
+    def discover(self, subset=None, closure=False):
+        """
+        scan all environments and merge their packages
+        """
+        subset = sorted(subset) if subset else None
+        scan = partial(scan_env, subset=subset, closure=closure, cache_path=self.cache_path,
+                       offline=self.offline, github_auth=self.github_auth, concurrency=self.concurrency,
+                       repodata=self.repodata, wheelhouse=self.wheelhouse, policy=self.policy,
+                       profiled=self.profiler is not None,
+                       transport_options=self.transport_options)
+        with self.profiling(), profile.timed('phase', 'environments'):
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                for env, (packages, env_profile) in zip(self.envs, executor.map(scan, self.envs)):
+                    self.merge(env, packages)
+                    self.profiler.merge(env_profile) if env_profile else None
+        self.find_conflicts()
+        self.reset_finalized()
+        self.finalize_packages()
+        return self
+
+    def merge(self, env, packages):
+        """
+        merge the packages of an environment
+
+        Packages are merged by canonical name, the record keeps the name it
+        was first found by. The first environment's data of a package is
+        kept, unless a later environment has a license text where the first
+        one has none. The license of every environment is kept in env_licenses.
+        """
+        for data in packages:
+            name = data['name']
+            record = self._packages.get(canonical_name(name))
+            if record is None:
+                record = self._packages[name] = PackageRecord(data)
+                self._packages.alias(canonical_name(name), name)
+                record['envs'] = {}
+                record['env_licenses'] = {}
+            elif not self.has_license(record) and self.has_license(data):
+                kept = {k: record[k] for k in ('name', 'envs', 'env_licenses')}
+                record.update(data)
+                record.update(kept)
+            record['envs'][env] = data.get('version')
+            record['env_licenses'][env] = {k: data.get(k) for k in self.ENV_KEYS}
+        return self
+
+    def find_conflicts(self):
+        """
+        flag packages whose license differs between environments
+
+        The license_conflict key of such packages lists the licenses, e.g.
+        a version that changed its license, and a warning is issued.
+
+        :return: dict of package name => list of licenses
+        """
+        conflicts = {}
+        for pkg, data in self._packages.items():
+            if pkg != data.get('name') or len(data.get('env_licenses') or {}) < 2:
+                continue
+            licenses = sorted({package_expression(env_data) or 'unknown'
+                               for env_data in data['env_licenses'].values()})
+            if len(licenses) > 1:
+                data['license_conflict'] = conflicts[pkg] = licenses
+                warnings.warn('{}: the license differs between environments, {}'.format(
+                    pkg, ', '.join(licenses)))
+        return conflicts
+
+    @staticmethod
+    def has_license(data):
+        return any(data.get(k) for k in ('license_source', 'license_text'))
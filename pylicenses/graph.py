@@ -0,0 +1,348 @@
+import json
+import os
+import re
+import sys
+from array import array
+from collections import deque
+from functools import lru_cache
+from glob import glob
+
+from packaging.markers import default_environment
+from packaging.requirements import Requirement, InvalidRequirement
+from packaging.version import Version, InvalidVersion
+
+from pylicenses.providers import canonical_name
+
+NAME_RE = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)')
+# the variables of markers, and the quoted values of a marker
+MARKER_NAME_RE = re.compile(r'\b({})\b'.format('|'.join(default_environment())))
+QUOTED_RE = re.compile(r'"[^"]*"|\'[^\']*\'')
+
+# marker values of the platforms of conda packages, by the platform of their subdir
+CONDA_PLATFORMS = {
+    'linux': dict(os_name='posix', sys_platform='linux', platform_system='Linux'),
+    'osx': dict(os_name='posix', sys_platform='darwin', platform_system='Darwin'),
+    'win': dict(os_name='nt', sys_platform='win32', platform_system='Windows'),
+}
+# platform_machine by conda subdir
+CONDA_MACHINES = {
+    'linux-64': 'x86_64', 'linux-32': 'i686', 'linux-aarch64': 'aarch64', 'linux-ppc64le': 'ppc64le',
+    'linux-s390x': 's390x', 'linux-armv7l': 'armv7l', 'osx-64': 'x86_64', 'osx-arm64': 'arm64',
+    'win-64': 'AMD64', 'win-32': 'x86', 'win-arm64': 'ARM64',
+}
+
+
+def python_versions(full_version):
+    """
+    return the python_version and python_full_version markers of a version, e.g. 3.8.10
+    """
+    parts = full_version.split('.')
+    return dict(python_version='.'.join(parts[:2]), python_full_version='.'.join(parts[:3]))
+
+
+def prefix_environment(prefix):
+    """
+    return the marker values known of the python environment at prefix
+
+    The values are taken from the python package of a conda environment,
+    the pyvenv.cfg of a virtual environment or else the lib/pythonX.Y
+    directory, which only tells python_version.
+    """
+    for path in glob(os.path.join(prefix, 'conda-meta', 'python-[0-9]*.json')):
+        try:
+            with open(path) as fin:
+                meta = json.load(fin)
+        except (OSError, ValueError):
+            continue
+        environment = python_versions(meta['version'])
+        subdir = meta.get('subdir') or ''
+        environment.update(CONDA_PLATFORMS.get(subdir.split('-')[0], {}))
+        if subdir in CONDA_MACHINES:
+            environment['platform_machine'] = CONDA_MACHINES[subdir]
+        if 'pypy' not in meta.get('build', ''):
+            environment.update(implementation_name='cpython', platform_python_implementation='CPython',
+                               implementation_version=environment['python_full_version'])
+        return environment
+    try:
+        with open(os.path.join(prefix, 'pyvenv.cfg')) as fin:
+            config = dict(line.split('=', 1) for line in fin if '=' in line)
+    except OSError:
+        config = {}
+    config = {k.strip(): v.strip() for k, v in config.items()}
+    version = config.get('version') or config.get('version_info')
+    if version:
+        return python_versions(version)
+    versions = glob(os.path.join(prefix, 'lib', 'python[0-9]*'))
+    if len(versions) == 1:
+        return dict(python_version=os.path.basename(versions[0])[len('python'):])
+    return {}
+
+
+def marker_environment(prefix=None):
+    """
+    return the environment markers are evaluated against
+
+    :param prefix: the target environment, defaults to the running
+       interpreter. Of another prefix only the values that are known are
+       returned, see prefix_environment() and marker_applies().
+    """
+    if prefix is None or os.path.realpath(prefix) == os.path.realpath(sys.prefix):
+        return default_environment()
+    return prefix_environment(prefix)
+
+
+def marker_applies(marker, environment, extra=''):
+    """
+    True if the marker is met in environment, or cannot be decided
+
+    A marker using a variable that is not in environment, i.e. not known
+    of the target environment, is taken as met, so that no dependency is
+    dropped by guessing.
+
+    :param marker: the packaging Marker, or None
+    :param extra: the extra the requirement is evaluated for, '' for none
+    """
+    if marker is None:
+        return True
+    if set(MARKER_NAME_RE.findall(QUOTED_RE.sub('', str(marker)))) - set(environment):
+        return True
+    return marker.evaluate(dict(environment, extra=extra))
+
+
+@lru_cache(maxsize=None)
+def parse_requirement(spec):
+    """
+    return the tuple (name, extras, marker) of a PEP 508 requirement, or None
+
+    Requirements that cannot be parsed as PEP 508 (e.g. conda dependencies
+    like 'python >=3.6,<3.7.0a0') are reduced to their leading name.
+    """
+    try:
+        req = Requirement(spec)
+    except InvalidRequirement:
+        match = NAME_RE.match(spec)
+        return (match.group(1), frozenset(), None) if match else None
+    return req.name, frozenset(req.extras), req.marker
+
+
+def requirement_specs(data):
+    """
+    return the list of requirement strings of a package, pip and conda
+    """
+    specs = []
+    for key in ('requires_dist', 'depends'):
+        value = data.get(key) or []
+        # a single string in state files of previous versions
+        specs.extend([value] if isinstance(value, str) else value)
+    return specs
+
+
+def required_packages(data, environment, extras=('',)):
+    """
+    return dict of name => extras of the packages a package requires in the marker environment
+
+    :param extras: the extras the package is requested with, '' for none.
+       The extras of each required package include '', e.g. requests[socks]
+       is {'', 'socks'}
+    """
+    required = {}
+    for spec in requirement_specs(data):
+        req = parse_requirement(spec)
+        if req is None:
+            continue
+        name, req_extras, marker = req
+        if any(marker_applies(marker, environment, extra) for extra in extras):
+            required.setdefault(name, {''}).update(req_extras)
+    return required
+
+
+class DependencyGraph(object):
+    """
+    The package dependency graph in compressed sparse row (CSR) arrays
+
+    Nodes are PEP 503 canonical package names, so that pip and conda names
+    of the same package (e.g. PyYAML and pyyaml) are one node. The targets
+    of node i are indices[indptr[i]:indptr[i + 1]], the sources requiring it
+    are rindices[rindptr[i]:rindptr[i + 1]]. All queries traverse the arrays
+    in O(V + E).
+    """
+
+    def __init__(self, nodes, edges, labels=None):
+        """
+
+        :param nodes: the list of canonical node names
+        :param edges: iterable of (source, target) node indices
+        :param labels: optional dict of canonical name => package name
+        """
+        self.nodes = list(nodes)
+        self.index = {name: i for i, name in enumerate(self.nodes)}
+        self.labels = labels or {}
+        edges = sorted(set(edges))
+        self.indptr, self.indices = self._csr(edges, len(self.nodes))
+        self.rindptr, self.rindices = self._csr(sorted((t, s) for s, t in edges), len(self.nodes))
+
+    @staticmethod
+    def _csr(edges, size):
+        indptr = array('l', [0] * (size + 1))
+        indices = array('l', (target for source, target in edges))
+        for source, target in edges:
+            indptr[source + 1] += 1
+        for i in range(size):
+            indptr[i + 1] += indptr[i]
+        return indptr, indices
+
+    @classmethod
+    def from_packages(cls, packages, environment=None):
+        """
+        build the graph of packages
+
+        Markers are evaluated against environment, with the extras each
+        package is requested with by other packages, see marker_applies().
+        Dependencies that are not installed are not part of the graph.
+
+        :param packages: dict of pkg => data, e.g. PyLicenses.packages
+        :param environment: the marker environment, see marker_environment()
+        """
+        environment = marker_environment() if environment is None else environment
+        labels = {}
+        requirements = {}
+        for pkg, data in packages.items():
+            if pkg != data.get('name'):
+                # only use basic package names, not versioned
+                continue
+            node = canonical_name(pkg)
+            labels.setdefault(node, pkg)
+            reqs = requirements.setdefault(node, [])
+            for spec in requirement_specs(data):
+                req = parse_requirement(spec)
+                if req is not None:
+                    reqs.append(req)
+        nodes = sorted(labels)
+        index = {name: i for i, name in enumerate(nodes)}
+        # extras each package is requested with, e.g. requests[socks]. A
+        # package is evaluated again whenever it is requested with a new
+        # extra, so that extras propagate through the whole closure
+        extras = {node: {''} for node in nodes}
+        edges = set()
+        pending = deque(nodes)
+        queued = set(nodes)
+        while pending:
+            node = pending.popleft()
+            queued.discard(node)
+            for name, req_extras, marker in requirements[node]:
+                target = canonical_name(name)
+                if target not in index or target == node:
+                    continue
+                if not any(marker_applies(marker, environment, extra) for extra in extras[node]):
+                    continue
+                edges.add((index[node], index[target]))
+                if not req_extras <= extras[target]:
+                    extras[target] |= req_extras
+                    if target not in queued:
+                        queued.add(target)
+                        pending.append(target)
+        return cls(nodes, edges, labels=labels)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def label(self, i):
+        name = self.nodes[i]
+        return self.labels.get(name, name)
+
+    def _id(self, name):
+        return self.index[canonical_name(name)]
+
+    def dependencies(self, name):
+        """
+        return the list of packages directly required by name
+        """
+        i = self._id(name)
+        return [self.label(j) for j in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def dependents(self, name):
+        """
+        return the list of packages directly requiring name
+        """
+        i = self._id(name)
+        return [self.label(j) for j in self.rindices[self.rindptr[i]:self.rindptr[i + 1]]]
+
+    def _traverse(self, starts, indptr, indices):
+        seen = bytearray(len(self.nodes))
+        queue = deque(starts)
+        for i in starts:
+            seen[i] = 1
+        while queue:
+            i = queue.popleft()
+            for j in indices[indptr[i]:indptr[i + 1]]:
+                if not seen[j]:
+                    seen[j] = 1
+                    queue.append(j)
+        return seen
+
+    def closure(self, names, reverse=False):
+        """
+        return the set of packages transitively required by names, including names
+
+        :param reverse: if True, return the packages transitively requiring names
+        """
+        starts = [self._id(name) for name in names]
+        indptr, indices = (self.rindptr, self.rindices) if reverse else (self.indptr, self.indices)
+        seen = self._traverse(starts, indptr, indices)
+        return {self.label(i) for i, flag in enumerate(seen) if flag}
+
+    def roots(self):
+        """
+        return the list of primary packages, i.e. not required by any other package
+        """
+        return [self.label(i) for i in range(len(self.nodes)) if self.rindptr[i] == self.rindptr[i + 1]]
+
+    def why(self, name):
+        """
+        return the shortest path of packages from a primary package to name
+
+        :return: list of package names starting with a primary package and
+           ending with name, or None if name is only required within a cycle
+        """
+        target = self._id(name)
+        # breadth first search from target towards the roots
+        parent = array('l', [-1] * len(self.nodes))
+        parent[target] = target
+        queue = deque([target])
+        while queue:
+            i = queue.popleft()
+            if self.rindptr[i] == self.rindptr[i + 1]:
+                path = [i]
+                while path[-1] != target:
+                    path.append(parent[path[-1]])
+                return [self.label(j) for j in path]
+            for j in self.rindices[self.rindptr[i]:self.rindptr[i + 1]]:
+                if parent[j] == -1:
+                    parent[j] = i
+                    queue.append(j)
+        return None
+
+    def edges(self):
+        for i in range(len(self.nodes)):
+            for j in self.indices[self.indptr[i]:self.indptr[i + 1]]:
+                yield i, j
+
+    def as_dict(self):
+        return {
+            'nodes': [self.label(i) for i in range(len(self.nodes))],
+            'edges': [[i, j] for i, j in self.edges()],
+        }
+
+    def write_json(self, fout):
+        json.dump(self.as_dict(), fout)
+
+    def write_dot(self, fout):
+        """
+        write the graph in graphviz DOT format, one line per node and edge
+        """
+        fout.write('digraph dependencies {\n')
+        for i in range(len(self.nodes)):
+            fout.write('  n{} [label={}];\n'.format(i, json.dumps(self.label(i))))
+        for i, j in self.edges():
+            fout.write('  n{} -> n{};\n'.format(i, j))
+        fout.write('}\n')
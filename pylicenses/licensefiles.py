@@ -0,0 +1,193 @@
+import os
+import threading
+from collections import namedtuple
+
+from pylicenses import profile
+from pylicenses.providers import canonical_name
+
+#: file name prefixes of license files, in order of preference
+LICENSE_PREFIXES = ('LICENSE', 'LICENCE', 'COPYING')
+
+#: a license file attributed to its distribution
+LicenseFile = namedtuple('LicenseFile', ['path', 'dist_name', 'name'])
+
+
+def is_license_file(filename):
+    return filename.upper().startswith(LICENSE_PREFIXES)
+
+
+def license_preference(filename):
+    upper = os.path.basename(filename).upper()
+    for i, prefix in enumerate(LICENSE_PREFIXES):
+        if upper.startswith(prefix):
+            return i
+    return len(LICENSE_PREFIXES)
+
+
+def split_dist_info_name(dirname):
+    """
+    return (dist_name, name) from a .dist-info or .egg-info directory name
+
+    e.g. tornado-5.1.1.dist-info => (tornado-5.1.1, tornado)
+         foo_bar-1.0-py3.6.egg-info => (foo_bar-1.0, foo_bar)
+    """
+    dist_name = dirname.rsplit('.', 1)[0]
+    parts = dist_name.split('-')
+    if len(parts) > 2 and parts[-1].startswith('py'):
+        # egg-info may have a python version tag
+        parts = parts[:-1]
+    dist_name = '-'.join(parts)
+    # versions never contain a dash, names may (legacy)
+    name = dist_name.rsplit('-', 1)[0] if len(parts) > 1 else dist_name
+    return dist_name, name
+
+
+def split_conda_dist_name(dist_name):
+    """
+    return name from a conda name-version-build directory name
+
+    e.g. mkl-service-1.1.2-py36h17a0993_4 => mkl-service
+    """
+    name_parts = dist_name.split('-')
+    if len(name_parts) > 2:
+        return '-'.join(name_parts[:-2])
+    return name_parts[0]
+
+
+class LicenseFileIndex(object):
+    """
+    Single-pass index of license files by distribution
+
+    Instead of globbing recursively for LICENSE/COPYING files, every root
+    is listed once and only the metadata directories are visited:
+
+    * site-packages: */*.dist-info, */*.egg-info, including licenses/
+      subdirectories, and license files listed in the RECORD of the dist
+    * conda pkgs: pkgs/*/info, including info/licenses/
+
+    Each file is attributed to its distribution from the directory name of
+    the metadata directory. Scan results are kept per root, so the same index
+    can be shared by all providers and repeated discover() runs.
+    """
+
+    def __init__(self):
+        self._roots = {}
+        self._lock = threading.Lock()
+
+    def site_packages(self, root, names=None):
+        """
+        return list of LicenseFile in a site-packages directory
+
+        :param names: if given, only the distributions of these canonical
+           names are visited (and not kept in the index)
+        """
+        if names is not None and (root, 'site-packages') not in self._roots:
+            return self._scan_site_packages(root, names=names)
+        files = self._scan(root, 'site-packages', self._scan_site_packages)
+        if names is not None:
+            files = [f for f in files if canonical_name(f.name) in names]
+        return files
+
+    def conda_pkgs(self, root, dist_names=None):
+        """
+        return list of LicenseFile in a conda pkgs directory
+
+        :param dist_names: if given, only the info/ of these packages
+           (name-version-build) is visited (and not kept in the index)
+        """
+        if dist_names is not None and (root, 'conda-pkgs') not in self._roots:
+            return self._scan_conda_pkgs(root, dist_names=dist_names)
+        files = self._scan(root, 'conda-pkgs', self._scan_conda_pkgs)
+        if dist_names is not None:
+            files = [f for f in files if f.dist_name in dist_names]
+        return files
+
+    def invalidate(self, root=None):
+        with self._lock:
+            if root is None:
+                self._roots.clear()
+            else:
+                self._roots = {k: v for k, v in self._roots.items() if k[0] != root}
+
+    def _scan(self, root, layout, scanner):
+        key = (root, layout)
+        with self._lock:
+            if key not in self._roots:
+                self._roots[key] = scanner(root) if os.path.isdir(root) else []
+            return self._roots[key]
+
+    def _scan_site_packages(self, root, names=None):
+        files = []
+        for entry in _scandir(root):
+            if not entry.name.endswith(('.dist-info', '.egg-info')) or not entry.is_dir():
+                continue
+            dist_name, name = split_dist_info_name(entry.name)
+            if names is not None and canonical_name(name) not in names:
+                continue
+            paths = self._license_files(entry.path)
+            paths.extend(self._record_license_files(root, entry.path))
+            files.extend(LicenseFile(path, dist_name, name) for path in _preferred(paths))
+        return files
+
+    def _scan_conda_pkgs(self, root, dist_names=None):
+        files = []
+        if dist_names is None:
+            entries = [(entry.name, entry.path) for entry in _scandir(root) if entry.is_dir()]
+        else:
+            # direct lookup, no listing of the pkgs directory
+            entries = [(dist_name, os.path.join(root, dist_name)) for dist_name in sorted(dist_names)]
+        for dist_name, pkg_dir in entries:
+            paths = self._license_files(os.path.join(pkg_dir, 'info'))
+            name = split_conda_dist_name(dist_name)
+            files.extend(LicenseFile(path, dist_name, name) for path in _preferred(paths))
+        return files
+
+    def _license_files(self, path):
+        files = []
+        for entry in _scandir(path):
+            if entry.is_dir():
+                if entry.name == 'licenses':
+                    files.extend(self._all_files(entry.path))
+            elif is_license_file(entry.name):
+                files.append(entry.path)
+        return files
+
+    def _all_files(self, path):
+        files = []
+        for entry in _scandir(path):
+            if entry.is_dir():
+                files.extend(self._all_files(entry.path))
+            else:
+                files.append(entry.path)
+        return files
+
+    def _record_license_files(self, root, dist_info):
+        # license files installed outside the .dist-info directory, e.g.
+        # site-packages/foo/LICENSE, are listed in the RECORD
+        files = []
+        try:
+            with open(os.path.join(dist_info, 'RECORD')) as fin:
+                record = fin.read()
+                profile.count_read(fin)
+            for line in record.splitlines():
+                relpath = line.split(',', 1)[0]
+                if is_license_file(os.path.basename(relpath)) and '.dist-info/' not in relpath:
+                    path = os.path.normpath(os.path.join(root, relpath))
+                    files.append(path) if os.path.isfile(path) else None
+        except OSError:
+            pass
+        return files
+
+
+def _scandir(path):
+    try:
+        with os.scandir(path) as entries:
+            entries = list(entries)
+    except OSError:
+        return []
+    profile.count('files_scanned', len(entries))
+    return entries
+
+
+def _preferred(paths):
+    return sorted(paths, key=lambda p: (license_preference(p), p))
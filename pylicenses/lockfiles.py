@@ -0,0 +1,34 @@
+import os
+
+from pylicenses import PyLicenses
+
+
+class LockfileLicenses(PyLicenses):
+    """
+    The packages listed in requirements, lockfile or conda spec files
+
+    Nothing is installed or scanned, see LockfileProvider. Licenses are
+    resolved from the conda package cache and by the fallback providers,
+    i.e. from channel repodata, the license corpus and the (possibly
+    offline) pypi/github cache.
+    """
+    PROVIDERS = {
+        'primary': ['lockfile'],
+        'fallback': PyLicenses.PROVIDERS['fallback'],
+    }
+    # nothing is installed, primary plugins would scan the environment
+    PLUGIN_KINDS = ('fallback',)
+
+    def __init__(self, specs, wheelhouse=None, **kwargs):
+        """
+
+        :param specs: list of requirements.txt, pip-compile lockfiles,
+           conda environment.yml or explicit spec files, or directories of
+           package archives
+        :param wheelhouse: list of directories or files of package archives
+           to take licenses from, spec directories are added
+        :param kwargs: passed to PyLicenses
+        """
+        self.specs = [os.path.abspath(path) for path in specs]
+        wheelhouse = list(wheelhouse or []) + [path for path in self.specs if os.path.isdir(path)]
+        super().__init__(wheelhouse=wheelhouse, **kwargs)
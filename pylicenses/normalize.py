@@ -0,0 +1,320 @@
+"""
+License name normalization to SPDX license expressions
+
+    normalize('GPL3 with runtime exception')  => 'GPL-3.0-only WITH GCC-exception-3.1'
+    normalize('MIT/Apache 2.0')               => 'MIT OR Apache-2.0'
+    normalize('License :: OSI Approved :: MIT License') => 'MIT'
+    normalize('License :: OSI Approved :: BSD License') => 'LicenseRef-BSD'
+
+Free form license names are parsed into an expression of AND, OR and WITH
+operators (also accepting the separators / , & |), each license name is
+looked up in a precompiled alias table. Unknown names are kept as
+LicenseRef-<name>, ids that already are LicenseRef-<name> or
+DocumentRef-<doc>:LicenseRef-<name> are kept as they are, so that
+normalizing an expression again does not change it. Names of license families that do not say which version
+or variant applies (e.g. GPL, LGPL, BSD, Apache, Python) are LicenseRef-<family>, not a
+guessed SPDX id.
+"""
+import re
+from functools import lru_cache
+
+# spdx id => known aliases, the spdx id itself is always an alias
+LICENSE_ALIASES = {
+    '0BSD': ['zero clause bsd', 'bsd zero clause'],
+    'AFL-3.0': ['academic free license'],
+    'AGPL-3.0-only': ['agpl3', 'gnu affero general public license v3', 'agpl-3.0'],
+    'AGPL-3.0-or-later': ['agpl3+', 'gnu affero general public license v3 or later'],
+    'Apache-2.0': ['apache2', 'apache 2.0', 'asl 2.0', 'apache software 2.0'],
+    'Artistic-2.0': ['artistic 2.0'],
+    'BSD-2-Clause': ['bsd 2', 'bsd 2 clause', 'simplified bsd', 'freebsd'],
+    'BSD-3-Clause': ['bsd 3', 'bsd 3 clause', 'new bsd', 'modified bsd', 'revised bsd'],
+    'BSL-1.0': ['boost', 'boost software', 'boost software 1.0', 'bsl'],
+    'CC0-1.0': ['cc0', 'cc0 1.0 universal', 'cc0 1.0 universal public domain dedication'],
+    'CC-BY-4.0': ['cc by 4.0', 'creative commons attribution 4.0'],
+    'EPL-1.0': ['eclipse public 1.0'],
+    'EPL-2.0': ['eclipse public 2.0'],
+    'GPL-2.0-only': ['gpl2', 'gnu gpl2', 'gnu general public v2', 'gpl-2.0'],
+    'GPL-2.0-or-later': ['gpl2+', 'gnu general public v2 or later'],
+    'GPL-3.0-only': ['gpl3', 'gnu gpl3', 'gnu general public v3', 'gpl-3.0'],
+    'GPL-3.0-or-later': ['gpl3+', 'gnu general public v3 or later'],
+    'HPND': ['historical permission notice and disclaimer'],
+    'ISC': ['isc', 'iscl'],
+    'LGPL-2.1-only': ['lgpl2.1', 'gnu lesser general public v2.1', 'lgpl-2.1'],
+    'LGPL-2.1-or-later': ['lgpl2.1+', 'gnu lesser general public v2.1 or later'],
+    'LGPL-3.0-only': ['lgpl3', 'gnu lesser general public v3', 'lgpl-3.0'],
+    'LGPL-3.0-or-later': ['lgpl3+', 'gnu lesser general public v3 or later'],
+    'LicenseRef-Public-Domain': ['public domain', 'public'],
+    # license families, the version or variant is not known
+    'LicenseRef-AGPL': ['agpl', 'gnu affero general public'],
+    'LicenseRef-Apache': ['apache', 'apache software'],
+    'LicenseRef-BSD': ['bsd', 'bsd style', 'bsd like'],
+    'LicenseRef-GPL': ['gpl', 'gnu gpl', 'gnu general public'],
+    'LicenseRef-LGPL': ['lgpl', 'gnu lgpl', 'gnu lesser general public', 'gnu library or lesser general public',
+                        'gnu library general public'],
+    'LicenseRef-MPL': ['mpl', 'mozilla', 'mozilla public'],
+    'LicenseRef-Python': ['python'],
+    'MIT': ['mit', 'expat', 'mit style', 'mit like'],
+    'MPL-1.1': ['mozilla public 1.1'],
+    'MPL-2.0': ['mpl2', 'mozilla public 2.0'],
+    'NCSA': ['university of illinois/ncsa open source'],
+    'OpenSSL': ['openssl'],
+    'PSF-2.0': ['psf', 'psfl', 'python software foundation'],
+    'Unlicense': ['unlicense'],
+    'WTFPL': ['wtfpl'],
+    'X11': ['x11', 'free software x11'],
+    'Zlib': ['zlib', 'zlib/libpng'],
+    'curl': ['curl'],
+}
+
+# spdx exception id => known aliases
+EXCEPTION_ALIASES = {
+    'Classpath-exception-2.0': ['classpath', 'classpath exception'],
+    'GCC-exception-3.1': ['runtime exception', 'gcc runtime library', 'gcc runtime library exception',
+                          'gcc exception'],
+    'LLVM-exception': ['llvm exception'],
+}
+
+# user defined license references, see the SPDX license expression syntax
+_LICENSE_REF = re.compile(r'(?:DocumentRef-[A-Za-z0-9.-]+:)?LicenseRef-[A-Za-z0-9.-]+', re.IGNORECASE)
+
+# longer license fields are considered license texts, not names
+MAX_NAME_LENGTH = 120
+
+# words that do not distinguish licenses
+_NOISE = re.compile(r'\b(the|licen[cs]e[sd]?|version|agreement)\b'
+                    r'|\(.*?\)|(?<=[a-z])v(?=\d)|\bv(?=\d)')
+# operators are words on their own, not e.g. the -or- of GPL-2.0-or-later
+_OPERATORS = re.compile(r'(\(|\)|(?<![\w-])(?:AND|OR|WITH)(?![\w-]))', re.IGNORECASE)
+_SEPARATORS = [
+    # order matters, 'or later' is not an OR
+    (re.compile(r'\s*(,\s*)?\bor[ -](any )?later( version)?\b', re.IGNORECASE), '+'),
+    (re.compile(r'\s*\+\s*'), '+ '),
+    (re.compile(r'\s*[/|]\s*'), ' OR '),
+    (re.compile(r'\s*[,;&]\s*'), ' AND '),
+]
+
+
+def _key(name):
+    """
+    return the lookup key of a license name, e.g. 'GNU GPL v3' => gnugpl3
+    """
+    key = _NOISE.sub(' ', name.lower())
+    key = re.sub(r'[^a-z0-9.+]', '', key)
+    return re.sub(r'\.0(?=\+|$)', '', key)
+
+
+def _compile(aliases):
+    table = {}
+    for spdx_id, names in aliases.items():
+        for name in [spdx_id] + names:
+            table.setdefault(_key(name), spdx_id)
+    return table
+
+
+LICENSE_TABLE = _compile(LICENSE_ALIASES)
+EXCEPTION_TABLE = _compile(EXCEPTION_ALIASES)
+
+
+def lookup(name):
+    """
+    return the spdx id of a single license name, or None
+    """
+    key = _key(name)
+    if not key:
+        return None
+    spdx_id = LICENSE_TABLE.get(key)
+    if spdx_id is None and key.endswith('+'):
+        # e.g. Apache-2.0+ or LGPL-2.1+, '+' means -or-later
+        spdx_id = LICENSE_TABLE.get(key[:-1])
+        if spdx_id is not None and spdx_id.startswith('LicenseRef-'):
+            # e.g. GPL+, any version of a license family
+            spdx_id = None
+        if spdx_id is not None:
+            spdx_id = spdx_id.replace('-only', '') + ('-or-later' if '-only' in spdx_id else '+')
+    return spdx_id
+
+
+class _Parser(object):
+    """
+    recursive descent parser of license expressions
+
+        expr := and ('OR' and)*
+        and  := with ('AND' with)*
+        with := atom ('WITH' words)?
+        atom := '(' expr ')' | words
+    """
+
+    def __init__(self, text):
+        self.tokens = [t.strip() for t in _OPERATORS.split(text) if t.strip()]
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos].upper() if self.pos < len(self.tokens) else None
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.expr()
+        while self.pos < len(self.tokens):
+            # unbalanced parenthesis or dangling operators, combine the rest
+            self.next()
+            if self.pos < len(self.tokens):
+                node = ('AND', node, self.expr())
+        return node
+
+    def expr(self):
+        node = self.and_()
+        while self.peek() == 'OR':
+            self.next()
+            node = ('OR', node, self.and_())
+        return node
+
+    def and_(self):
+        node = self.with_()
+        while self.peek() == 'AND':
+            self.next()
+            node = ('AND', node, self.with_())
+        return node
+
+    def with_(self):
+        node = self.atom()
+        if self.peek() == 'WITH':
+            self.next()
+            exception = self.next() if self.peek() not in (None, '(', ')', 'AND', 'OR') else ''
+            node = ('WITH', node, exception)
+        return node
+
+    def atom(self):
+        token = self.peek()
+        if token == '(':
+            self.next()
+            node = self.expr()
+            if self.peek() == ')':
+                self.next()
+            return node
+        if token in (None, ')', 'AND', 'OR', 'WITH'):
+            return None
+        return self.next()
+
+
+def _license_ref(name):
+    if _LICENSE_REF.fullmatch(name):
+        return name
+    return 'LicenseRef-' + (re.sub(r'[^A-Za-z0-9.]+', '-', name).strip('-') or 'unknown')
+
+
+def _render(node, parent=None):
+    if node is None:
+        return None
+    if isinstance(node, str):
+        return lookup(node) or _license_ref(node)
+    op, left, right = node
+    if op == 'WITH':
+        license = _render(left, op)
+        exception = EXCEPTION_TABLE.get(_key(right)) if right else None
+        if license is None:
+            return None
+        return '{} WITH {}'.format(license, exception) if exception else license
+    left, right = _render(left, op), _render(right, op)
+    if left is None or right is None or left == right:
+        return left or right
+    text = '{} {} {}'.format(left, op, right)
+    # AND binds stronger than OR
+    return '({})'.format(text) if parent == 'AND' and op == 'OR' else text
+
+
+@lru_cache(maxsize=4096)
+def normalize(name):
+    """
+    return the SPDX license expression of a license name or classifier
+
+    :param name: the license name, e.g. 'BSD 3-clause', 'GPL/MIT' or
+       'License :: OSI Approved :: MIT License'
+    :return: the SPDX expression, or None if the name is empty, unknown or
+       rather a license text than a name
+    """
+    if not name or not isinstance(name, str):
+        return None
+    name = name.strip()
+    if '\n' in name or len(name) > MAX_NAME_LENGTH:
+        # some packages put the full license text in the license field
+        return None
+    if name.startswith('License ::'):
+        return normalize_classifier(name)
+    if name.lower() in ('unknown', 'none', 'other', 'n/a', 'license'):
+        return None
+    spdx_id = lookup(name)
+    if spdx_id is not None:
+        return spdx_id
+    text = name
+    for pattern, replacement in _SEPARATORS:
+        text = pattern.sub(replacement, text)
+    return _render(_Parser(text).parse())
+
+
+def normalize_classifier(classifier):
+    """
+    return the SPDX id of a Trove license classifier, or None
+    """
+    parts = [part.strip() for part in classifier.split('::')]
+    if parts[0] != 'License' or len(parts) < 2 or parts[-1] in ('OSI Approved', 'Other/Proprietary License'):
+        return None
+    return lookup(parts[-1]) or _license_ref(parts[-1])
+
+
+def normalize_classifiers(classifiers):
+    """
+    return the SPDX expression of all Trove license classifiers, or None
+
+    Several license classifiers are combined by OR, as they are usually
+    used to state a choice of licenses.
+    """
+    ids = []
+    for classifier in classifiers or ():
+        spdx_id = normalize_classifier(classifier) if classifier.startswith('License ::') else None
+        if spdx_id and spdx_id not in ids:
+            ids.append(spdx_id)
+    return ' OR '.join(ids) or None
+
+
+def license_ids(expression):
+    """
+    return the list of license ids in an SPDX expression, without exceptions
+    """
+    if not expression:
+        return []
+    ids = []
+    tokens = [t for t in re.split(r'[\s()]+', expression) if t]
+    for i, token in enumerate(tokens):
+        if token in ('AND', 'OR', 'WITH') or (i and tokens[i - 1] == 'WITH'):
+            continue
+        ids.append(token)
+    return ids
+
+
+def parse_expression(expression):
+    """
+    return the parse tree of an SPDX expression
+
+    The tree is a license id, or a tuple (operator, left, right) where
+    operator is AND, OR or WITH. The right side of WITH is the exception id.
+    """
+    return _Parser(expression).parse() if expression else None
+
+
+def package_expression(data):
+    """
+    return the SPDX expression of a package's data, or None
+
+    The expression is taken from the first of the package's license
+    expression metadata, license name, Trove license classifiers, license
+    family or license_spdx_id that can be normalized.
+    """
+    return (normalize(data.get('license_expression'))
+            or normalize(data.get('license'))
+            or normalize_classifiers(data.get('classifiers'))
+            or normalize(data.get('license_family'))
+            or data.get('license_spdx_id'))
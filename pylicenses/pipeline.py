@@ -0,0 +1,99 @@
+"""
+Streaming of package records from providers to consumers
+
+Providers yield partial package records, (pkg, info) tuples, as they find
+them (see PackageProvider.iter_packages_info). merge_stream() merges them
+into the PackageStore. Once no provider is going to change a package, its
+record is finalized and passed to the consumers, callables taking
+(pkg, data), e.g. a ReportWriter's write or LicenseStats:
+
+    stats = LicenseStats()
+    with open('THIRDPARTY-LICENSES.jsonl', 'w') as fout:
+        writer = JsonLinesWriter(fout)
+        writer.open()
+        PyLicenses(consumers=[writer.write, stats]).discover()
+        writer.close()
+
+Packages are finalized by PyLicenses.discover() as soon as the primary
+providers are done for those that have a license text, the others as a
+fallback provider resolves them or the fallback providers give up. License
+texts loaded by consumers are released once all consumers are done with a
+package, so memory does not grow with the license texts of an environment.
+"""
+from collections import defaultdict, Counter
+
+from pylicenses.records import PackageStore
+from pylicenses.scheduler import is_resolved
+
+
+def merge_record(packages, pkg, info):
+    """
+    merge a partial record into packages
+
+    :param packages: the PackageStore, or a dict of pkg => data
+    :param pkg: the package key, e.g. its name or dist_name
+    :param info: the partial record, a mapping. A record that is already
+       stored registers pkg as another key of it
+    :return: the package's record
+    """
+    record = packages.get(pkg)
+    if record is info:
+        return record
+    if isinstance(packages, PackageStore):
+        packages[pkg] = info
+        return packages[pkg]
+    # a plain dict, all keys of a package reference the same data
+    name = info.get('name')
+    if record is None and name and name != pkg and name in packages:
+        record = packages[pkg] = packages[name]
+    if record is None:
+        record = packages[pkg] = info
+    else:
+        record.update(info)
+    return record
+
+
+def merge_stream(packages, stream):
+    """
+    merge partial records into packages as they arrive
+
+    :param packages: the PackageStore
+    :param stream: iterable of (pkg, info) tuples
+    :return: generator of (pkg, record) of every merged record
+    """
+    for pkg, info in stream:
+        yield pkg, merge_record(packages, pkg, info)
+
+
+def consume(consumers, pkg, data):
+    """
+    pass a finalized record to all consumers
+
+    A license text loaded from a local file by the consumers is released
+    afterwards, it is read again when needed.
+    """
+    loaded = getattr(data, 'is_text_loaded', True)
+    for consumer in consumers:
+        consumer(pkg, data)
+    if not loaded and data.is_text_loaded:
+        del data['license_text']
+
+
+class LicenseStats(object):
+    """
+    Count finalized packages with a license text by license
+
+    This is the consumer version of PyLicenses.get_license_stats()
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.by_license = defaultdict(set)
+
+    def __call__(self, pkg, data):
+        if not is_resolved(data):
+            return
+        license = (data.get('license_expression') or data.get('license_family')
+                   or data.get('license', 'unknown'))
+        self.counts[license] += 1
+        self.by_license[license].add(data.get('name') or pkg)
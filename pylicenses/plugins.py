@@ -0,0 +1,170 @@
+"""
+Registry of package providers
+
+Providers are referenced by name, e.g. in PyLicenses.PROVIDERS, and imported
+only when they are resolved to their class. Besides the built-in providers,
+other packages can register providers as setuptools entry points in the
+pylicenses.providers group:
+
+    setup(...,
+          entry_points={
+              'pylicenses.providers': [
+                  'npm = pylicenses_npm:NpmProvider',
+              ],
+          })
+
+A plugin provider is added to the fallback providers, unless its class sets
+kind = 'primary'.
+"""
+import threading
+import warnings
+from importlib import import_module
+
+#: the setuptools entry point group of plugin providers
+ENTRY_POINT_GROUP = 'pylicenses.providers'
+
+#: name => 'module:Class' of the built-in providers
+BUILTIN_PROVIDERS = {
+    'pip': 'pylicenses.providers.piplocal:PipProvider',
+    'conda': 'pylicenses.providers.condalocal:CondaProvider',
+    'lockfile': 'pylicenses.providers.lockfile:LockfileProvider',
+    'archive': 'pylicenses.providers.archive:ArchiveProvider',
+    'static': 'pylicenses.providers.static:StaticProvider',
+    'spdx': 'pylicenses.providers.spdx:SpdxProvider',
+    'condachannel': 'pylicenses.providers.condachannel:CondaChannelProvider',
+    'pypi': 'pylicenses.providers.pypi:PyPiProvider',
+}
+
+
+def import_object(spec):
+    """
+    return the object referenced by 'module:attribute'
+    """
+    module, _, attr = spec.partition(':')
+    obj = import_module(module)
+    for part in attr.split('.') if attr else []:
+        obj = getattr(obj, part)
+    return obj
+
+
+def iter_entry_points(group):
+    """
+    return list of (name, entry point) of group, the entry points are not loaded
+    """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        # python < 3.8
+        from pkg_resources import iter_entry_points as pkg_entry_points
+        return [(ep.name, ep) for ep in pkg_entry_points(group)]
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        eps = eps.select(group=group)
+    else:
+        # python < 3.10
+        eps = eps.get(group, [])
+    return [(ep.name, ep) for ep in eps]
+
+
+class ProviderRegistry(object):
+    """
+    Lazy registry of provider classes by name
+
+    Names are resolved to classes on first use. Entry points are only
+    looked up when a name is not built in, or when the plugins are asked
+    for.
+    """
+
+    def __init__(self, builtins=None, group=ENTRY_POINT_GROUP):
+        """
+
+        :param builtins: dict of name => 'module:Class' or class, defaults
+           to BUILTIN_PROVIDERS
+        :param group: the entry point group of plugins, None to disable plugins
+        """
+        self.builtins = dict(BUILTIN_PROVIDERS if builtins is None else builtins)
+        self.group = group
+        self._classes = {}
+        self._entry_points = None
+        # plugins that failed to load
+        self._broken = set()
+        self._lock = threading.Lock()
+
+    def register(self, name, provider):
+        """
+        register a provider
+
+        :param name: the name of the provider
+        :param provider: the provider class or its 'module:Class'
+        """
+        with self._lock:
+            self.builtins[name] = provider
+            self._classes.pop(name, None)
+        return self
+
+    @property
+    def entry_points(self):
+        with self._lock:
+            if self._entry_points is None:
+                self._entry_points = dict(iter_entry_points(self.group)) if self.group else {}
+            return self._entry_points
+
+    def plugins(self):
+        """
+        return the names of providers registered as entry points, not built in
+        """
+        return sorted(name for name in self.entry_points if name not in self.builtins)
+
+    def names(self):
+        return sorted(set(self.builtins) | set(self.plugins()))
+
+    def plugin_classes(self):
+        """
+        return list of (name, class) of the plugins that can be loaded
+
+        A plugin that fails to load is skipped with a warning, once, so that a
+        broken plugin does not break every scan.
+        """
+        classes = []
+        for name in self.plugins():
+            if name in self._broken:
+                continue
+            try:
+                classes.append((name, self.get(name)))
+            except Exception as e:
+                self._broken.add(name)
+                warnings.warn('provider plugin {} is skipped, it failed to load: {!r}'.format(name, e))
+        return classes
+
+    def get(self, name):
+        """
+        return the provider class of name, importing it if needed
+
+        :raises: KeyError if there is no such provider
+        """
+        cls = self._classes.get(name)
+        if cls is not None:
+            return cls
+        if name in self.builtins:
+            spec = self.builtins[name]
+            cls = import_object(spec) if isinstance(spec, str) else spec
+        elif name in self.entry_points:
+            cls = self.entry_points[name].load()
+        else:
+            raise KeyError('no provider {}, known are {}'.format(name, ', '.join(self.names())))
+        self._classes[name] = cls
+        return cls
+
+    def resolve(self, provider):
+        """
+        return the provider class of a name, 'module:Class' or class
+        """
+        if not isinstance(provider, str):
+            return provider
+        if ':' in provider:
+            return import_object(provider)
+        return self.get(provider)
+
+
+#: the default registry
+registry = ProviderRegistry()
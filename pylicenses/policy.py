@@ -0,0 +1,211 @@
+"""
+License policy, allow, deny or review packages by their SPDX license
+
+    policy = Policy(allow=['MIT', 'BSD-*', 'Apache-2.0'], deny=['GPL-*', 'AGPL-*'],
+                    exceptions={'readline': ['GPL-3.0-only']}, fail_fast=True)
+    PyLicenses(policy=policy).discover()
+
+The lists hold SPDX license ids, matched case insensitively, with shell
+style wildcards (e.g. GPL-*). An id may include its exception, e.g.
+'GPL-3.0-only WITH GCC-exception-3.1'. Licenses named without a version are
+LicenseRef-<family> ids (e.g. LicenseRef-GPL, see pylicenses.normalize),
+GPL-* does not match them. The rules are compiled once, each
+distinct license expression is evaluated once.
+
+The verdict of a package is taken from its license expression: a choice of
+licenses (OR) gets the best verdict of its alternatives, a combination
+(AND) the worst. Per package exceptions allow the listed ids, or any license
+with '*', for that package only. Ids on none of the lists are allowed, or
+reviewed if an allow list is given. Packages without any license are
+reviewed, see unknown.
+
+PyLicenses evaluates the policy as soon as a package's license is known,
+i.e. after each primary provider and whenever a fallback provider updates a
+package. With fail_fast the first denied package raises PolicyViolation,
+so that a scan stops before the (slow) network providers run.
+
+A policy file is a json object with the same keys as Policy, e.g.
+
+    {
+      "allow": ["MIT", "BSD-*", "Apache-2.0", "PSF-2.0"],
+      "deny": ["GPL-*", "AGPL-*"],
+      "review": ["LGPL-*", "MPL-2.0"],
+      "exceptions": {"readline": ["GPL-3.0-only"]}
+    }
+"""
+import json
+import re
+
+from pylicenses.normalize import package_expression, parse_expression
+from pylicenses.providers import canonical_name
+
+ALLOW, REVIEW, DENY = 'allow', 'review', 'deny'
+#: verdicts from best to worst
+VERDICTS = (ALLOW, REVIEW, DENY)
+
+
+class PolicyViolation(Exception):
+    """
+    a package's license is denied by the policy
+    """
+
+    def __init__(self, finding):
+        super().__init__(finding)
+        self.finding = finding
+
+    def __str__(self):
+        return '{name} {version} is licensed under {license}, which is denied by the policy'.format(
+            **self.finding)
+
+
+def compile_ids(patterns):
+    """
+    return a regex matching any of the license id patterns, or None
+
+    * and ? match any characters of a single id, i.e. GPL-* does not
+    match GPL-3.0-only WITH GCC-exception-3.1
+    """
+    if not patterns:
+        return None
+    patterns = (re.escape(' '.join(pattern.split())).replace(r'\*', r'\S*').replace(r'\?', r'\S')
+                for pattern in patterns)
+    return re.compile('|'.join(patterns), re.IGNORECASE)
+
+
+class Policy(object):
+    """
+    A compiled license policy
+    """
+    LISTS = ('allow', 'deny', 'review')
+
+    def __init__(self, allow=None, deny=None, review=None, exceptions=None, unknown=REVIEW,
+                 fail_fast=False):
+        """
+
+        :param allow: list of license ids that are allowed. If given, all
+           ids not listed anywhere are reviewed
+        :param deny: list of license ids that are denied
+        :param review: list of license ids that need a review
+        :param exceptions: dict of package name => list of license ids
+           allowed for this package, or '*' for any license
+        :param unknown: the verdict of packages without a license
+        :param fail_fast: if True, raise PolicyViolation on the first denied package
+        """
+        if unknown not in VERDICTS:
+            raise ValueError('unknown must be one of {}'.format(', '.join(VERDICTS)))
+        # the first matching list decides
+        self.rules = [(verdict, compile_ids(ids)) for verdict, ids in ((DENY, deny), (REVIEW, review),
+                                                                     (ALLOW, allow)) if ids]
+        self.default = REVIEW if allow else ALLOW
+        self.exceptions = {canonical_name(name): compile_ids(['*'] if ids == '*' else ids)
+                           for name, ids in (exceptions or {}).items()}
+        self.unknown = unknown
+        self.fail_fast = fail_fast
+        # expression => verdict, package name => finding
+        self._verdicts = {}
+        self.findings = {}
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        return the Policy of a json policy file
+
+        :param kwargs: passed to Policy, ids of the allow, deny and review
+           lists are added to the file's lists, other settings override the file's
+        """
+        with open(path) as fin:
+            options = json.load(fin)
+        unsupported = set(options) - set(cls.LISTS) - {'exceptions', 'unknown'}
+        if unsupported:
+            raise ValueError('{}: unsupported keys {}'.format(path, ', '.join(sorted(unsupported))))
+        for k, v in kwargs.items():
+            if v is not None:
+                options[k] = list(options.get(k) or []) + list(v) if k in cls.LISTS else v
+        return cls(**options)
+
+    def id_verdict(self, license_id):
+        for verdict, pattern in self.rules:
+            if pattern.fullmatch(license_id):
+                return verdict
+        return None
+
+    def node_verdict(self, node, exception=None):
+        if node is None:
+            return self.unknown
+        if isinstance(node, str):
+            if exception is not None and exception.fullmatch(node):
+                return ALLOW
+            return self.id_verdict(node) or self.default
+        op, left, right = node
+        if op == 'WITH':
+            # a rule on the license with its exception takes precedence
+            with_id = '{} WITH {}'.format(left, right) if isinstance(left, str) else None
+            if with_id and exception is not None and exception.fullmatch(with_id):
+                return ALLOW
+            return (self.id_verdict(with_id) if with_id else None) or self.node_verdict(left, exception)
+        verdicts = [VERDICTS.index(self.node_verdict(child, exception)) for child in (left, right)]
+        return VERDICTS[min(verdicts) if op == 'OR' else max(verdicts)]
+
+    def verdict(self, expression, name=None):
+        """
+        return the verdict on a license expression
+
+        :param expression: the SPDX expression, or None if the license is unknown
+        :param name: the package name, to apply its exceptions
+        """
+        exception = self.exceptions.get(canonical_name(name)) if name else None
+        if exception is not None:
+            return self.node_verdict(parse_expression(expression), exception)
+        if expression not in self._verdicts:
+            self._verdicts[expression] = self.node_verdict(parse_expression(expression))
+        return self._verdicts[expression]
+
+    def evaluate(self, pkg, data, final=False):
+        """
+        evaluate the policy on a package
+
+        Packages are evaluated again only if their license changed.
+
+        :param pkg: the package name
+        :param data: the package data
+        :param final: if True, the package's license is not going to be
+           found, evaluate it even if unknown
+        :return: the finding, a dict of name, version, license and verdict,
+           or None if the license is not known yet
+        :raises: PolicyViolation if the package is denied and fail_fast is True
+        """
+        expression = package_expression(data)
+        if expression is None and not final:
+            return None
+        key = canonical_name(data.get('name') or pkg)
+        finding = self.findings.get(key)
+        if finding is not None and finding['license'] == expression:
+            return finding
+        finding = self.findings[key] = {
+            'name': data.get('name') or pkg,
+            'version': data.get('version'),
+            'license': expression,
+            'verdict': self.verdict(expression, name=key),
+        }
+        if self.fail_fast and finding['verdict'] == DENY:
+            raise PolicyViolation(finding)
+        return finding
+
+    def evaluate_packages(self, packages, final=False):
+        """
+        evaluate the policy on packages
+
+        :param packages: iterable of (pkg, data) tuples, e.g. lic.packages.items()
+        :param final: see evaluate()
+        """
+        for pkg, data in packages:
+            if pkg == data.get('name'):
+                self.evaluate(pkg, data, final=final)
+        return self
+
+    def violations(self, verdicts=(DENY,)):
+        """
+        return the list of findings with one of verdicts, by name
+        """
+        return sorted((finding for finding in self.findings.values() if finding['verdict'] in verdicts),
+                      key=lambda finding: str(finding['name']).lower())
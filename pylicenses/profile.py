@@ -0,0 +1,183 @@
+"""
+Instrumentation of discovery runs
+
+    profiler = Profiler(callbacks=[print])
+    lic = PyLicenses(profiler=profiler).discover()
+    profiler.write('profile.json')
+
+While a Profiler is active (see activate()), the module functions count(),
+http() and timed() record into it, otherwise they do nothing. Every record
+is also passed as an event dict to the callbacks, e.g. to feed a metrics
+pipeline.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+_ACTIVE = None
+
+
+class Profiler(object):
+    """
+    Collect timings and counters of a discovery run
+
+    * phases and providers: wall and cpu seconds, calls
+    * providers: packages offered and resolved
+    * counters: files_scanned, bytes_read, subprocesses, cache_hits,
+      cache_misses, cache_revalidated
+    * hosts: http requests, total and max latency, status codes per host
+
+    cpu seconds are process wide, i.e. include other threads running at
+    the same time.
+    """
+
+    def __init__(self, callbacks=None):
+        self.phases = {}
+        self.providers = {}
+        self.counters = Counter()
+        self.hosts = {}
+        self.callbacks = list(callbacks or [])
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """
+        call callback(event) for every record, event is a dict with an 'event' key
+        """
+        self.callbacks.append(callback)
+
+    def emit(self, event, **data):
+        data['event'] = event
+        for callback in self.callbacks:
+            callback(data)
+
+    @contextmanager
+    def activate(self):
+        """
+        make this the active profiler of the module functions
+        """
+        global _ACTIVE
+        previous, _ACTIVE = _ACTIVE, self
+        try:
+            yield self
+        finally:
+            _ACTIVE = previous
+
+    def _stats(self, kind, name):
+        stats = self.phases if kind == 'phase' else self.providers
+        return stats.setdefault(name, Counter())
+
+    @contextmanager
+    def timed(self, kind, name):
+        """
+        time a phase or provider call
+
+        :param kind: 'phase' or 'provider'
+        :param name: the phase or provider name
+        """
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            with self._lock:
+                stats = self._stats(kind, name)
+                stats.update(wall=wall, cpu=cpu, calls=1)
+            self.emit(kind, name=name, wall=wall, cpu=cpu)
+
+    def resolved(self, provider, offered, resolved):
+        with self._lock:
+            self._stats('provider', provider).update(offered=offered, resolved=resolved)
+        self.emit('resolved', name=provider, offered=offered, resolved=resolved)
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.counters[key] += n
+        self.emit('count', name=key, value=n)
+
+    def http(self, url, seconds, status):
+        host = urlsplit(url).netloc
+        with self._lock:
+            stats = self.hosts.setdefault(host, {'requests': 0, 'wall': 0.0, 'max': 0.0, 'status': Counter()})
+            stats['requests'] += 1
+            stats['wall'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            stats['status'][str(status)] += 1
+        self.emit('http', name=host, url=url, wall=seconds, status=status)
+
+    def merge(self, data):
+        """
+        add the as_dict() of another profiler, e.g. of a worker process
+        """
+        with self._lock:
+            for kind in ('phase', 'provider'):
+                for name, stats in data.get(kind + 's', {}).items():
+                    self._stats(kind, name).update(stats)
+            self.counters.update(data.get('counters', {}))
+            for host, stats in data.get('hosts', {}).items():
+                mine = self.hosts.setdefault(host, {'requests': 0, 'wall': 0.0, 'max': 0.0, 'status': Counter()})
+                mine['requests'] += stats['requests']
+                mine['wall'] += stats['wall']
+                mine['max'] = max(mine['max'], stats['max'])
+                mine['status'].update(stats['status'])
+
+    def as_dict(self):
+        with self._lock:
+            lookups = sum(self.counters[k] for k in ('cache_hits', 'cache_misses', 'cache_revalidated'))
+            hits = self.counters['cache_hits'] + self.counters['cache_revalidated']
+            return {
+                'phases': {name: dict(stats) for name, stats in self.phases.items()},
+                'providers': {name: dict(stats) for name, stats in self.providers.items()},
+                'counters': dict(self.counters),
+                'cache_hit_rate': hits / lookups if lookups else None,
+                'hosts': {host: dict(stats, status=dict(stats['status'])) for host, stats in self.hosts.items()},
+            }
+
+    def write(self, path):
+        with open(path, 'w') as fout:
+            json.dump(self.as_dict(), fout, indent=2)
+
+
+def active():
+    """
+    return the active Profiler, or None
+    """
+    return _ACTIVE
+
+
+def count(key, n=1):
+    if _ACTIVE is not None:
+        _ACTIVE.count(key, n)
+
+
+def count_read(fin):
+    """
+    count a file that was read to its end as bytes_read
+
+    The size is taken from the file, the length of a text read from it
+    counts characters, not bytes.
+    """
+    if _ACTIVE is not None:
+        _ACTIVE.count('bytes_read', os.fstat(fin.fileno()).st_size)
+
+
+def http(url, seconds, status):
+    if _ACTIVE is not None:
+        _ACTIVE.http(url, seconds, status)
+
+
+def resolved(provider, offered, resolved):
+    if _ACTIVE is not None:
+        _ACTIVE.resolved(provider, offered, resolved)
+
+
+@contextmanager
+def timed(kind, name):
+    if _ACTIVE is None:
+        yield
+    else:
+        with _ACTIVE.timed(kind, name):
+            yield
@@ -1,5 +1,106 @@
+import re
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def canonical_name(name):
+    """
+    return the PEP 503 normalized name, e.g. Foo_Bar.baz => foo-bar-baz
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def normalize_subset(subset):
+    """
+    return subset as a frozenset of names and their canonical names, or None
+    """
+    if not subset:
+        return None
+    if isinstance(subset, str):
+        subset = (subset,)
+    return frozenset(subset) | frozenset(canonical_name(name) for name in subset)
+
+
+def in_subset(pkg, subset):
+    """
+    True if subset is None or pkg is in the subset as given by normalize_subset
+    """
+    return subset is None or pkg in subset or canonical_name(pkg) in subset
+
+
+def adapt_packages_info(prov, packages, subset=None):
+    """
+    yield the (pkg, info) tuples of a dict-returning provider
+
+    Fallback providers return a dict of pkg => info, primary providers
+    update packages in place and return it, then its records are yielded.
+
+    :param prov: the provider, implementing get_packages_info()
+    """
+    if subset is None:
+        infos = prov.get_packages_info(packages)
+    else:
+        infos = prov.get_packages_info(packages, subset=subset)
+    yield from (infos or {}).items()
+
+
+def iter_packages_info(prov, packages, subset=None):
+    """
+    return the (pkg, info) tuples of any provider, see PackageProvider.iter_packages_info
+    """
+    if hasattr(prov, 'iter_packages_info'):
+        return prov.iter_packages_info(packages, subset=subset)
+    return adapt_packages_info(prov, packages, subset=subset)
+
+
+# provider cost classes, cheaper providers run first
+COST_LOCAL = 0
+COST_SUBPROCESS = 1
+COST_NETWORK = 2
+
+
 class PackageProvider(object):
     init_kwargs = []
+    # the cost class of querying this provider
+    cost = COST_LOCAL
+    # the package fields this provider can fill
+    provides = ('license_source', 'license_text')
+
+    def accepts(self, pkg, data):
+        """
+        True if this provider can possibly provide information for the package
+        """
+        return True
 
     def get_packages_info(self):
         raise NotImplementedError
+
+    def iter_packages_info(self, packages, subset=None):
+        """
+        yield (pkg, info) tuples of partial package records as they are found
+
+        The records are merged into packages as they are yielded, see
+        pylicenses.pipeline. Fallback providers yield new dicts and leave
+        the package data to the scheduler, which merges them in order of
+        precedence. The default adapts get_packages_info(), see
+        adapt_packages_info().
+        """
+        return adapt_packages_info(self, packages, subset=subset)
+
+    def get_fingerprints(self):
+        """
+        return dict of distribution key => (fingerprint, package name)
+
+        Providers that read installed distributions return a fingerprint
+        for each, so that unchanged distributions need not be read again.
+        """
+        return {}
+
+    def get_watch_paths(self):
+        """
+        return list of directories whose entries change when distributions change
+
+        A change of their modification time tells a watcher to compare the
+        fingerprints, see get_fingerprints().
+        """
+        return []
@@ -0,0 +1,357 @@
+import json
+import mmap
+import os
+import tarfile
+import warnings
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from pylicenses import profile
+from pylicenses.graph import Version, InvalidVersion
+from pylicenses.licensefiles import is_license_file, license_preference
+from pylicenses.providers import PackageProvider, canonical_name
+from pylicenses.providers.piplocal import parse_metadata
+from pylicenses.records import intern_text
+
+WHEEL_EXTENSIONS = ('.whl',)
+SDIST_EXTENSIONS = ('.tar.gz', '.tgz', '.zip')
+CONDA_EXTENSIONS = ('.tar.bz2', '.conda')
+ARCHIVE_EXTENSIONS = WHEEL_EXTENSIONS + SDIST_EXTENSIONS + CONDA_EXTENSIONS
+#: keys kept from a wheel's METADATA or sdist's PKG-INFO
+METADATA_KEYS = ('name', 'version', 'license', 'license_expression', 'author', 'home_page',
+                 'summary', 'classifiers', 'requires_dist', 'provides_extra')
+#: keys kept from a conda package's info/index.json and info/about.json
+INDEX_KEYS = ('name', 'version', 'build', 'build_number', 'depends', 'license', 'license_family',
+              'subdir')
+ABOUT_KEYS = ('home', 'summary', 'dev_url', 'doc_url', 'license_url', 'license', 'license_family')
+
+
+class MappedFile(mmap.mmap):
+    """
+    a read-only memory mapped file usable by zipfile
+    """
+
+    def seekable(self):
+        # mmap only has seekable() since python 3.13
+        return True
+
+
+def archive_extension(path):
+    for ext in ARCHIVE_EXTENSIONS:
+        if path.endswith(ext):
+            return ext
+    return None
+
+
+def split_archive_name(path):
+    """
+    return the package dict of an archive's file name, or None
+
+    e.g. six-1.12.0-py2.py3-none-any.whl, six-1.12.0.tar.gz,
+    six-1.12.0-py36_0.tar.bz2 => name six, version 1.12.0 (and build py36_0)
+    """
+    ext = archive_extension(path)
+    if ext is None:
+        return None
+    fn = os.path.basename(path)[:-len(ext)]
+    if ext in CONDA_EXTENSIONS:
+        parts = fn.rsplit('-', 2)
+        if len(parts) != 3:
+            return None
+        return {'name': parts[0], 'version': parts[1], 'build': parts[2], 'package_type': 'conda'}
+    if ext in WHEEL_EXTENSIONS:
+        parts = fn.split('-')
+    else:
+        parts = fn.rsplit('-', 1)
+    if len(parts) < 2:
+        return None
+    return {'name': parts[0], 'version': parts[1], 'package_type': 'pypi'}
+
+
+def is_metadata_member(layout, name):
+    """
+    True if the archive member name is a metadata or license file of the layout
+    """
+    parts = name.split('/')
+    if layout == 'wheel':
+        # foo-1.0.dist-info/METADATA, foo-1.0.dist-info/LICENSE, foo-1.0.dist-info/licenses/*
+        return len(parts) > 1 and parts[0].endswith('.dist-info') and (
+            parts[1:] == ['METADATA'] or (len(parts) == 2 and is_license_file(parts[1]))
+            or parts[1] == 'licenses')
+    if layout == 'sdist':
+        # foo-1.0/PKG-INFO, foo-1.0/LICENSE
+        return len(parts) == 2 and (parts[1] == 'PKG-INFO' or is_license_file(parts[1]))
+    # conda: info/index.json, info/about.json, info/LICENSE.txt, info/licenses/*
+    return parts[0] == 'info' and len(parts) > 1 and (
+        parts[1] in ('index.json', 'about.json') or (len(parts) == 2 and is_license_file(parts[1]))
+        or parts[1] == 'licenses')
+
+
+def is_metadata_file(name):
+    return os.path.basename(name) in ('METADATA', 'PKG-INFO', 'index.json', 'about.json')
+
+
+def archive_record(path, layout, members):
+    """
+    return the package dict of an archive from its metadata and license members
+
+    :param members: dict of member name => bytes
+    """
+    data = split_archive_name(path) or {}
+    for name, content in members.items():
+        basename = os.path.basename(name)
+        text = content.decode('utf8', errors='replace')
+        if basename in ('METADATA', 'PKG-INFO'):
+            metadata = parse_metadata(text)
+            data.update({k: metadata[k] for k in METADATA_KEYS if metadata.get(k)})
+        elif basename in ('index.json', 'about.json'):
+            try:
+                info = json.loads(text)
+            except ValueError:
+                continue
+            for k in (INDEX_KEYS if basename == 'index.json' else ABOUT_KEYS):
+                if not info.get(k):
+                    continue
+                if basename == 'index.json':
+                    data[k] = info[k]
+                else:
+                    data.setdefault(k, info[k])
+            if info.get('home'):
+                data.setdefault('home_page', info['home'])
+    licenses = sorted((name for name in members if not is_metadata_file(name)),
+                      key=lambda name: (license_preference(name), name))
+    if licenses:
+        data['license_text'] = members[licenses[0]].decode('utf8', errors='replace')
+        data['license_source'] = '{}!{}'.format(path, licenses[0])
+        data['license_trace'] = 'local archive'
+    data['archive'] = path
+    if data.get('name') and data.get('version'):
+        data['dist_name'] = '-'.join(str(data[k]) for k in ('name', 'version', 'build') if data.get(k))
+    return data
+
+
+def read_zip_members(fileobj, layout):
+    """
+    return dict of member name => bytes of the metadata members of a zip
+
+    Only the central directory and the wanted members are read.
+    """
+    with zipfile.ZipFile(fileobj) as zf:
+        return {info.filename: zf.read(info) for info in zf.infolist()
+                if not info.is_dir() and is_metadata_member(layout, info.filename)}
+
+
+def read_tar_members(fileobj, layout, mode='r|*', info_first=False):
+    """
+    return dict of member name => bytes of the metadata members of a tar stream
+
+    The stream is read sequentially, without seeking, and ends once all
+    metadata is read: for conda packages at the first member after info/,
+    for sdists when PKG-INFO and a license file have been found.
+
+    :param info_first: if True, stop at the first member outside info/
+    """
+    members = {}
+    with tarfile.open(fileobj=fileobj, mode=mode) as tf:
+        for member in tf:
+            name = member.name[2:] if member.name.startswith('./') else member.name
+            if layout == 'conda' and (info_first or 'info/index.json' in members) and not name.startswith('info/'):
+                break
+            if not member.isfile() or not is_metadata_member(layout, name):
+                continue
+            members[name] = tf.extractfile(member).read()
+            if layout == 'sdist' and len(members) > 1 and any(n.endswith('/PKG-INFO') for n in members):
+                break
+    return members
+
+
+def read_archive(path):
+    """
+    return the package dict of a wheel, sdist or conda package archive
+
+    Nothing is extracted. Zip archives (.whl, .zip, .conda) are memory
+    mapped so that only the central directory and the metadata members are
+    read, tar archives are streamed. .conda packages require the zstandard
+    package, without it only their file name is used.
+
+    :return: the package dict, None if the file is not a readable archive
+    """
+    ext = archive_extension(path)
+    if ext is None:
+        return None
+    layout = 'wheel' if ext in WHEEL_EXTENSIONS else 'conda' if ext in CONDA_EXTENSIONS else 'sdist'
+    try:
+        with open(path, 'rb') as fin:
+            if ext in ('.tar.gz', '.tgz', '.tar.bz2'):
+                members = read_tar_members(fin, layout)
+            else:
+                with MappedFile(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if ext == '.conda':
+                        members = read_conda_members(mm)
+                    else:
+                        members = read_zip_members(mm, layout)
+    except (OSError, ValueError, EOFError, zipfile.BadZipFile, tarfile.TarError):
+        return None
+    return archive_record(path, layout, members)
+
+
+def read_conda_members(fileobj):
+    """
+    return dict of member name => bytes of the info/ members of a .conda package
+
+    A .conda package is a zip of info-*.tar.zst and pkg-*.tar.zst, both are
+    decompressed as a stream. The info tar is read completely. Only if it
+    has no license files, the info/licenses/ at the start of the pkg tar
+    are read.
+    """
+    if zstandard is None:
+        return {}
+    with zipfile.ZipFile(fileobj) as zf:
+        names = zf.namelist()
+        members = {}
+        for prefix in ('info-', 'pkg-'):
+            component = [name for name in names if name.startswith(prefix) and name.endswith('.tar.zst')]
+            if not component:
+                continue
+            with zf.open(component[0]) as raw:
+                reader = zstandard.ZstdDecompressor().stream_reader(raw)
+                members.update(read_tar_members(reader, 'conda', mode='r|', info_first=prefix == 'pkg-'))
+            if any(not is_metadata_file(name) for name in members):
+                break
+        return members
+
+
+def find_archives(locations):
+    """
+    return the sorted list of archive files in locations, directories are searched recursively
+    """
+    archives = []
+    for location in locations:
+        if os.path.isdir(location):
+            for root, dirs, files in os.walk(location):
+                archives.extend(os.path.join(root, fn) for fn in files if archive_extension(fn))
+        elif archive_extension(location) and os.path.isfile(location):
+            archives.append(location)
+    return sorted(set(archives))
+
+
+def version_key(version):
+    try:
+        return 1, Version(str(version)), ''
+    except InvalidVersion:
+        return 0, None, str(version)
+
+
+class ArchiveIndex(object):
+    """
+    Index of the packages in a wheelhouse or conda channel mirror
+
+    All archives are read once, in parallel worker processes, and indexed
+    by canonical name.
+    """
+
+    def __init__(self, max_workers=None):
+        """
+
+        :param max_workers: the number of worker processes, defaults to
+           the number of cpus
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._by_name = {}
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._by_name.values())
+
+    def add(self, data):
+        if data.get('license_text'):
+            data['license_text'] = intern_text(data['license_text'])
+        self._by_name.setdefault(canonical_name(data['name']), []).append(data)
+        return self
+
+    def load(self, locations):
+        """
+        add all archives in locations, files or directories
+        """
+        archives = find_archives(locations)
+        if zstandard is None and any(path.endswith('.conda') for path in archives):
+            warnings.warn('.conda packages are skipped, install zstandard to read them (pip install pylicenses[conda])')
+        if len(archives) > 1 and self.max_workers > 1:
+            chunksize = max(1, len(archives) // (self.max_workers * 4))
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                records = list(executor.map(read_archive, archives, chunksize=chunksize))
+        else:
+            records = [read_archive(path) for path in archives]
+        profile.count('archives_read', len(archives))
+        for data in records:
+            if data and data.get('name'):
+                self.add(data)
+        return self
+
+    def find(self, name, version=None, build=None):
+        """
+        return the package dict matching name, version and build or None
+
+        Without a version, the latest version is returned.
+        """
+        entries = self._by_name.get(canonical_name(name)) or []
+        if build is not None:
+            entries = [data for data in entries if data.get('build') == build]
+        if version is not None:
+            entries = [data for data in entries if str(data.get('version')) == str(version)]
+        if not entries:
+            return None
+        # with a license text first, then latest
+        return max(entries, key=lambda data: (version_key(data.get('version')), bool(data.get('license_text'))))
+
+
+class ArchiveProvider(PackageProvider):
+    """
+    Use wheel, sdist and conda package archives to find license files and metadata
+
+    Archives are looked up by name and version (and build for conda packages)
+    in a wheelhouse or channel mirror, see ArchiveIndex. Nothing is extracted.
+    """
+    init_kwargs = ['wheelhouse']
+    provides = ('license', 'license_family', 'license_source', 'license_text', 'author', 'home_page')
+    #: keys never taken from an archive, they are the installed package's
+    KEEP_KEYS = ('name', 'version', 'build', 'dist_name')
+
+    def __init__(self, wheelhouse=None, max_workers=None):
+        """
+
+        :param wheelhouse: list of archive files or directories, searched recursively
+        :param max_workers: the number of processes reading archives, defaults
+           to the number of cpus
+        """
+        self.wheelhouse = list(wheelhouse or [])
+        self.max_workers = max_workers
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = ArchiveIndex(max_workers=self.max_workers).load(self.wheelhouse)
+        return self._index
+
+    def accepts(self, pkg, data):
+        if not self.wheelhouse:
+            return False
+        return self.find(pkg, data) is not None
+
+    def find(self, pkg, data):
+        return self.index.find(data.get('name') or pkg, version=data.get('version'), build=data.get('build'))
+
+    def get_packages_info(self, packages):
+        infos = {}
+        for pkg, data in packages.items():
+            archive = self.find(pkg, data)
+            if archive is None:
+                continue
+            infos[pkg] = {k: v for k, v in archive.items()
+                          if k not in self.KEEP_KEYS and (k.startswith('license') or not data.get(k))}
+        return infos
@@ -1,23 +1,189 @@
 import json
+import os
+import sys
+from glob import glob
 
-import sh
+from pylicenses import profile
+from pylicenses.cache import LicenseCache
+from pylicenses.providers import PackageProvider, COST_LOCAL, COST_SUBPROCESS, COST_NETWORK
+from pylicenses.providers.condalocal import conda_json, conda_pkgs_dirs
 
-from pylicenses.providers import PackageProvider
+
+class RepodataIndex(object):
+    """
+    In-memory index of conda channel repodata.json files
+
+    Only the fields required to report licenses are kept, indexed by
+    (name, version, build) for exact matches, by (name, build) for
+    packages of unknown version and by (name, version) for packages of
+    unknown build.
+    """
+    KEYS = ('name', 'version', 'build', 'license', 'license_family')
+
+    def __init__(self):
+        self._by_build = {}
+        self._by_name_build = {}
+        self._by_name_version = {}
+        self.sources = []
+
+    def __len__(self):
+        return len(self._by_build)
+
+    def add(self, repodata, source=None):
+        """
+        add all packages of a parsed repodata.json
+
+        :param repodata: the dict of a repodata.json
+        :param source: the file name or url, defaults to repodata's _url
+        """
+        source = source or repodata.get('_url')
+        for key in ('packages', 'packages.conda'):
+            for fn, record in (repodata.get(key) or {}).items():
+                entry = {k: record.get(k) for k in self.KEYS}
+                entry['source'] = source
+                self._by_build.setdefault((entry['name'], entry['version'], entry['build']), entry)
+                self._by_name_build.setdefault((entry['name'], entry['build']), entry)
+                self._by_name_version.setdefault((entry['name'], entry['version']), entry)
+        self.sources.append(source)
+        return self
+
+    def load(self, path):
+        """
+        add a repodata.json file
+        """
+        with open(path) as fin:
+            content = fin.read()
+            profile.count_read(fin)
+        return self.add(json.loads(content), source=path)
+
+    def find(self, name, version=None, build=None):
+        """
+        return the package record matching name, version, build or None
+        """
+        if version is not None and build is None:
+            return self._by_name_version.get((name, version))
+        if version is not None:
+            return self._by_build.get((name, version, build))
+        return self._by_name_build.get((name, build))
 
 
 class CondaChannelProvider(PackageProvider):
     """
-    Use conda search to get package license type
+    Use conda channel repodata to get package license type
+
+    The channel repodata.json files are read once from conda's local package
+    cache (pkgs/cache), from configured files or directories, or from channel
+    urls (through the LicenseCache). All packages are then matched by name,
+    version and build. If no repodata is available, conda search is run for
+    each package.
     """
+    init_kwargs = ['cache', 'repodata', 'conda_prefix']
+    provides = ('license', 'license_family', 'license_source')
+
+    def __init__(self, cache=None, repodata=None, conda_prefix=None):
+        """
+
+        :param cache: the LicenseCache used to download repodata urls
+        :param repodata: list of repodata.json files, directories or
+           channel urls (e.g. https://repo.anaconda.com/pkgs/main/linux-64).
+           Defaults to the repodata cached by conda in pkgs/cache
+        :param conda_prefix: the conda environment, defaults to $CONDA_PREFIX
+           or sys.prefix
+        """
+        self.cache = cache or LicenseCache(':memory:')
+        self.repodata = repodata
+        self.conda_prefix = conda_prefix or os.environ.get('CONDA_PREFIX') or sys.prefix
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self.load_repodata()
+        return self._index
+
+    def accepts(self, pkg, data):
+        # only conda packages have a build string, or are listed as such in spec files
+        return bool(data.get('build')) or data.get('package_type') == 'conda'
+
+    @property
+    def cost(self):
+        # decided by the repodata locations, without loading them
+        files = self.repodata_files()
+        if any(location.startswith(('http://', 'https://')) for location in files):
+            return COST_NETWORK
+        if not files:
+            # falls back to conda search
+            return COST_SUBPROCESS
+        return COST_LOCAL
+
+    def repodata_files(self):
+        """
+        return list of repodata files and urls to load
+        """
+        locations = self.repodata
+        if locations is None:
+            locations = [os.path.join(d, 'cache') for d in conda_pkgs_dirs(self.conda_prefix)]
+        files = []
+        for location in locations:
+            if location.startswith(('http://', 'https://')):
+                files.append(location)
+            elif os.path.isdir(location):
+                files.extend(sorted(glob(os.path.join(location, '*.json'))))
+            elif os.path.isfile(location):
+                files.append(location)
+        return files
+
+    def load_repodata(self):
+        index = RepodataIndex()
+        for location in self.repodata_files():
+            try:
+                if location.startswith(('http://', 'https://')):
+                    url = location.rstrip('/')
+                    url = url if url.endswith('.json') else url + '/repodata.json'
+                    resp = self.cache.fetch(url, 'repodata')
+                    if resp.status_code == 200:
+                        index.add(json.loads(resp.content), source=url)
+                else:
+                    index.load(location)
+            except (OSError, ValueError):
+                # not a repodata file, e.g. *.info.json or state files
+                continue
+        return index
 
     def get_packages_info(self, packages):
+        if not len(self.index):
+            return self.search_packages_info(packages)
+        infos = {}
+        for pkg, data in packages.items():
+            if data.get('version', '--no-version--') in pkg:
+                # ignore build names as package names
+                continue
+            record = self.index.find(data.get('name', pkg), version=data.get('version'),
+                                     build=data.get('build'))
+            license = {}
+            if record is not None:
+                license = {
+                    'license': record['license'],
+                    'license_trace': 'conda channel repository',
+                    # not the file itself, it is no license text
+                    'license_source': 'conda channel repodata {}'.format(record['source']),
+                }
+                if record['license_family']:
+                    license['license_family'] = record['license_family']
+            infos[pkg] = license
+        return infos
+
+    def search_packages_info(self, packages):
+        """
+        get license information by running conda search for each package
+        """
         infos = {}
         for pkg, data in packages.items():
             if data.get('version', '--no-version--') in pkg:
                 # ignore build names as package names, conda search does not like
                 continue
             try:
-                condadata = json.loads(str(sh.conda('search', pkg, '--info', '--json')))
+                condadata = conda_json('search', pkg, '--info', '--json')
             except Exception as e:
                 condadata = {}
             else:
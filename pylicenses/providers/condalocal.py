@@ -1,46 +1,276 @@
 import json
 
 import os
-import sh
-
+import sys
 from glob import glob
 
-from pylicenses.providers import PackageProvider
+from pylicenses import profile
+from pylicenses.licensefiles import LicenseFileIndex, split_conda_dist_name
+from pylicenses.providers import (PackageProvider, normalize_subset, in_subset, canonical_name, COST_LOCAL,
+                                  COST_SUBPROCESS)
+from pylicenses.pipeline import merge_record
+from pylicenses.records import PackageRecord
+from pylicenses.state import file_fingerprint
+
+
+def conda_root_prefix(conda_prefix):
+    """
+    return the conda installation root of an environment
+    """
+    # environments live in <root>/envs/<name>
+    parent = os.path.dirname(os.path.normpath(conda_prefix))
+    if os.path.basename(parent) == 'envs':
+        return os.path.dirname(parent)
+    return conda_prefix
+
+
+def conda_pkgs_dirs(conda_prefix):
+    """
+    return list of conda package cache directories, honors $CONDA_PKGS_DIRS
+    """
+    dirs = [d for d in os.environ.get('CONDA_PKGS_DIRS', '').split(',') if d]
+    dirs.append(os.path.join(conda_root_prefix(conda_prefix), 'pkgs'))
+    return dirs
+
+
+def conda_json(*args):
+    """
+    return the parsed json output of conda *args
+    """
+    # sh is only imported once conda needs to be run
+    import sh
+
+    profile.count('subprocesses')
+    return json.loads(str(sh.conda(*args)))
 
 
 class CondaProvider(PackageProvider):
     """
     Use the conda and pip environment to find local LICENSE files included in packages
+
+    Package information is read directly from the environment's conda-meta/*.json
+    records and the pkgs/*/info/about.json files. Only if the environment has no
+    conda-meta directory the conda command line is used (conda list, conda info).
     """
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    init_kwargs = ['license_index', 'conda_prefix']
+    #: keys kept from conda-meta/*.json records
+    META_KEYS = ('name', 'version', 'build', 'build_number', 'channel', 'subdir', 'depends',
+                 'license', 'license_family', 'url', 'md5', 'fn', 'extracted_package_dir')
+    #: keys kept from pkgs/*/info/about.json
+    ABOUT_KEYS = ('home', 'summary', 'dev_url', 'doc_url', 'license_url', 'license', 'license_family')
+
+    def __init__(self, license_index=None, conda_prefix=None):
+        """
+
+        :param license_index: the LicenseFileIndex, defaults to a new index
+        :param conda_prefix: the conda environment, defaults to $CONDA_PREFIX
+           or sys.prefix. A given prefix that is not a conda environment
+           (e.g. a venv) has no conda packages.
+        """
+        super().__init__()
+        self.license_index = license_index or LicenseFileIndex()
+        self.is_explicit = conda_prefix is not None
+        self.conda_prefix = conda_prefix or os.environ.get('CONDA_PREFIX') or sys.prefix
         self._conda_prefix_path = None
+        self._conda_info = None
+        self._pkgs_dirs = None
+
+    @property
+    def conda_meta_path(self):
+        return os.path.join(self.conda_prefix, 'conda-meta')
+
+    @property
+    def is_native(self):
+        """
+        True if the environment can be read without running conda
+        """
+        return os.path.isdir(self.conda_meta_path)
+
+    @property
+    def cost(self):
+        return COST_LOCAL if self.is_native else COST_SUBPROCESS
+
+    @property
+    def root_prefix(self):
+        return conda_root_prefix(self.conda_prefix)
+
+    @property
+    def conda_info(self):
+        """
+        the output of conda info, conda is run once
+        """
+        if self._conda_info is None:
+            self._conda_info = conda_json('info', '--json')
+        return self._conda_info
 
     @property
     def prefix_path(self):
         if not self._conda_prefix_path:
-            info = json.loads(str(sh.conda('info', '--json')))
-            self._conda_prefix_path = os.path.join(info['sys.prefix'], 'pkgs')
+            if self.is_native:
+                self._conda_prefix_path = self.pkgs_dirs[0]
+            else:
+                self._conda_prefix_path = os.path.join(self.conda_info['sys.prefix'], 'pkgs')
         return self._conda_prefix_path
 
-    def get_packages_list(self):
+    @property
+    def pkgs_dirs(self):
         """
-        return dict of packages indexed by name and dist_name
+        list of conda package cache directories, honors $CONDA_PKGS_DIRS
         """
-        # get all packages
-        packages = json.loads(str(sh.conda('list', '--json')))
-        idx_by_name = {p['dist_name']: p for p in packages}
-        idx_by_distname = {p['name']: p for p in packages}
-        packages = dict(**idx_by_name, **idx_by_distname)
-        return packages
+        if self._pkgs_dirs is None:
+            self._pkgs_dirs = conda_pkgs_dirs(self.conda_prefix)
+        return self._pkgs_dirs
+
+    def conda_meta_files(self, names=None):
+        """
+        return the sorted list of conda-meta/*.json files
+
+        :param names: if given, only the records of packages of these
+           canonical names, selected by file name (<name>-<version>-<build>.json)
+        """
+        if names is None:
+            return sorted(glob(os.path.join(self.conda_meta_path, '*.json')))
+        try:
+            filenames = os.listdir(self.conda_meta_path)
+        except OSError:
+            return []
+        return sorted(os.path.join(self.conda_meta_path, fn) for fn in filenames
+                      if fn.endswith('.json')
+                      and canonical_name(split_conda_dist_name(fn[:-len('.json')])) in names)
+
+    def iter_conda_meta(self, names=None):
+        """
+        yield the package records of conda-meta/*.json, one file at a time
+
+        Each record is augmented by the package's info/about.json, if the
+        package is still in the package cache. The package caches referenced
+        by the records are added to pkgs_dirs once all records are read.
+
+        :param names: if given, only the records of packages of these canonical names
+        """
+        pkgs_dirs = set(self.pkgs_dirs)
+        for path in self.conda_meta_files(names=names):
+            try:
+                with open(path) as fin:
+                    content = fin.read()
+                    profile.count_read(fin)
+                meta = json.loads(content)
+            except (OSError, ValueError):
+                continue
+            data = {k: meta[k] for k in self.META_KEYS if k in meta}
+            data['build_string'] = data.get('build')
+            data['dist_name'] = '{name}-{version}-{build}'.format(**data)
+            pkg_dir = data.get('extracted_package_dir') or os.path.join(self.pkgs_dirs[0], data['dist_name'])
+            pkgs_dirs.add(os.path.dirname(pkg_dir))
+            about = self.read_about(pkg_dir)
+            if about.get('home'):
+                data.setdefault('home_page', about['home'])
+            for k, v in about.items():
+                data.setdefault(k, v)
+            yield data
+        # package caches referenced by the environment
+        self._pkgs_dirs = self.pkgs_dirs + sorted(pkgs_dirs - set(self.pkgs_dirs))
+
+    def read_about(self, pkg_dir):
+        try:
+            with open(os.path.join(pkg_dir, 'info', 'about.json')) as fin:
+                content = fin.read()
+                profile.count_read(fin)
+            about = json.loads(content)
+        except (OSError, ValueError):
+            return {}
+        return {k: about[k] for k in self.ABOUT_KEYS if about.get(k)}
+
+    def iter_packages_list(self, names=None):
+        """
+        yield the records of the installed packages
+
+        :param names: if given, only packages of these canonical names
+        """
+        if self.is_native:
+            yield from self.iter_conda_meta(names=names)
+            return
+        for data in conda_json('list', '--json'):
+            if names is None or canonical_name(data['name']) in names:
+                yield data
+
+    def get_fingerprints(self):
+        """
+        fingerprint each conda-meta/*.json record
+
+        If the environment is not native, each package listed by conda list
+        is fingerprinted by its dist_name, i.e. its version and build.
+        """
+        fingerprints = {}
+        if self.is_explicit and not self.is_native:
+            # not a conda environment, no packages
+            return fingerprints
+        if not self.is_native:
+            for data in conda_json('list', '--json'):
+                fingerprints['conda list {}'.format(data['dist_name'])] = (data['dist_name'], data['name'])
+            return fingerprints
+        for path in glob(os.path.join(self.conda_meta_path, '*.json')):
+            dist_name = os.path.basename(path)[:-len('.json')]
+            fingerprints[path] = (file_fingerprint(path), split_conda_dist_name(dist_name))
+        return fingerprints
+
+    def get_watch_paths(self):
+        """
+        return the conda-meta directory of the environment, if not native
+        of the environment conda list reports on
+        """
+        if self.is_native:
+            return [self.conda_meta_path]
+        if self.is_explicit:
+            return []
+        prefix = self.conda_info.get('active_prefix') or self.conda_info.get('default_prefix')
+        return [os.path.join(prefix, 'conda-meta')] if prefix else []
+
+    def iter_packages_info(self, packages, subset=None):
+        """
+        yield each installed package's record as it is read, then the licenses
+
+        :param packages: the PackageStore the records are merged into
+        :param subset: the names of the packages to discover, defaults to all
+        """
+        if self.is_explicit and not self.is_native:
+            return
+        subset = normalize_subset(subset)
+        # get all locally available packages, with a subset only its packages
+        dist_names = set()
+        for data in self.iter_packages_list(names=subset):
+            dist_names.add(data['dist_name'])
+            yield data['name'], data
+            yield data['dist_name'], {'name': data['name']}
+        # build info from conda, conda-meta records already include it
+        infos_by_distname = {} if self.is_native else self.get_conda_infos(packages)
+        # get licenses, with a subset directly from the packages' info/
+        licenses = self.get_licenses(dist_names=dist_names if subset else None)
+        # combine packages, infos, licenses
+        for pkg, data in packages.items():
+            # filter on requested packages
+            if not in_subset(pkg, subset):
+                continue
+            # prefer the license of the installed build over other cached builds
+            license = licenses.get(data.get('dist_name')) or licenses.get(pkg)
+            if license:
+                yield pkg, license
+            info = infos_by_distname.get(pkg)
+            if info:
+                yield pkg, info
 
     def get_packages_info(self, packages, subset=None):
-        # get all locally available packages
-        packages.update(self.get_packages_list())
-        # build info from conda
+        for pkg, info in self.iter_packages_info(packages, subset=subset):
+            merge_record(packages, pkg, info)
+        return packages
+
+    def get_conda_infos(self, packages):
+        """
+        return dict of conda info records indexed by dist_name and name
+        """
         names = [data['name'] for data in packages.values()]
-        infos = json.loads(str(sh.conda('info', '--json', names)))
+        infos = conda_json('info', '--json', names)
         infos_by_distname = {}
         for name, builds in infos.items():
             for build in builds:
@@ -48,55 +278,42 @@ class CondaProvider(PackageProvider):
                 name = build['name']
                 infos_by_distname[dist_name] = build
                 infos_by_distname[name] = build
-        # get licenses
-        licenses = self.get_licenses()
-        # combine packages, infos, licenses
-        for pkg, data in packages.items():
-            # filter on requested packages
-            if subset and not pkg in subset:
-                continue
-            license = licenses.get(pkg)
-            data.update(license) if license else None
-            info = infos_by_distname.get(pkg)
-            data.update(info) if info else None
-        return packages
+        return infos_by_distname
+
+    def find_license_files(self, dist_names=None):
+        """
+        return list of LicenseFile for all packages in the conda pkgs directories
 
-    def find_license_files(self):
+        :param dist_names: if given, only of these packages (name-version-build)
+        """
+        if not self.is_native:
+            return self.license_index.conda_pkgs(self.prefix_path, dist_names=dist_names)
         files = []
-        for fnkind in ('COPYING*', 'LICENSE*'):
-            pattern = os.path.join(self.prefix_path, '**', fnkind)
-            files.extend(glob(pattern, recursive=True))
+        for pkgs_dir in self.pkgs_dirs:
+            files.extend(self.license_index.conda_pkgs(pkgs_dir, dist_names=dist_names))
         return files
 
-    def get_licenses(self):
+    def get_licenses(self, dist_names=None):
         """
         get dict of licenses indexed by package name
+
+        :param dist_names: if given, only of these packages (name-version-build)
         """
         licenses = {}
-        files = self.find_license_files()
-        for path in files:
-            parts = path.split('/')
-            # conda package source
+        files = self.find_license_files(dist_names=dist_names)
+        for license_file in files:
+            # conda package source, files are in order of preference
             # e.g. '/usr/local/anaconda3/pkgs/mkl-service-1.1.2-py36h17a0993_4/info/LICENSE.txt',
-            pkg_idx = parts.index('pkgs')
-            dist_name = parts[pkg_idx + 1]
-            name_parts = dist_name.split('-')
-            # name can contain dash. reverse the string, take off build and version, reverse again
-            # the remaining parts are the package name. if there is more than one part there is a dash
-            if len(name_parts) > 2:
-                name = '-'.join(name_parts[::-1][2:][::-1])
-            else:
-                name = name_parts[0]
-            license_file = path
-            with open(license_file, 'r') as fin:
-                text = fin.read()
-            license = {
-                'dist_name': dist_name,
-                'name': name,
-                'license_text': text,
-                'license_trace': 'conda local package',
-                'license_source': license_file,
-            }
+            dist_name, name = license_file.dist_name, license_file.name
+            if dist_name in licenses:
+                continue
+            # the license text is read from license_source on first access
+            license = PackageRecord(
+                dist_name=dist_name,
+                name=name,
+                license_trace='conda local package',
+                license_source=license_file.path,
+            )
             licenses[dist_name] = license
             licenses[name] = license
         return licenses
@@ -0,0 +1,301 @@
+import os
+import re
+from urllib.parse import urlsplit
+
+from pylicenses import profile
+from pylicenses.graph import Requirement, InvalidRequirement, marker_applies, marker_environment
+from pylicenses.licensefiles import LicenseFileIndex
+from pylicenses.providers import PackageProvider, normalize_subset, in_subset, canonical_name
+from pylicenses.providers.archive import find_archives, split_archive_name
+from pylicenses.providers.condalocal import CondaProvider
+
+CONDA_SPEC_RE = re.compile(r'^(?:(?P<channel>[^:\s]+)::)?(?P<name>[A-Za-z0-9_.-]+)'
+                           r'(?:\s*(?P<op>==|=|\s)\s*(?P<version>[0-9A-Za-z][^=\s]*)(?:[=\s](?P<build>\S+))?)?\s*$')
+ARCHIVE_EXTENSIONS = ('.tar.bz2', '.conda')
+# nested requirement and constraint files, e.g. -r base.txt, -rbase.txt, --requirement=base.txt
+NESTED_RE = re.compile(r'^(?:-(?P<short>[rc])|--(?P<long>requirement|constraint)(?=[\s=]))\s*=?\s*(?P<path>\S.*)$')
+
+
+def read_lines(path):
+    with open(path) as fin:
+        content = fin.read()
+        profile.count_read(fin)
+    return content.splitlines()
+
+
+def parse_pip_spec(spec, environment=None):
+    """
+    return the package dict of a pip requirement, or None
+
+    The version is only set for exact pins (==). Requirements whose marker
+    does not apply to environment are None.
+    """
+    try:
+        req = Requirement(spec)
+    except InvalidRequirement:
+        return None
+    if not marker_applies(req.marker, marker_environment() if environment is None else environment):
+        return None
+    data = {'name': req.name, 'package_type': 'pypi'}
+    pins = [s.version for s in req.specifier if s.operator in ('==', '===') and '*' not in s.version]
+    if pins:
+        data['version'] = pins[0]
+    if req.url:
+        data['url'] = req.url
+    return data
+
+
+def parse_conda_spec(spec):
+    """
+    return the package dict of a conda match spec, or None
+
+    e.g. conda-forge::numpy=1.16.2=py36h8b7e671_1, numpy==1.16.2, numpy 1.16.2 py36_1
+    The version is only set for exact versions (== or with a build),
+    numpy=1.16 and numpy 1.16 match 1.16.*, numpy>=1.16 any version.
+    """
+    match = CONDA_SPEC_RE.match(spec.strip())
+    if match is None:
+        # version ranges, e.g. numpy >=1.16,<1.17
+        match = re.match(r'^(?:[^:\s]+::)?([A-Za-z0-9_.-]+)', spec.strip())
+        return {'name': match.group(1), 'package_type': 'conda'} if match else None
+    data = {'name': match.group('name'), 'package_type': 'conda'}
+    version, build = match.group('version'), match.group('build')
+    if version and (match.group('op') == '==' or build) and '*' not in version:
+        data['version'] = version
+    if build and '*' not in build:
+        data['build'] = build
+    if match.group('channel'):
+        data['channel'] = match.group('channel')
+    return data
+
+
+def split_conda_url(url):
+    """
+    return the package dict of a conda package url, as in explicit specs
+
+    e.g. https://repo.anaconda.com/pkgs/main/linux-64/six-1.12.0-py37_0.tar.bz2#<md5>
+    """
+    path = urlsplit(url).path
+    fn = os.path.basename(path)
+    for ext in ARCHIVE_EXTENSIONS:
+        if fn.endswith(ext):
+            fn = fn[:-len(ext)]
+            break
+    else:
+        return None
+    parts = fn.rsplit('-', 2)
+    if len(parts) != 3:
+        return None
+    name, version, build = parts
+    return {'name': name, 'version': version, 'build': build, 'package_type': 'conda',
+            'channel': os.path.dirname(os.path.dirname(path)).strip('/') or None,
+            'url': url.split('#')[0]}
+
+
+def read_requirements(path, environment=None, _seen=None, _constraints=None):
+    """
+    return the list of package dicts of a requirements.txt or pip-compile lockfile
+
+    Nested requirement files (-r) are read as well. Constraint files (-c)
+    only pin the version of packages that are listed without one, as pip
+    does not install what is only constrained. Other options, hashes,
+    comments and editable installs are ignored.
+    """
+    seen = _seen if _seen is not None else set()
+    # canonical name => package dict of the constraint files
+    constraints = _constraints if _constraints is not None else {}
+    path = os.path.abspath(path)
+    if path in seen:
+        return []
+    seen.add(path)
+    packages = []
+    # join continuation lines, e.g. pip-compile --generate-hashes
+    content = '\n'.join(read_lines(path)).replace('\\\n', ' ')
+    for line in content.splitlines():
+        line = re.sub(r'(^|\s)#.*$', '', line).strip()
+        if not line:
+            continue
+        match = NESTED_RE.match(line)
+        if match:
+            nested = os.path.join(os.path.dirname(path), match.group('path'))
+            if match.group('short') == 'c' or match.group('long') == 'constraint':
+                for data in read_requirements(nested, environment=environment, _seen=seen):
+                    constraints.setdefault(canonical_name(data['name']), data)
+            else:
+                packages.extend(read_requirements(nested, environment=environment, _seen=seen,
+                                                  _constraints=constraints))
+            continue
+        if line.startswith('-'):
+            # -e, -i, --hash, --index-url etc.
+            continue
+        # strip per-requirement options, e.g. --hash=sha256:...
+        line = re.split(r'\s--?\w', line, maxsplit=1)[0].strip()
+        data = parse_pip_spec(line, environment=environment)
+        if data is not None:
+            packages.append(data)
+    if _constraints is None:
+        for data in packages:
+            pinned = constraints.get(canonical_name(data['name']), {}).get('version')
+            if pinned and not data.get('version'):
+                data['version'] = pinned
+    return packages
+
+
+def read_environment_yml(path):
+    """
+    return the list of package dicts of a conda environment.yml
+
+    Only the dependencies list is read, including its pip: section. This is
+    the subset of YAML that conda env export writes.
+    """
+    packages = []
+    section = None
+    pip_indent = None
+    for line in read_lines(path):
+        stripped = line.split(' #')[0].rstrip()
+        if not stripped.strip() or stripped.lstrip().startswith('#'):
+            continue
+        indent = len(stripped) - len(stripped.lstrip())
+        if indent == 0:
+            section = stripped.rstrip(':').strip()
+            pip_indent = None
+            continue
+        if section != 'dependencies':
+            continue
+        item = stripped.strip()
+        if not item.startswith('-'):
+            continue
+        item = item[1:].strip().strip('\'"')
+        if pip_indent is not None and indent > pip_indent:
+            data = parse_pip_spec(item)
+        elif item.rstrip(':') == 'pip' and item.endswith(':'):
+            pip_indent = indent
+            continue
+        else:
+            pip_indent = None
+            data = parse_conda_spec(item)
+        if data is not None:
+            packages.append(data)
+    return packages
+
+
+def read_explicit(path):
+    """
+    return the list of package dicts of a conda explicit spec (conda list --explicit)
+    """
+    packages = []
+    for line in read_lines(path):
+        line = line.strip()
+        if not line or line.startswith(('#', '@')):
+            continue
+        data = split_conda_url(line)
+        if data is not None:
+            packages.append(data)
+    return packages
+
+
+def read_archive_names(path):
+    """
+    return the list of package dicts of the archives in a directory, by file name
+    """
+    packages = [split_archive_name(archive) for archive in find_archives([path])]
+    return [data for data in packages if data is not None]
+
+
+def read_spec(path):
+    """
+    return the list of package dicts of a requirements.txt, pip-compile
+    lockfile, conda environment.yml or conda explicit spec file, or of
+    a directory of package archives
+    """
+    if os.path.isdir(path):
+        return read_archive_names(path)
+    if path.endswith(('.yml', '.yaml')):
+        return read_environment_yml(path)
+    if any(line.strip() == '@EXPLICIT' for line in read_lines(path)):
+        return read_explicit(path)
+    return read_requirements(path)
+
+
+class LockfileProvider(PackageProvider):
+    """
+    Packages listed in requirements, lockfile or conda spec files
+
+    Nothing needs to be installed. Packages are added as listed, conda
+    packages get their license files from the local package cache
+    (pkgs/<name>-<version>-<build>) if available. Everything else is left
+    to the fallback providers, i.e. conda channel repodata, the bundled
+    license corpus and pypi/github through the cache.
+    """
+    init_kwargs = ['specs', 'license_index', 'conda_prefix']
+
+    def __init__(self, specs=None, license_index=None, conda_prefix=None):
+        """
+
+        :param specs: list of spec file paths
+        :param license_index: the LicenseFileIndex, defaults to a new index
+        :param conda_prefix: the conda installation whose package cache
+           is used, defaults to $CONDA_PREFIX or sys.prefix
+        """
+        self.specs = list(specs or [])
+        self.license_index = license_index or LicenseFileIndex()
+        # only used to read the package cache, the environment is not scanned
+        self.conda = CondaProvider(license_index=self.license_index, conda_prefix=conda_prefix)
+
+    def read_specs(self):
+        packages = []
+        for path in self.specs:
+            for data in read_spec(path):
+                data['spec_source'] = path
+                packages.append(data)
+        return packages
+
+    def get_license_files(self, dist_names=None):
+        """
+        return dict of dist_name => license file path of the conda package cache
+
+        :param dist_names: if given, only of these packages (name-version-build)
+        """
+        files = {}
+        for pkgs_dir in self.conda.pkgs_dirs:
+            for license_file in self.license_index.conda_pkgs(pkgs_dir, dist_names=dist_names):
+                # files are in order of preference
+                files.setdefault(license_file.dist_name, license_file.path)
+        return files
+
+    def get_packages_info(self, packages, subset=None):
+        subset = normalize_subset(subset)
+        specs = [data for data in self.read_specs() if in_subset(data['name'], subset)]
+        for data in specs:
+            if data.get('build'):
+                data['dist_name'] = '{name}-{version}-{build}'.format(**data)
+        license_files = None
+        for data in specs:
+            # the first spec of a package wins, e.g. of environment.yml and requirements.txt
+            if data['name'] in packages:
+                continue
+            packages[data['name']] = data
+            if data.get('dist_name'):
+                # only the exact build, other cached builds may have other licenses
+                if license_files is None:
+                    # with a subset, only its packages are looked up
+                    dist_names = {d['dist_name'] for d in specs if d.get('dist_name')} if subset else None
+                    license_files = self.get_license_files(dist_names=dist_names)
+                record = packages[data['name']]
+                record.update(self.read_about(data['dist_name']))
+                if data['dist_name'] in license_files:
+                    record.update(license_trace='conda local package',
+                                  license_source=license_files[data['dist_name']])
+        return packages
+
+    def read_about(self, dist_name):
+        """
+        return the info/about.json data of a package in the package cache
+        """
+        for pkgs_dir in self.conda.pkgs_dirs:
+            about = self.conda.read_about(os.path.join(pkgs_dir, dist_name))
+            if about:
+                if about.get('home'):
+                    about['home_page'] = about['home']
+                return about
+        return {}
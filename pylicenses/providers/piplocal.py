@@ -1,96 +1,196 @@
 import email
 
 import os
+import sys
 from glob import glob
 
-import sys
-from pip._internal.utils.misc import get_installed_distributions
+from pylicenses import profile
+from pylicenses.licensefiles import LicenseFileIndex, split_dist_info_name
+from pylicenses.providers import PackageProvider, normalize_subset, in_subset, canonical_name
+from pylicenses.pipeline import merge_record
+from pylicenses.state import file_fingerprint
+
+
+def prefix_site_packages(prefix):
+    """
+    return the site-packages directories of a python environment prefix
+    """
+    patterns = (
+        os.path.join(prefix, 'lib', 'python*', 'site-packages'),  # posix
+        os.path.join(prefix, 'lib', 'site-packages'),  # windows, conda
+        os.path.join(prefix, 'Lib', 'site-packages'),  # windows, venv
+    )
+    paths = []
+    for pattern in patterns:
+        paths.extend(path for path in sorted(glob(pattern)) if path not in paths)
+    return paths
+
 
-from pylicenses.providers import PackageProvider
+def parse_metadata(pkginfo):
+    """
+    return dict of a PKG-INFO or METADATA file's content
+    """
+    # adopted from https://stackoverflow.com/a/19086260
+    # PKG-INFO is in email format. since Metadata 2.1 format description may
+    #          be in the body or header.
+    # see https://www.python.org/dev/peps/pep-0314/#including-metadata-in-packages
+    #     https://packaging.python.org/specifications/core-metadata/
+    message = email.message_from_string(pkginfo)
+    data = {
+        k.replace('-', '_').lower(): v for
+        k, v in dict(message).items()
+    }
+    # multiple use fields, dict(message) only keeps the last one
+    data['classifiers'] = message.get_all('Classifier') or []
+    data['requires_dist'] = message.get_all('Requires-Dist') or []
+    data['provides_extra'] = message.get_all('Provides-Extra') or []
+    # description may be in the body since Metadata 2.1
+    if data.get('metadata_version') != '1.2':
+        data['description'] = message.get_payload()
+    return data
 
 
 class PipProvider(PackageProvider):
-    def get_package_metadata(self, pkg):
-        # adopted from https://stackoverflow.com/a/19086260
-        # PKG-INFO is in email format. since Metadata 2.1 format description may
-        #          be in the body or header.
-        # see https://www.python.org/dev/peps/pep-0314/#including-metadata-in-packages
-        #     https://packaging.python.org/specifications/core-metadata/
-        data = None
-        for metakind in ('PKG-INFO', 'METADATA'):
+    init_kwargs = ['license_index', 'prefix']
+
+    def __init__(self, license_index=None, prefix=None):
+        """
+
+        :param license_index: the LicenseFileIndex, defaults to a new index
+        :param prefix: the python environment to scan, defaults to the
+           running interpreter's sys.path. Distributions are read from
+           their metadata files, without pip.
+        """
+        self.license_index = license_index or LicenseFileIndex()
+        self.prefix = prefix
+
+    def read_distributions(self, names=None):
+        """
+        return list of metadata dicts of all distributions in site_packages_paths()
+
+        :param names: if given, only the distributions of these canonical names
+           are read
+        """
+        distributions = []
+        seen = set()
+        for path in self.site_packages_paths():
             try:
-                pkginfo = pkg.get_metadata(metakind)
-            except:
-                pass
-            else:
-                message = email.message_from_string(pkginfo)
-                data = {
-                    k.replace('-', '_').lower(): v for
-                    k, v in dict(message).items()
-                }
-                # description may be in the body since Metadata 2.1
-                if data['metadata_version'] != '1.2':
-                    data['description'] = message.get_payload()
-                break
-        return data
-
-    def find_license_files(self):
-        files = []
-        for path in sys.path:
-            if not 'site-packages' in path:
+                entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+            except OSError:
                 continue
-            for fnkind in ('COPYING*', 'LICENSE*'):
-                pattern = os.path.join(path, '**', fnkind)
-                files.extend(glob(pattern, recursive=True))
+            for entry in entries:
+                if entry.name.endswith('.dist-info'):
+                    metapath = os.path.join(entry.path, 'METADATA')
+                elif entry.name.endswith('.egg-info'):
+                    metapath = os.path.join(entry.path, 'PKG-INFO') if entry.is_dir() else entry.path
+                else:
+                    continue
+                if names is not None and canonical_name(split_dist_info_name(entry.name)[1]) not in names:
+                    continue
+                try:
+                    with open(metapath, errors='replace') as fin:
+                        pkginfo = fin.read()
+                        profile.count_read(fin)
+                except OSError:
+                    continue
+                data = parse_metadata(pkginfo)
+                key = canonical_name(data.get('name') or split_dist_info_name(entry.name)[1])
+                if 'version' not in data or key in seen:
+                    # not a distribution, or shadowed by an earlier path
+                    continue
+                seen.add(key)
+                distributions.append(data)
+        return distributions
+
+    def get_distributions(self, names=None):
+        """
+        return list of metadata dicts of all installed distributions
+
+        Distributions are read from their metadata files, without pip, for
+        the running interpreter as well as for another prefix.
+
+        :param names: if given, only the distributions of these canonical names
+           are looked up, directly by their metadata directories
+        """
+        return self.read_distributions(names=names)
+
+    def site_packages_paths(self):
+        if self.prefix:
+            return prefix_site_packages(self.prefix)
+        return [path for path in sys.path if 'site-packages' in path]
+
+    def find_license_files(self, names=None):
+        """
+        return list of LicenseFile for all site-packages on sys.path
+
+        :param names: if given, only of the distributions of these canonical names
+        """
+        files = []
+        for path in self.site_packages_paths():
+            files.extend(self.license_index.site_packages(path, names=names))
         return files
 
-    def get_licenses(self):
+    def get_fingerprints(self):
         """
-        get dict of licenses indexed by package name
+        fingerprint each .dist-info/.egg-info by its metadata file and RECORD hash
         """
-        licenses = {}
-        files = self.find_license_files()
-        for path in files:
-            parts = path.split('/')
-            # installed package with license
+        fingerprints = {}
+        for path in self.site_packages_paths():
+            try:
+                entries = list(os.scandir(path))
+            except OSError:
+                continue
+            for entry in entries:
+                if not entry.name.endswith(('.dist-info', '.egg-info')):
+                    continue
+                if entry.is_dir():
+                    metadata = 'METADATA' if entry.name.endswith('.dist-info') else 'PKG-INFO'
+                    fingerprint = '{}/{}'.format(
+                        file_fingerprint(os.path.join(entry.path, metadata)),
+                        file_fingerprint(os.path.join(entry.path, 'RECORD'), content_hash=True))
+                else:
+                    fingerprint = file_fingerprint(entry.path)
+                dist_name, name = split_dist_info_name(entry.name)
+                fingerprints[entry.path] = (fingerprint, name)
+        return fingerprints
+
+    def get_watch_paths(self):
+        return self.site_packages_paths()
+
+    def iter_packages_info(self, packages, subset=None):
+        """
+        yield each distribution's metadata as it is read, then its license
+
+        :param packages: the PackageStore the records are merged into
+        :param subset: the names of the packages to discover, defaults to all
+        """
+        subset = normalize_subset(subset)
+        # with a subset, only its distributions are read
+        for pkgmeta in self.get_distributions(names=subset):
+            yield pkgmeta['name'], pkgmeta
+            yield '{}-{}'.format(pkgmeta['name'], pkgmeta['version']), {'name': pkgmeta['name']}
+        # dist-info names may differ, e.g. pygments-2.2.dist-info for Pygments
+        by_canonical = {}
+        for pkg in packages:
+            if in_subset(pkg, subset):
+                by_canonical.setdefault(canonical_name(pkg), pkg)
+        seen = set()
+        for license_file in self.find_license_files(names=subset):
+            # installed package with license, files are in order of preference
             # e.g. /usr/local/anaconda3/lib/python3.6/site-packages/tornado-5.1.1.dist-info/LICENSE.txt
-            dist_name = parts[-2].replace('.dist-info', '')
-            name_parts = dist_name.split('-')
-            # name can contain dash. reverse the string, take off build and version, reverse again
-            # the remaining parts are the package name. if there is more than one part there is a dash
-            if len(name_parts) > 2:
-                name = '-'.join(name_parts[::-1][2:][::-1])
+            dist_name, name = license_file.dist_name, license_file.name
+            # the license text is read from license_source on first access
+            license = dict(license_trace='pip local package', license_source=license_file.path)
+            if name in packages and in_subset(name, subset):
+                pkg, license = name, dict(license, dist_name=dist_name, name=name)
             else:
-                name = name_parts[0]
-            license_file = path
-            with open(license_file, 'r') as fin:
-                text = fin.read()
-            license = {
-                'dist_name': dist_name,
-                'name': name,
-                'license_text': text,
-                'license_trace': 'pip local package',
-                'license_source': license_file,
-            }
-            licenses[dist_name] = license
-            licenses[name] = license
-        return licenses
+                pkg = by_canonical.get(canonical_name(name))
+            if pkg is None or pkg in seen:
+                continue
+            seen.add(pkg)
+            yield pkg, license
 
     def get_packages_info(self, packages, subset=None):
-        pkgsdata = get_installed_distributions()
-        for pkg in pkgsdata:
-            pkgmeta = self.get_package_metadata(pkg)
-            name = pkgmeta['name']
-            distname = '{}-{}'.format(pkgmeta['name'], pkgmeta['version'])
-            packages[name].update(pkgmeta)
-            packages[distname].update(pkgmeta)
-        # get licenses
-        licenses = self.get_licenses()
-        # combine packages + licenses
-        for pkg, data in packages.items():
-            # filter on requested packages
-            if subset and not pkg in subset:
-                continue
-            license = licenses.get(pkg)
-            data.update(license) if license else None
+        for pkg, info in self.iter_packages_info(packages, subset=subset):
+            merge_record(packages, pkg, info)
         return packages
@@ -1,28 +1,164 @@
 import base64
 import json
+import threading
+import time
 import warnings
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
-import requests
+from pylicenses.cache import LicenseCache
+from pylicenses.providers import PackageProvider, COST_NETWORK
+from pylicenses.normalize import normalize, license_ids
+from pylicenses.spdx import get_corpus
 
-from pylicenses.providers import PackageProvider
+
+# github license keys of license families without a version, the keys that
+# were asked for these names before they were normalized. The text is an
+# example of the family, the package's license id is not made more precise
+GITHUB_FAMILY_KEYS = {
+    'LicenseRef-Apache': 'apache-2.0',
+    'LicenseRef-BSD': 'bsd-2-clause',
+    'LicenseRef-GPL': 'gpl-2.0',
+    'LicenseRef-LGPL': 'lgpl-3.0',
+}
+
+
+def github_license_key(spdx_id):
+    """
+    return the github license key of a spdx id, e.g. GPL-3.0-only => gpl-3.0
+
+    Other LicenseRef ids than those of GITHUB_FAMILY_KEYS have no github
+    license, None is returned.
+    """
+    if spdx_id.startswith('LicenseRef-'):
+        return GITHUB_FAMILY_KEYS.get(spdx_id)
+    key = spdx_id.lower()
+    for suffix in ('-only', '-or-later', '+'):
+        if key.endswith(suffix):
+            key = key[:-len(suffix)]
+    return key
+
+
+class GithubRateLimiter(object):
+    """
+    Track the github api rate limit and back off before it is exhausted
+
+    github reports the remaining number of requests and the reset time in the
+    X-RateLimit-Remaining and X-RateLimit-Reset headers of every response. Once
+    the remaining requests drop to the reserve, all callers wait until the reset
+    time instead of running into 403 errors. Waits longer than max_wait are not
+    done, the request is made regardless (and will likely fail).
+    """
+
+    def __init__(self, reserve=0, max_wait=300):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.remaining = None
+        self.reset = None
+        self._lock = threading.Lock()
+
+    def update(self, headers):
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is None:
+            return
+        with self._lock:
+            self.remaining = int(remaining)
+            self.reset = float(reset) if reset else None
+
+    def is_limited(self, resp):
+        return resp.status_code in (403, 429) and self.remaining is not None and self.remaining <= 0
+
+    def wait(self):
+        with self._lock:
+            if self.remaining is None or self.remaining > self.reserve or not self.reset:
+                if self.remaining is not None:
+                    self.remaining -= 1
+                return False
+            reset = self.reset
+            delay = reset - time.time()
+            if delay > self.max_wait:
+                return False
+        # sleep without the lock, all other callers wait for the same reset concurrently
+        time.sleep(max(delay, 0))
+        with self._lock:
+            if self.reset == reset:
+                # the next response tells the new limit
+                self.remaining = None
+        return True
 
 
 class PyPiProvider(PackageProvider):
     """
     Use pypi.org and github to retrieve package data (pypi) and license content (github)
     """
-    init_kwargs = ['github_auth']
+    init_kwargs = ['github_auth', 'cache', 'concurrency']
+    cost = COST_NETWORK
+    provides = ('license', 'license_spdx_id', 'license_source', 'license_text', 'author', 'home_page')
+    PYPI_URL = 'https://pypi.org'
+    GITHUB_API_URL = 'https://api.github.com'
+
+    def __init__(self, github_auth=None, cache=None, concurrency=1):
+        """
 
-    def __init__(self, github_auth=None):
+        :param github_auth: the tuple (user,password), defaults to None
+        :param cache: the LicenseCache, defaults to an in-memory cache
+        :param concurrency: the number of packages resolved in parallel
+        """
         self.github_auth = github_auth
+        self.cache = cache or LicenseCache(':memory:')
+        self.concurrency = max(int(concurrency or 1), 1)
+        self.rate_limiter = GithubRateLimiter()
         self._github_licenses = {}  # cache for queried github licenses (repo or verbatim)
         self._pypi_data = {}  # cache for queried pypi data
+        self._inflight = {}  # futures of lookups currently running, by (store, key)
+        self._lock = threading.Lock()
+
+    def _memoized(self, store, key, func, *args):
+        """
+        return store[key], computing it by func(*args) exactly once
+
+        Concurrent callers asking for the same key wait for the result
+        of the first caller instead of issuing the same requests again.
+        """
+        with self._lock:
+            if key in store:
+                return store[key]
+            inflight_key = (id(store), key)
+            future = self._inflight.get(inflight_key)
+            owner = future is None
+            if owner:
+                future = self._inflight[inflight_key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            value = func(*args)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            store[key] = value
+            future.set_result(value)
+        finally:
+            with self._lock:
+                del self._inflight[inflight_key]
+        return value
+
+    def _github_fetch(self, url, source):
+        self.rate_limiter.wait()
+        resp = self.cache.fetch(url, source, auth=self.github_auth)
+        self.rate_limiter.update(resp.headers)
+        if self.rate_limiter.is_limited(resp) and self.rate_limiter.wait():
+            # we waited for the rate limit reset, try once more
+            resp = self.cache.fetch(url, source, auth=self.github_auth)
+            self.rate_limiter.update(resp.headers)
+        return resp
 
     def get_github_repo_license(self, ref):
-        if ref in self._github_licenses:
-            return self._github_licenses[ref]
-        url = 'https://api.github.com/repos/{ref}/license'.format(ref=ref)
-        resp = requests.get(url, auth=self.github_auth)
+        return self._memoized(self._github_licenses, ref, self._query_github_repo_license, ref)
+
+    def _query_github_repo_license(self, ref):
+        url = '{api}/repos/{ref}/license'.format(api=self.GITHUB_API_URL, ref=ref)
+        resp = self._github_fetch(url, 'github-repo')
         error_text = lambda resp: {'error': 'github /repos/{}/license returned {}'.format(ref, resp.content)}
         try:
             license = json.loads(resp.content)
@@ -43,14 +179,14 @@ class PyPiProvider(PackageProvider):
             license['github_error'] = license['error']
         license['license_trace'] = 'github-repository-license'
         license['license_source'] = url
-        self._github_licenses[ref] = license
         return license
 
     def _run_github_license_query(self, name):
-        if name in self._github_licenses:
-            return self._github_licenses[name]
-        url = 'https://api.github.com/licenses/{name}'.format(name=name)
-        resp = requests.get(url, auth=self.github_auth)
+        return self._memoized(self._github_licenses, name, self._query_github_license, name)
+
+    def _query_github_license(self, name):
+        url = '{api}/licenses/{name}'.format(api=self.GITHUB_API_URL, name=name)
+        resp = self._github_fetch(url, 'github-license')
         error_text = lambda resp: {'error': 'github /licenses/{} returned {}'.format(name, resp.content)}
         try:
             license = json.loads(resp.content)
@@ -70,48 +206,36 @@ class PyPiProvider(PackageProvider):
         license = {
             KEY_MAP.get(k): v for k, v in license.items() if k in KEY_MAP
         }
-        self._github_licenses[name] = license
-        return self._github_licenses[name]
+        return license
 
     def get_github_license(self, name, family):
         license = {}
+        corpus = get_corpus()
         for ref in (name, family):
-            NAME_MAP = {
-                'lgpl': 'lgpl-3.0',
-                'lgpl3': 'lgpl-3.0',
-                'lgpl3.0': 'lgpl-3.0',
-                'lgpl2.1': 'lgpl-2.1',
-                'gpl': 'gpl-2.0',
-                'gpl2': 'gpl-2.0',
-                'gpl3': 'gpl-3.0',
-                'gnugpl3withgccruntimelibrary': 'gpl-3.0',
-                'gpl3withruntimeexception': 'gpl-3.0',
-                'bsd': 'bsd-2-clause',
-                'bsdstyle': 'bsd-2-clause',
-                'bsd2': 'bsd-2-clause',
-                'bsd2.0': 'bsd-2-clause',
-                'bsd3': 'bsd-3-clause',
-                'bsd3.0': 'bsd-3-clause',
-                'bsd3clause': 'bsd-3-clause',
-                'newbsd': 'bsd-3-clause',
-                'apache2.0': 'apache-2.0',
-            }
-            ref = ref.lower().strip()  # remove leading and trailing blanks
-            ref = ref.replace('-', '').replace(' ', '')  # remove any blanks, dashes
-            ref = ref.split('/')[0]  # split on something like GPL/MIT, take just the first
-            ref = ref.replace('license', '')  # reduce something like "mit license" to "mit"
-            ref = NAME_MAP.get(ref) or ref  # map to the actual name on github
-            if ref:
-                license.update(self._run_github_license_query(ref))
+            # of a choice of licenses (e.g. MIT OR Apache-2.0), take the first
+            ref = (license_ids(normalize(ref)) or [None])[0]
+            spdx_id = corpus.resolve(ref) if ref else None
+            if spdx_id:
+                # verbatim text is in the bundled corpus, no need to ask github
+                license.update({
+                    'license_spdx_id': spdx_id,
+                    'license_text': corpus.text(spdx_id),
+                    'license_source': corpus.filename(spdx_id),
+                })
+                break
+            key = github_license_key(ref) if ref else None
+            if key:
+                license.update(self._run_github_license_query(key))
                 if license.get('license_text'):
                     break
         return license
 
     def get_pypi_info(self, package):
-        if package in self._pypi_data:
-            return self._pypi_data[package]
-        url = 'https://pypi.org/pypi/{package}/json'.format(package=package)
-        resp = requests.get(url)
+        return self._memoized(self._pypi_data, package, self._query_pypi_info, package)
+
+    def _query_pypi_info(self, package):
+        url = '{pypi}/pypi/{package}/json'.format(pypi=self.PYPI_URL, package=package)
+        resp = self.cache.fetch(url, 'pypi')
         try:
             info = json.loads(resp.content).get('info')
         except:
@@ -124,9 +248,33 @@ class PyPiProvider(PackageProvider):
             }
             info['license_trace'] = 'pypi'
             info['license_source'] = url
-        self._pypi_data[package] = info
         return info
 
+    def iter_packages_info(self, packages, subset=None):
+        """
+        yield (name, info) of each package as its lookup completes
+
+        Lookups that have not started yet are cancelled when the generator
+        is closed, e.g. when a policy with fail_fast stops the scan.
+
+        :param packages: (dict) mapping name => information
+        """
+        # resolve each package once, even if it is listed by name and dist_name
+        unique = {data['name']: data for data in packages.values()}
+        if self.concurrency == 1 or len(unique) < 2:
+            for name, data in unique.items():
+                yield name, self.get_package_info(data)
+            return
+        pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        futures = {pool.submit(self.get_package_info, data): name for name, data in unique.items()}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
     def get_packages_info(self, packages):
         """
         get all information from pypi + github available for the packages
@@ -134,32 +282,42 @@ class PyPiProvider(PackageProvider):
         :param packages: (dict) mapping name => information
         :return:
         """
-        infos = {}
-        for data in packages.values():
-            # query from pypi
-            pkg = data['name']
-            infos[pkg] = data
-            infos[pkg].update(self.get_pypi_info(pkg))
-            homepage = infos[pkg].get('home_page')
-            project_urls = infos[pkg].get('project_urls') or {}
-            project_homepage = project_urls.get('Homepage')
-            # query from github if we know github repo/name
-            found = False
-            for hp in (homepage, project_homepage):
-                if hp and 'github' in hp:
-                    # strip trailing slash, get repo ref as user/repo
-                    github_ref = '/'.join(hp.strip('/').split('/')[-2:])
-                    # query repo license, if available update info
-                    repo_license = self.get_github_repo_license(github_ref)
-                    if repo_license and 'license_text' in repo_license:
-                        infos[pkg].update(repo_license)
-                        found = True
-                        break
-            # last fall back, get verbatim license text from github
-            if not found:
-                license_family = infos[pkg].get('license_family', '')
-                license_name = infos[pkg].get('license', '')
-                if license_name or license_family:
-                    license = self.get_github_license(license_name, license_family)
-                    infos[pkg].update(license)
-        return infos
+        return dict(self.iter_packages_info(packages))
+
+    def get_package_info(self, data):
+        """
+        query pypi and github for a single package
+
+        The package data is shared with other providers and consumers, the
+        information found is returned as a new dict to be merged by the caller.
+
+        :param data: the package data, not modified
+        :return: dict of the information found
+        """
+        # query from pypi
+        pkg = data['name']
+        info = dict(self.get_pypi_info(pkg))
+        known = lambda k: info[k] if k in info else data.get(k)
+        homepage = known('home_page')
+        project_urls = known('project_urls') or {}
+        project_homepage = project_urls.get('Homepage')
+        # query from github if we know github repo/name
+        found = False
+        for hp in (homepage, project_homepage):
+            if hp and 'github' in hp:
+                # strip trailing slash, get repo ref as user/repo
+                github_ref = '/'.join(hp.strip('/').split('/')[-2:])
+                # query repo license, if available update info
+                repo_license = self.get_github_repo_license(github_ref)
+                if repo_license and 'license_text' in repo_license:
+                    info.update(repo_license)
+                    found = True
+                    break
+        # last fall back, get verbatim license text from github
+        if not found:
+            license_family = known('license_family') or ''
+            license_name = known('license') or ''
+            if license_name or license_family:
+                license = self.get_github_license(license_name, license_family)
+                info.update(license)
+        return info
@@ -0,0 +1,40 @@
+from pylicenses.providers import PackageProvider
+from pylicenses.spdx import get_corpus
+
+
+class SpdxProvider(PackageProvider):
+    """
+    Use the bundled SPDX license corpus to provide license texts by license name
+
+    Packages that report a license (e.g. MIT, BSD-3-Clause) but do not include
+    the license text get the verbatim text from the corpus, without network
+    access.
+
+    The corpus texts are templates, without the copyright notice of the
+    package. Hence this provider is not in the default fallback providers,
+    PyPiProvider uses the corpus only if the package's repository has no
+    license. Add it by name ('spdx') to resolve such packages locally.
+    """
+    provides = ('license_spdx_id', 'license_source')
+    # package fields that may name the license
+    NAME_KEYS = ('license_expression', 'license', 'license_family')
+
+    def accepts(self, pkg, data):
+        return any(isinstance(data.get(k), str) and data.get(k) for k in self.NAME_KEYS)
+
+    def get_packages_info(self, packages):
+        corpus = get_corpus()
+        infos = {}
+        for pkg, data in packages.items():
+            license = {}
+            for name in (data.get(k) for k in self.NAME_KEYS):
+                spdx_id = corpus.lookup(name) if isinstance(name, str) else None
+                if spdx_id:
+                    license = {
+                        'license_spdx_id': spdx_id,
+                        'license_trace': 'spdx license corpus',
+                        'license_source': corpus.filename(spdx_id),
+                    }
+                    break
+            infos[pkg] = license
+        return infos
@@ -1,6 +1,5 @@
-import requests
-
-from pylicenses.providers import PackageProvider
+from pylicenses.cache import LicenseCache
+from pylicenses.providers import PackageProvider, COST_NETWORK
 
 
 class StaticProvider(PackageProvider):
@@ -12,12 +11,23 @@ class StaticProvider(PackageProvider):
         'intel-openmp': 'https://software.intel.com/en-us/license/intel-simplified-software-license',
         'yaml': 'https://raw.githubusercontent.com/yaml/pyyaml/master/LICENSE',
     }
+    init_kwargs = ['cache']
+    # the mapped urls are fetched (and cached)
+    cost = COST_NETWORK
+
+    def __init__(self, cache=None):
+        self.cache = cache or LicenseCache(':memory:')
+
+    def accepts(self, pkg, data):
+        return pkg in self.LICENSE_MAP
 
     def get_license(self, package):
         license = {}
         if package in self.LICENSE_MAP:
             license_source = self.LICENSE_MAP[package]
-            resp = requests.get(license_source)
+            resp = self.cache.fetch(license_source, 'static')
+            if resp.status_code != 200:
+                return license
             text = resp.content
             license = {
                 'license_text': text,
@@ -0,0 +1,268 @@
+import os
+from collections.abc import Mapping, MutableMapping
+from functools import lru_cache
+
+from pylicenses import profile
+
+_MISSING = object()
+# the number of distinct license texts kept for interning
+MAX_INTERNED_TEXTS = 1024
+
+
+@lru_cache(maxsize=MAX_INTERNED_TEXTS)
+def _interned(text):
+    # returns the first of equal texts as long as it is cached
+    return text
+
+
+def intern_text(text):
+    """
+    return the stored copy of a license text
+
+    Identical texts share a single copy. Only the most recently used texts
+    are kept, so that a long running process (e.g. the daemon) does not
+    keep every text it has seen.
+    """
+    if not isinstance(text, (str, bytes)):
+        return text
+    return _interned(text)
+
+
+def read_text(path):
+    with open(path, 'r', errors='replace') as fin:
+        text = fin.read()
+        profile.count_read(fin)
+    return text
+
+
+class PackageRecord(MutableMapping):
+    """
+    A package's data as a compact, dict-like record
+
+    Well known keys are stored in slots, any other key in a dict. The
+    license_text is not stored until it is first accessed, when it is read
+    from license_source if that is a local file. Identical license texts are
+    interned, i.e. stored only once for all packages.
+    """
+    FIELDS = ('name', 'dist_name', 'version', 'build', 'license', 'license_family',
+              'license_spdx_id', 'license_expression', 'license_source', 'license_trace',
+              'author', 'home_page', 'url')
+    __slots__ = FIELDS + ('_license_text', '_local_source', '_extra')
+
+    def __init__(self, *args, **kwargs):
+        self._license_text = _MISSING
+        self._local_source = _MISSING
+        self._extra = None
+        self.update(*args, **kwargs)
+
+    @property
+    def has_local_source(self):
+        # the file is checked once per license_source, not on every access
+        if self._local_source is _MISSING:
+            source = getattr(self, 'license_source', None)
+            self._local_source = isinstance(source, str) and '://' not in source and os.path.isfile(source)
+        return self._local_source
+
+    @property
+    def is_text_loaded(self):
+        return self._license_text is not _MISSING
+
+    def _get_license_text(self):
+        if self._license_text is _MISSING:
+            if not self.has_local_source:
+                raise KeyError('license_text')
+            self._license_text = intern_text(read_text(self.license_source))
+        return self._license_text
+
+    def __getitem__(self, key):
+        if key == 'license_text':
+            return self._get_license_text()
+        if key in self.FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key == 'license_text':
+            self._license_text = intern_text(value)
+        elif key in self.FIELDS:
+            if key == 'license_source' and getattr(self, key, _MISSING) != value:
+                # a new source, the text will be loaded from there
+                self._license_text = _MISSING
+                self._local_source = _MISSING
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key == 'license_text':
+            if self._license_text is _MISSING:
+                raise KeyError(key)
+            self._license_text = _MISSING
+        elif key in self.FIELDS:
+            if getattr(self, key, _MISSING) is _MISSING:
+                raise KeyError(key)
+            if key == 'license_source':
+                self._license_text = _MISSING
+                self._local_source = _MISSING
+            delattr(self, key)
+        else:
+            if self._extra is None:
+                raise KeyError(key)
+            del self._extra[key]
+
+    def _keys(self, lazy=False):
+        keys = [k for k in self.FIELDS if getattr(self, k, _MISSING) is not _MISSING]
+        if self.is_text_loaded or (not lazy and self.has_local_source):
+            keys.append('license_text')
+        keys.extend(self._extra or ())
+        return keys
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __contains__(self, key):
+        if key == 'license_text':
+            return self.is_text_loaded or self.has_local_source
+        if key in self.FIELDS:
+            return getattr(self, key, _MISSING) is not _MISSING
+        return self._extra is not None and key in self._extra
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, *args, **kwargs):
+        """
+        update from a mapping or iterable of (key, value), like dict.update
+
+        A license_source is set before the license_text, and the text of
+        another PackageRecord is only copied if it has been loaded already.
+        """
+        if args:
+            other = args[0]
+            if isinstance(other, PackageRecord):
+                items = [(k, other[k]) for k in other._keys(lazy=True)]
+            elif isinstance(other, Mapping):
+                items = list(other.items())
+            else:
+                items = list(other)
+        else:
+            items = []
+        items.extend(kwargs.items())
+        items.sort(key=lambda kv: kv[0] != 'license_source')
+        for key, value in items:
+            self[key] = value
+
+    def as_dict(self, lazy=True):
+        """
+        return a dict of the record's data
+
+        :param lazy: if True, the license_text is not included unless loaded
+        """
+        return {k: self[k] for k in self._keys(lazy=lazy)}
+
+    def __repr__(self):
+        return 'PackageRecord({!r})'.format(self.as_dict())
+
+
+class PackageStore(MutableMapping):
+    """
+    Packages indexed by their canonical key, with an alias index
+
+    Every package is stored once as a PackageRecord under its name. Other
+    keys such as the dist_name are aliases of the same record. Iterating
+    the store only yields canonical keys.
+
+    Like a defaultdict, store[key] creates an empty record for unknown keys.
+    Assigning a mapping that has a different 'name' merges it into the record
+    of that name and registers the key as an alias.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._records = {}
+        self._aliases = {}
+        self._keys_by_id = {}
+        self.update(*args, **kwargs)
+
+    def resolve(self, key):
+        """
+        return the canonical key of key, or None
+        """
+        if key in self._records:
+            return key
+        return self._aliases.get(key)
+
+    def alias(self, alias, key):
+        """
+        register alias as another key of the record stored by key
+        """
+        if alias != key and alias not in self._records:
+            self._aliases[alias] = key
+
+    def aliases(self, key):
+        key = self.resolve(key)
+        return [alias for alias, target in self._aliases.items() if target == key]
+
+    def _add(self, key, record):
+        self._records[key] = record
+        self._keys_by_id[id(record)] = key
+
+    def __getitem__(self, key):
+        canonical = self.resolve(key)
+        if canonical is None:
+            canonical = key
+            self._add(key, PackageRecord())
+        return self._records[canonical]
+
+    def get(self, key, default=None):
+        canonical = self.resolve(key)
+        return self._records[canonical] if canonical is not None else default
+
+    def __contains__(self, key):
+        return self.resolve(key) is not None
+
+    def __setitem__(self, key, value):
+        if isinstance(value, PackageRecord) and id(value) in self._keys_by_id:
+            self.alias(key, self._keys_by_id[id(value)])
+            return
+        name = value.get('name')
+        if name and name != key:
+            self[name].update(value)
+            self.alias(key, self.resolve(name))
+            return
+        canonical = self.resolve(key)
+        if canonical is None:
+            self._add(key, value if isinstance(value, PackageRecord) else PackageRecord(value))
+        else:
+            self._records[canonical].update(value)
+
+    def __delitem__(self, key):
+        if key in self._records:
+            del self._keys_by_id[id(self._records.pop(key))]
+            self._aliases = {alias: target for alias, target in self._aliases.items()
+                             if target != key}
+        elif key in self._aliases:
+            del self._aliases[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def __len__(self):
+        return len(self._records)
+
+    def __repr__(self):
+        return 'PackageStore({!r})'.format(self._records)
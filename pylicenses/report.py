@@ -0,0 +1,458 @@
+"""
+Report writers
+
+Every writer streams one package at a time, see write_reports():
+
+    with open('sbom.json', 'w') as fout:
+        write_reports(lic.packages.items(), [CycloneDxWriter(fout)])
+
+Writers can also be consumers of PyLicenses, writing each package as it is
+finalized during discovery. The dependencies of writers that use the graph
+(e.g. SPDX relationships) are only written by close(), the graph may be set
+after the packages are written.
+
+Writers are selected by name from FORMATS.
+"""
+import csv
+import hashlib
+import json
+import re
+import shutil
+import uuid
+from datetime import datetime, timezone
+from itertools import chain
+from tempfile import SpooledTemporaryFile
+from urllib.parse import quote
+
+from pylicenses.normalize import license_ids, package_expression
+from pylicenses.providers import canonical_name
+
+
+def license_text_str(license_text):
+    if isinstance(license_text, bytes):
+        license_text = license_text.decode('utf8')
+    return license_text
+
+
+def license_text_id(license_text):
+    """
+    return the id of a license text, independent of whitespace
+
+    Texts that only differ in line breaks, indentation or trailing blanks
+    have the same id.
+    """
+    normalized = ' '.join(license_text_str(license_text).split())
+    return hashlib.sha256(normalized.encode('utf8')).hexdigest()[:16]
+
+
+def json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, bytes):
+        return value.decode('utf8', errors='replace')
+    return str(value)
+
+
+def spooled():
+    return SpooledTemporaryFile(max_size=1024 * 1024, mode='w+')
+
+
+class ReportWriter(object):
+    """
+    Base class of report writers
+
+    write_reports() calls open() once, write(pkg, data) for every package
+    and close() at the end. Writers must not keep the packages' data, any
+    output that is only complete at the end (e.g. relationships) is spooled
+    to a temporary file.
+    """
+    #: the default file name
+    filename = None
+    #: if True, write_reports() passes the DependencyGraph, it is used by close()
+    uses_graph = False
+
+    def __init__(self, fout, graph=None):
+        """
+
+        :param fout: the file to write to
+        :param graph: optional DependencyGraph of the packages
+        """
+        self.fout = fout
+        self.graph = graph
+
+    def open(self):
+        pass
+
+    def write(self, pkg, data):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class TrailWriter(ReportWriter):
+    """
+    the THIRDPARTY-LICENSES report
+
+    If dedup is True, every distinct license text is written once in a
+    texts section at the end of the report, packages reference it by its
+    id. Texts are spooled to a temporary file as they are first seen.
+    """
+    filename = 'THIRDPARTY-LICENSES'
+
+    def __init__(self, fout, graph=None, dedup=False):
+        super().__init__(fout, graph=graph)
+        self.dedup = dedup
+        self.seen = set()
+        self.texts = None
+
+    def open(self):
+        self.fout.write('\n-- ** THIRDPARTY LICENSES **\n')
+        self.fout.write('-- report produced by pylicenses [use at your own risk]')
+        self.fout.write('--')
+        self.texts = spooled() if self.dedup else None
+
+    def write(self, pkg, data):
+        fout = self.fout
+        license_text = license_text_str(data.get('license_text'))
+        fout.write('--\n')
+        fout.write('Package: {}\n'.format(pkg))
+        fout.write('Version: {}\n'.format(data.get('version', 'latest')))
+        fout.write('Author: {}\n'.format(data.get('author')))
+        fout.write('License: {}\n'.format(data.get('license')))
+        fout.write('Home-page: {}\n'.format(data.get('home_page')))
+        fout.write('Source: {}\n'.format(data.get('url')))
+        if data.get('envs'):
+            envs = ', '.join('{} ({})'.format(env, version) for env, version in sorted(data['envs'].items()))
+            fout.write('Environments: {}\n'.format(envs))
+        if data.get('license_conflict'):
+            # the license text is of the first environment
+            envs = ', '.join('{} ({} {})'.format(env, env_data.get('version'), package_expression(env_data))
+                             for env, env_data in sorted(data['env_licenses'].items()))
+            fout.write('License-Conflict: {}\n'.format(envs))
+        if self.dedup and license_text:
+            text_id = license_text_id(license_text)
+            fout.write('Licence Text: [{}]\n'.format(text_id))
+            if text_id not in self.seen:
+                self.seen.add(text_id)
+                self.texts.write('--\nLicence-Text-Id: {}\n{}\n'.format(text_id, license_text))
+        else:
+            fout.write('Licence Text:\n{}\n'.format(license_text))
+
+    def close(self):
+        if self.dedup:
+            self.fout.write('\n-- ** LICENSE TEXTS **\n')
+            self.texts.seek(0)
+            shutil.copyfileobj(self.texts, self.fout)
+            self.texts.close()
+        self.fout.write('\n-- ** end of report **\n')
+
+
+class JsonLinesWriter(ReportWriter):
+    """
+    one json object per package, including the license text
+
+    If a graph is given, the packages are followed by one relationships
+    object per package, e.g.
+
+        {"relationships": {"name": "idna", "required_by": ["requests"], "is_primary": false}}
+    """
+    filename = 'THIRDPARTY-LICENSES.jsonl'
+    uses_graph = True
+    # written as relationships, known only once all packages are discovered
+    RELATIONSHIP_KEYS = ('required_by', 'is_primary')
+
+    def write(self, pkg, data):
+        record = {k: data.get(k) for k in data if k not in self.RELATIONSHIP_KEYS}
+        record['license_text'] = license_text_str(record.get('license_text'))
+        self.fout.write(json.dumps(record, default=json_default, sort_keys=True))
+        self.fout.write('\n')
+
+    def close(self):
+        graph = self.graph
+        for i in range(len(graph) if graph is not None else 0):
+            name = graph.label(i)
+            required_by = sorted(graph.dependents(name))
+            relationships = {'name': name, 'required_by': required_by, 'is_primary': not required_by}
+            self.fout.write(json.dumps({'relationships': relationships}, sort_keys=True))
+            self.fout.write('\n')
+
+
+class CsvWriter(ReportWriter):
+    """
+    one row per package, license texts are referenced by their id
+    """
+    filename = 'THIRDPARTY-LICENSES.csv'
+    COLUMNS = ('name', 'version', 'license', 'license_expression', 'author', 'home_page',
+               'url', 'license_source', 'license_text_id')
+
+    def open(self):
+        self.writer = csv.writer(self.fout)
+        self.writer.writerow(self.COLUMNS)
+
+    def write(self, pkg, data):
+        license_text = data.get('license_text')
+        row = dict(data, name=pkg, license_text_id=license_text_id(license_text) if license_text else None)
+        self.writer.writerow([row.get(k) for k in self.COLUMNS])
+
+
+def tool_name():
+    from pylicenses import version
+    return 'pylicenses', version
+
+
+def timestamp():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class JsonArrayWriter(ReportWriter):
+    """
+    write a json document with one array of package entries
+
+    The document is written as header + entries + footer, so that entries
+    are written as they come.
+    """
+    key = None
+
+    def header(self):
+        raise NotImplementedError
+
+    def open(self):
+        document = json.dumps(self.header(), indent=1)
+        # "..., "key": [ <entries> ] ... }
+        self.fout.write(document[:-2] + ',\n "{}": ['.format(self.key))
+        self.count = 0
+
+    def write_entry(self, entry):
+        self.fout.write(',\n  ' if self.count else '\n  ')
+        self.fout.write(json.dumps(entry, default=json_default))
+        self.count += 1
+
+    def write_array(self, key, entries):
+        """
+        write entries as the array key, entries is an iterable or a spooled file of json lines
+        """
+        self.fout.write(',\n "{}": ['.format(key))
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, str):
+                entry = json.dumps(entry, default=json_default)
+            self.fout.write(',\n  ' if i else '\n  ')
+            self.fout.write(entry.rstrip('\n'))
+        self.fout.write('\n ]')
+
+    def close(self):
+        self.fout.write('\n ]')
+        self.footer()
+        self.fout.write('\n}\n')
+
+    def footer(self):
+        pass
+
+
+class SpdxWriter(JsonArrayWriter):
+    """
+    SPDX 2.3 json document
+
+    Every package is described by the document. Dependencies are written as
+    DEPENDS_ON relationships if a graph is given. Every LicenseRef- used in
+    a license expression is written once to hasExtractedLicensingInfos,
+    with the text of the first package using it.
+    """
+    filename = 'THIRDPARTY-LICENSES.spdx.json'
+    key = 'packages'
+    uses_graph = True
+
+    def __init__(self, fout, graph=None, name='thirdparty-licenses'):
+        super().__init__(fout, graph=graph)
+        self.name = name
+        self.refs = set()
+
+    @staticmethod
+    def spdx_ref(pkg):
+        ref = re.sub(r'[^A-Za-z0-9.-]', '-', pkg)
+        if ref != pkg:
+            # keep refs unique, e.g. for foo_bar and foo-bar
+            ref += '-' + hashlib.sha1(pkg.encode('utf8')).hexdigest()[:8]
+        return 'SPDXRef-Package-' + ref
+
+    def header(self):
+        tool, version = tool_name()
+        return {
+            'spdxVersion': 'SPDX-2.3',
+            'dataLicense': 'CC0-1.0',
+            'SPDXID': 'SPDXRef-DOCUMENT',
+            'name': self.name,
+            'documentNamespace': 'https://spdx.org/spdxdocs/{}-{}'.format(self.name, uuid.uuid4()),
+            'creationInfo': {
+                'created': timestamp(),
+                'creators': ['Tool: {}-{}'.format(tool, version)],
+            },
+        }
+
+    def open(self):
+        super().open()
+        self.relationships = spooled()
+        self.extracted = spooled()
+
+    def write(self, pkg, data):
+        ref = self.spdx_ref(pkg)
+        expression = data.get('license_expression') or 'NOASSERTION'
+        entry = {
+            'SPDXID': ref,
+            'name': pkg,
+            'versionInfo': data.get('version') or 'NOASSERTION',
+            'downloadLocation': data.get('url') or 'NOASSERTION',
+            'filesAnalyzed': False,
+            'licenseConcluded': expression,
+            'licenseDeclared': expression,
+            'copyrightText': 'NOASSERTION',
+        }
+        if data.get('home_page'):
+            entry['homepage'] = data['home_page']
+        if data.get('author'):
+            entry['originator'] = 'Person: {}'.format(data['author'])
+        if data.get('license'):
+            entry['licenseComments'] = 'declared as {}'.format(data['license'])
+        self.write_entry(entry)
+        self.relationships.write(json.dumps({
+            'spdxElementId': 'SPDXRef-DOCUMENT',
+            'relationshipType': 'DESCRIBES',
+            'relatedSpdxElement': ref,
+        }) + '\n')
+        for license_id in license_ids(expression) if expression != 'NOASSERTION' else ():
+            if license_id.startswith('LicenseRef-') and license_id not in self.refs:
+                self.refs.add(license_id)
+                text = license_text_str(data.get('license_text')) or data.get('license') or license_id
+                self.extracted.write(json.dumps({
+                    'licenseId': license_id,
+                    'name': license_id[len('LicenseRef-'):],
+                    'extractedText': text,
+                }) + '\n')
+
+    def dependencies(self):
+        for source, target in self.graph.edges():
+            yield {
+                'spdxElementId': self.spdx_ref(self.graph.label(source)),
+                'relationshipType': 'DEPENDS_ON',
+                'relatedSpdxElement': self.spdx_ref(self.graph.label(target)),
+            }
+
+    def footer(self):
+        for key, spool in (('relationships', self.relationships),
+                           ('hasExtractedLicensingInfos', self.extracted)):
+            spool.seek(0)
+            if key == 'relationships' and self.graph is not None:
+                # graph edges follow the spooled DESCRIBES relationships
+                self.write_array(key, chain(spool, (json.dumps(d) for d in self.dependencies())))
+            else:
+                self.write_array(key, spool)
+            spool.close()
+
+
+class CycloneDxWriter(JsonArrayWriter):
+    """
+    CycloneDX 1.5 json document
+
+    Packages are library components, referenced by name. Dependencies are
+    written if a graph is given.
+    """
+    filename = 'THIRDPARTY-LICENSES.cdx.json'
+    key = 'components'
+    uses_graph = True
+
+    def header(self):
+        tool, version = tool_name()
+        return {
+            'bomFormat': 'CycloneDX',
+            'specVersion': '1.5',
+            'serialNumber': 'urn:uuid:{}'.format(uuid.uuid4()),
+            'version': 1,
+            'metadata': {
+                'timestamp': timestamp(),
+                'tools': [{'name': tool, 'version': version}],
+            },
+        }
+
+    @staticmethod
+    def purl(pkg, data):
+        version = '@' + quote(str(data['version'])) if data.get('version') else ''
+        if data.get('build'):
+            return 'pkg:conda/{}{}?build={}'.format(quote(pkg.lower()), version, quote(data['build']))
+        return 'pkg:pypi/{}{}'.format(canonical_name(pkg), version)
+
+    def write(self, pkg, data):
+        entry = {
+            'type': 'library',
+            'bom-ref': pkg,
+            'name': pkg,
+            'purl': self.purl(pkg, data),
+        }
+        if data.get('version'):
+            entry['version'] = str(data['version'])
+        if data.get('author'):
+            entry['author'] = data['author']
+        if data.get('license_expression'):
+            entry['licenses'] = [{'expression': data['license_expression']}]
+        elif data.get('license'):
+            entry['licenses'] = [{'license': {'name': data['license']}}]
+        references = [{'type': kind, 'url': data[key]}
+                      for key, kind in (('home_page', 'website'), ('url', 'distribution'))
+                      if data.get(key)]
+        if references:
+            entry['externalReferences'] = references
+        self.write_entry(entry)
+
+    def footer(self):
+        if self.graph is not None:
+            graph = self.graph
+            self.write_array('dependencies', (
+                {'ref': graph.label(i),
+                 'dependsOn': [graph.label(j) for j in graph.indices[graph.indptr[i]:graph.indptr[i + 1]]]}
+                for i in range(len(graph))))
+
+
+FORMATS = {
+    'trail': TrailWriter,
+    'jsonl': JsonLinesWriter,
+    'csv': CsvWriter,
+    'spdx': SpdxWriter,
+    'cyclonedx': CycloneDxWriter,
+}
+
+
+def write_reports(packages, writers):
+    """
+    stream packages to all writers in one pass
+
+    License texts that are loaded from local files for writing are released
+    after every package, so memory does not grow with the report.
+
+    :param packages: iterable of (pkg, data) tuples, e.g. lic.packages.items()
+    :param writers: list of ReportWriter
+    """
+    for writer in writers:
+        writer.open()
+    for pkg, data in packages:
+        if pkg != data.get('name'):
+            continue
+        loaded = getattr(data, 'is_text_loaded', True)
+        for writer in writers:
+            writer.write(pkg, data)
+        if not loaded and data.is_text_loaded:
+            del data['license_text']
+    for writer in writers:
+        writer.close()
+
+
+def write_license_trail(packages, fout, dedup=False):
+    """
+    write the THIRDPARTY-LICENSES report
+
+    :param packages: iterable of (pkg, data) tuples, e.g. lic.packages.items()
+    :param fout: the file to write to
+    :param dedup: if True, every distinct license text is written once in
+       a texts section at the end of the report, packages reference it by
+       its id. Texts are spooled to a temporary file as they are first seen,
+       so the report is streamed without keeping the texts in memory.
+    """
+    write_reports(packages, [TrailWriter(fout, dedup=dedup)])
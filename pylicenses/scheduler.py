@@ -0,0 +1,214 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+
+from pylicenses import profile
+from pylicenses.providers import iter_packages_info
+
+# package fields that decide whether a provider may find something new
+SIGNATURE_KEYS = ('name', 'version', 'license', 'license_family', 'license_spdx_id', 'license_source')
+
+
+# markers of a provider's end in the stream of records, see ProviderScheduler.stream()
+_DONE, _FAILED = object(), object()
+
+
+def is_resolved(data):
+    return any(data.get(k) for k in ('license_source', 'license_text'))
+
+
+def signature(data):
+    return tuple(data.get(k) for k in SIGNATURE_KEYS)
+
+
+class ProviderScheduler(object):
+    """
+    Run fallback providers in n passes, cheapest first, until no progress is made
+
+    Providers are grouped by their cost class (local, subprocess, network).
+    Starting with the cheapest class, passes over the groups up to the
+    current class (cheapest group first) are repeated until a pass makes no
+    progress, only then the next more expensive class is added. Thus network providers only get the
+    packages that no local provider could resolve, and packages that receive
+    e.g. a license name from a network provider are offered to the local
+    providers again.
+
+    The missing packages are kept as a dict that shrinks as packages are
+    resolved. A provider is offered a package only if it accepts it and has
+    not seen it yet in its current state (see signature()). Providers of
+    the same cost class run concurrently; their records are applied as
+    they are yielded, except that a record waits for the providers of
+    higher precedence that were offered the same package. Thus the first
+    provider in declared order to resolve a package wins, and on_update
+    (e.g. a policy with fail_fast) sees each package as soon as it is found.
+    """
+
+    def __init__(self, providers, on_update=None, on_resolved=None):
+        """
+
+        :param providers: the list of providers, in order of precedence
+        :param on_update: called as on_update(pkg, data) whenever a provider
+           updated a package, e.g. Policy.evaluate
+        :param on_resolved: called as on_resolved(pkg, data) when a package
+           is resolved, i.e. no other provider is asked for it
+        """
+        self.providers = list(providers)
+        self.on_update = on_update
+        self.on_resolved = on_resolved
+        # provider index => pkg => signature last offered
+        self._seen = [{} for prov in self.providers]
+        # list of (pass, provider class name, offered, resolved)
+        self.history = []
+
+    def ordered(self):
+        """
+        return list of (cost, [provider index]) by ascending cost
+        """
+        costs = sorted((prov.cost, i) for i, prov in enumerate(self.providers))
+        return [(cost, [i for c, i in group]) for cost, group in groupby(costs, key=lambda ci: ci[0])]
+
+    def offered(self, i, missing):
+        prov, seen = self.providers[i], self._seen[i]
+        work = {}
+        for pkg, data in missing.items():
+            sig = signature(data)
+            if seen.get(pkg) != sig and prov.accepts(pkg, data):
+                seen[pkg] = sig
+                work[pkg] = data
+        return work
+
+    def run_group(self, indexes, missing, passno):
+        """
+        run providers of the same cost concurrently on the missing packages
+
+        :return: True if any package information was added
+        """
+        works = [(i, self.offered(i, missing)) for i in indexes]
+        works = [(i, work) for i, work in works if work]
+        if not works:
+            return False
+        resolved = {i: 0 for i, work in works}
+        progress = False
+        records = self.stream(works)
+        try:
+            for i, pkg, info in records:
+                progress = self.apply(i, pkg, info, missing, resolved) or progress
+        finally:
+            records.close()
+        for i, work in works:
+            self.history.append((passno, type(self.providers[i]).__name__, len(work), resolved[i]))
+            profile.resolved(type(self.providers[i]).__name__, len(work), resolved[i])
+        return progress
+
+    def apply(self, i, pkg, info, missing, resolved):
+        """
+        apply a partial record of provider i
+
+        :param resolved: dict of provider index => packages resolved, updated
+        :return: True if package information was added
+        """
+        data = missing.get(pkg)
+        if data is None or not info:
+            return False
+        before = signature(data)
+        data.update(info)
+        self.on_update(pkg, data) if self.on_update else None
+        # a provider's own changes do not make it see the package again
+        self._seen[i][pkg] = signature(data)
+        if not is_resolved(data):
+            return self._seen[i][pkg] != before
+        del missing[pkg]
+        resolved[i] += 1
+        self.on_resolved(pkg, data) if self.on_resolved else None
+        return True
+
+    def stream(self, works):
+        """
+        yield (i, pkg, info) of the providers as their records are found
+
+        Each provider runs in its own thread. A record is held back while a
+        provider of higher precedence that was offered the same package is
+        still running. Closing the generator stops the providers at their
+        next record.
+
+        :param works: list of (provider index, offered packages), in declared order
+        """
+        records = queue.Queue()
+        stop = threading.Event()
+
+        def produce(i, work):
+            infos = self.query(i, work)
+            try:
+                for pkg, info in infos:
+                    if stop.is_set():
+                        break
+                    records.put((i, pkg, info))
+            except BaseException as e:
+                records.put((i, _FAILED, e))
+            finally:
+                infos.close()
+                records.put((i, _DONE, None))
+
+        offered = dict(works)
+        running = set(offered)
+        held = []
+        executor = ThreadPoolExecutor(max_workers=len(works))
+        try:
+            for i, work in works:
+                executor.submit(produce, i, work)
+            while running:
+                i, pkg, info = records.get()
+                if pkg is _FAILED:
+                    raise info
+                if pkg is _DONE:
+                    running.discard(i)
+                else:
+                    held.append((i, pkg, info))
+                waiting = []
+                for record in held:
+                    if any(j < record[0] and record[1] in offered[j] for j in running):
+                        waiting.append(record)
+                    else:
+                        yield record
+                held = waiting
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
+
+    def query(self, i, work):
+        prov = self.providers[i]
+        with profile.timed('provider', type(prov).__name__):
+            yield from iter_packages_info(prov, work)
+
+    def run_pass(self, groups, missing, passno):
+        """
+        run all provider groups once, cheapest first
+
+        :return: True if any package information was added
+        """
+        progress = False
+        for cost, indexes in groups:
+            if not missing:
+                break
+            progress = self.run_group(indexes, missing, passno) or progress
+        return progress
+
+    def run(self, missing):
+        """
+        resolve missing packages
+
+        :param missing: dict of pkg => data of packages with missing licenses,
+           resolved packages are removed
+        :return: missing
+        """
+        groups = self.ordered()
+        passno = 0
+        for upto in range(1, len(groups) + 1):
+            while missing:
+                passno += 1
+                if not self.run_pass(groups[:upto], missing, passno):
+                    break
+            if not missing:
+                break
+        return missing
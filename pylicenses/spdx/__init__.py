@@ -0,0 +1,143 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+from pylicenses.normalize import normalize, license_ids
+
+#: the bundled license texts, one <spdx id>.txt file per license
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'licenses')
+
+def tokenize(text):
+    """
+    return the list of lower case words of a license text
+
+    Copyright statement lines are ignored, they differ for every package.
+    """
+    if isinstance(text, bytes):
+        text = text.decode('utf8', errors='replace')
+    lines = (line for line in text.lower().splitlines()
+             if not line.strip().startswith(('copyright', '(c)', '\u00a9')))
+    return re.findall(r'[a-z0-9]+', '\n'.join(lines))
+
+
+def shingles(tokens, size):
+    """
+    return the set of hashed word n-grams of tokens
+    """
+    if len(tokens) < size:
+        return {hash(tuple(tokens))} if tokens else set()
+    return {hash(tuple(tokens[i:i + size])) for i in range(len(tokens) - size + 1)}
+
+
+class SpdxCorpus(object):
+    """
+    The bundled license texts, by SPDX license id
+
+    Ids are looked up case insensitive and independent of -only / -or-later
+    suffixes, since the license text is the same (e.g. GPL-3.0-or-later
+    and gpl-3.0 both return the GPL-3.0 text).
+    """
+
+    def __init__(self, path=CORPUS_PATH):
+        self.path = path
+        self._files = {}
+        for fn in sorted(os.listdir(path)):
+            if fn.endswith('.txt'):
+                self._files[fn[:-len('.txt')]] = os.path.join(path, fn)
+        self._by_key = {spdx_id.lower(): spdx_id for spdx_id in self._files}
+
+    @property
+    def ids(self):
+        return list(self._files)
+
+    def resolve(self, spdx_id):
+        """
+        return the corpus id of a spdx id or github license key, or None
+        """
+        key = spdx_id.lower().strip()
+        for suffix in ('-only', '-or-later', '+'):
+            if key.endswith(suffix):
+                key = key[:-len(suffix)]
+        return self._by_key.get(key)
+
+    def lookup(self, name):
+        """
+        return the corpus id for a free form license name, or None
+        """
+        if not name:
+            return None
+        spdx_id = self.resolve(name)
+        for license_id in ([] if spdx_id else license_ids(normalize(name))):
+            spdx_id = self.resolve(license_id)
+            if spdx_id:
+                break
+        return spdx_id
+
+    def filename(self, spdx_id):
+        spdx_id = self.resolve(spdx_id)
+        return self._files.get(spdx_id) if spdx_id else None
+
+    def text(self, spdx_id):
+        filename = self.filename(spdx_id)
+        if filename is None:
+            return None
+        with open(filename) as fin:
+            return fin.read()
+
+
+class LicenseMatcher(object):
+    """
+    Classify license texts against the corpus
+
+    Every corpus text is reduced to a set of word n-grams (shingles). An
+    inverted index maps each shingle to the licenses containing it, so that
+    matching a text costs one index lookup per shingle of the text. The best
+    match is the license with the highest Dice coefficient of shared shingles,
+    if it exceeds the threshold.
+    """
+
+    def __init__(self, corpus=None, size=5, threshold=0.8):
+        self.corpus = corpus or get_corpus()
+        self.size = size
+        self.threshold = threshold
+        self._index = {}
+        self._sizes = {}
+        for spdx_id in self.corpus.ids:
+            license_shingles = shingles(tokenize(self.corpus.text(spdx_id)), size)
+            self._sizes[spdx_id] = len(license_shingles)
+            for shingle in license_shingles:
+                self._index.setdefault(shingle, []).append(spdx_id)
+
+    def scores(self, text):
+        """
+        return Counter of spdx id => Dice coefficient for text
+        """
+        text_shingles = shingles(tokenize(text), self.size)
+        common = Counter()
+        for shingle in text_shingles:
+            common.update(self._index.get(shingle, ()))
+        return Counter({
+            spdx_id: 2.0 * count / (len(text_shingles) + self._sizes[spdx_id])
+            for spdx_id, count in common.items()
+        })
+
+    def match(self, text):
+        """
+        return the tuple (spdx id, score) of the best match, or (None, score)
+        """
+        scores = self.scores(text)
+        if not scores:
+            return None, 0.0
+        spdx_id, score = scores.most_common(1)[0]
+        return (spdx_id if score >= self.threshold else None), score
+
+
+@lru_cache(maxsize=None)
+def get_corpus():
+    return SpdxCorpus()
+
+
+@lru_cache(maxsize=None)
+def get_matcher():
+    return LicenseMatcher()
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+
+from pylicenses import profile
+
+
+def file_fingerprint(path, content_hash=False):
+    """
+    return 'mtime:size[:sha1]' of a file, or None if it does not exist
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    fingerprint = '{}:{}'.format(st.st_mtime_ns, st.st_size)
+    if content_hash:
+        with open(path, 'rb') as fin:
+            content = fin.read()
+        profile.count('bytes_read', len(content))
+        fingerprint += ':' + hashlib.sha1(content).hexdigest()
+    return fingerprint
+
+
+def to_json(value):
+    """
+    convert package data values to json serializable values
+    """
+    if hasattr(value, 'as_dict'):
+        # a PackageRecord, keep texts of local files unloaded
+        return value.as_dict()
+    if isinstance(value, bytes):
+        return value.decode('utf8', errors='replace')
+    if isinstance(value, (set, frozenset, tuple)):
+        return sorted(value) if isinstance(value, (set, frozenset)) else list(value)
+    return value
+
+
+class ScanState(object):
+    """
+    The result of a previous discover() run with its environment fingerprint
+
+    The fingerprint maps each distribution (e.g. a .dist-info directory or a
+    conda-meta/*.json file) to a (fingerprint, package name) tuple. Comparing
+    it to the current environment yields the packages that were added,
+    changed or removed since the state was saved.
+    """
+    VERSION = 1
+
+    def __init__(self, fingerprints=None, packages=None):
+        self.fingerprints = fingerprints or {}
+        self.packages = packages or {}
+
+    @classmethod
+    def load(cls, path):
+        """
+        return the ScanState saved at path, or an empty state
+        """
+        try:
+            with open(path) as fin:
+                data = json.load(fin)
+        except (OSError, ValueError):
+            return cls()
+        if data.get('version') != cls.VERSION:
+            return cls()
+        fingerprints = {k: tuple(v) for k, v in data['fingerprints'].items()}
+        return cls(fingerprints=fingerprints, packages=data['packages'])
+
+    def save(self, path):
+        data = {
+            'version': self.VERSION,
+            'fingerprints': self.fingerprints,
+            'packages': self.packages,
+        }
+        tmppath = path + '.tmp'
+        with open(tmppath, 'w') as fout:
+            json.dump(data, fout, default=to_json)
+        os.replace(tmppath, path)
+
+    def diff(self, fingerprints):
+        """
+        compare to the current fingerprints
+
+        :param fingerprints: dict of key => (fingerprint, name)
+        :return: tuple of sets (changed, removed) package names, where changed
+           includes added packages
+        """
+        changed = set()
+        for key, (fingerprint, name) in fingerprints.items():
+            previous = self.fingerprints.get(key)
+            if previous is None or previous[0] != fingerprint:
+                changed.add(name)
+        current = {name for fingerprint, name in fingerprints.values()}
+        removed = {name for key, (fingerprint, name) in self.fingerprints.items()
+                   if key not in fingerprints and name not in current}
+        return changed, removed
@@ -0,0 +1,145 @@
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from unittest import TestCase, mock, skipIf
+
+from pylicenses.providers import archive
+from pylicenses.providers.archive import ArchiveIndex, ArchiveProvider, read_archive, split_archive_name
+
+METADATA = 'Metadata-Version: 2.1\nName: {name}\nVersion: {version}\nLicense: MIT\nAuthor: someone\n\nlong description'
+
+
+def add_tar_member(tf, name, content):
+    content = content.encode('utf8')
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    tf.addfile(info, io.BytesIO(content))
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_wheel(self, name, version, license_text='wheel license'):
+        path = os.path.join(self.tmpdir, '{}-{}-py3-none-any.whl'.format(name, version))
+        distinfo = '{}-{}.dist-info'.format(name, version)
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('{}/__init__.py'.format(name), '')
+            zf.writestr(distinfo + '/METADATA', METADATA.format(name=name, version=version))
+            zf.writestr(distinfo + '/licenses/COPYING', 'copying')
+            if license_text:
+                zf.writestr(distinfo + '/LICENSE', license_text)
+        return path
+
+    def make_sdist(self, name, version):
+        path = os.path.join(self.tmpdir, '{}-{}.tar.gz'.format(name, version))
+        top = '{}-{}'.format(name, version)
+        with tarfile.open(path, 'w:gz') as tf:
+            add_tar_member(tf, top + '/setup.py', '')
+            add_tar_member(tf, top + '/LICENSE.txt', 'sdist license')
+            add_tar_member(tf, top + '/docs/LICENSE', 'not the license')
+            add_tar_member(tf, top + '/PKG-INFO', METADATA.format(name=name, version=version))
+        return path
+
+    def conda_members(self, tf):
+        add_tar_member(tf, 'info/index.json', json.dumps(
+            {'name': 'zlib', 'version': '1.2.11', 'build': 'h7b6447c_3', 'license': 'Zlib'}))
+        add_tar_member(tf, 'info/about.json', json.dumps({'home': 'https://zlib.net', 'license': 'zlib'}))
+        add_tar_member(tf, 'info/licenses/LICENSE', 'zlib license')
+
+    def make_conda(self):
+        path = os.path.join(self.tmpdir, 'zlib-1.2.11-h7b6447c_3.tar.bz2')
+        with tarfile.open(path, 'w:bz2') as tf:
+            self.conda_members(tf)
+            add_tar_member(tf, 'lib/libz.so', 'binary')
+        return path
+
+    def test_split_archive_name(self):
+        self.assertEqual(split_archive_name('six-1.12.0-py2.py3-none-any.whl'),
+                         {'name': 'six', 'version': '1.12.0', 'package_type': 'pypi'})
+        self.assertEqual(split_archive_name('python-dateutil-2.8.0.tar.gz')['name'], 'python-dateutil')
+        self.assertEqual(split_archive_name('mkl-service-1.1.2-py36h17a0993_4.conda')['build'],
+                         'py36h17a0993_4')
+        self.assertIsNone(split_archive_name('README.md'))
+
+    def test_wheel(self):
+        data = read_archive(self.make_wheel('foo', '1.0'))
+        self.assertEqual(data['name'], 'foo')
+        self.assertEqual(data['license'], 'MIT')
+        self.assertEqual(data['author'], 'someone')
+        self.assertEqual(data['license_text'], 'wheel license')
+        self.assertTrue(data['license_source'].endswith('.whl!foo-1.0.dist-info/LICENSE'))
+        self.assertNotIn('description', data)
+
+    def test_sdist(self):
+        data = read_archive(self.make_sdist('bar', '2.0'))
+        self.assertEqual((data['name'], data['version']), ('bar', '2.0'))
+        self.assertEqual(data['license_text'], 'sdist license')
+
+    def test_conda(self):
+        data = read_archive(self.make_conda())
+        self.assertEqual(data['build'], 'h7b6447c_3')
+        self.assertEqual(data['license'], 'Zlib')
+        self.assertEqual(data['home_page'], 'https://zlib.net')
+        self.assertEqual(data['license_text'], 'zlib license')
+
+    @skipIf(archive.zstandard is None, 'zstandard is not installed')
+    def test_conda_v2(self):
+        path = os.path.join(self.tmpdir, 'zlib-1.2.11-h7b6447c_3.conda')
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w') as tf:
+            self.conda_members(tf)
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('metadata.json', '{"conda_pkg_format_version": 2}')
+            zf.writestr('info-zlib-1.2.11-h7b6447c_3.tar.zst',
+                        archive.zstandard.ZstdCompressor().compress(buffer.getvalue()))
+        data = read_archive(path)
+        self.assertEqual(data['license_text'], 'zlib license')
+
+    def test_conda_v2_without_zstandard(self):
+        path = os.path.join(self.tmpdir, 'zlib-1.2.11-h7b6447c_3.conda')
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('metadata.json', '{"conda_pkg_format_version": 2}')
+        with mock.patch.object(archive, 'zstandard', None):
+            with self.assertWarnsRegex(UserWarning, 'zstandard'):
+                index = ArchiveIndex(max_workers=1).load([self.tmpdir])
+        self.assertIsNone(index.find('zlib', '1.2.11').get('license_text'))
+
+    def test_not_an_archive(self):
+        path = os.path.join(self.tmpdir, 'broken-1.0-py3-none-any.whl')
+        with open(path, 'w') as fout:
+            fout.write('not a zip')
+        self.assertIsNone(read_archive(path))
+
+    def test_provider(self):
+        self.make_wheel('foo', '1.0')
+        self.make_wheel('foo', '1.1', license_text=None)
+        self.make_wheel('Foo_Bar', '0.1')
+        self.make_sdist('bar', '2.0')
+        self.make_conda()
+        index = ArchiveIndex(max_workers=2).load([self.tmpdir])
+        self.assertEqual(len(index), 5)
+        self.assertEqual(index.find('foo')['version'], '1.1')
+        self.assertEqual(index.find('foo', version='1.0')['license_text'], 'wheel license')
+        self.assertIsNone(index.find('zlib', version='1.2.11', build='other'))
+        provider = ArchiveProvider(wheelhouse=[self.tmpdir], max_workers=1)
+        packages = {
+            'foo-bar': {'name': 'foo-bar', 'version': '0.1'},
+            'bar': {'name': 'bar', 'version': '2.0', 'author': 'the author'},
+            'baz': {'name': 'baz'},
+        }
+        self.assertFalse(provider.accepts('baz', packages['baz']))
+        infos = provider.get_packages_info(packages)
+        self.assertEqual(set(infos), {'foo-bar', 'bar'})
+        self.assertNotIn('name', infos['foo-bar'])
+        self.assertEqual(infos['foo-bar']['license_text'], 'wheel license')
+        # data of the package is kept
+        self.assertNotIn('author', infos['bar'])
+        self.assertFalse(ArchiveProvider().accepts('bar', packages['bar']))
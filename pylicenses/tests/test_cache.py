@@ -0,0 +1,135 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from pylicenses.cache import LicenseCache
+from pylicenses.transport import Transport, BudgetExceeded
+
+
+class EtagHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(self.headers.get('If-None-Match'))
+        if self.path == '/slow':
+            time.sleep(1)
+        if self.path == '/down':
+            self.send_response(503)
+            self.send_header('Retry-After', '10')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path == '/flaky' and len(self.requests_seen) == 1:
+            # a transient error, e.g. of a proxy
+            self.send_response(502)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = b'MIT License'
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LicenseCacheTests(TestCase):
+    def setUp(self):
+        EtagHandler.requests_seen = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), EtagHandler)
+        self.url = 'http://127.0.0.1:{}/license'.format(self.server.server_port)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.tmpdir = TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def test_fetch_persistent(self):
+        cache = LicenseCache(self.tmpdir.name)
+        resp = cache.fetch(self.url, 'static')
+        self.assertEqual(resp.content, b'MIT License')
+        self.assertFalse(resp.from_cache)
+        # a new cache instance on the same path serves without a request
+        cache = LicenseCache(self.tmpdir.name)
+        resp = cache.fetch(self.url, 'static')
+        self.assertTrue(resp.from_cache)
+        self.assertEqual(resp.content, b'MIT License')
+        self.assertEqual(len(EtagHandler.requests_seen), 1)
+
+    def test_fetch_revalidate(self):
+        cache = LicenseCache(self.tmpdir.name, ttl={'static': 0})
+        cache.fetch(self.url, 'static')
+        # the server sent no Last-Modified, none is made up
+        self.assertIsNone(cache.get('static', self.url)[3])
+        resp = cache.fetch(self.url, 'static')
+        self.assertEqual(EtagHandler.requests_seen, [None, '"v1"'])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, b'MIT License')
+
+    def test_offline(self):
+        cache = LicenseCache(self.tmpdir.name, ttl={'static': 0})
+        cache.fetch(self.url, 'static')
+        cache.offline = True
+        resp = cache.fetch(self.url, 'static')
+        self.assertEqual(resp.content, b'MIT License')
+        resp = cache.fetch(self.url + '/other', 'static')
+        self.assertEqual(resp.status_code, 504)
+        self.assertEqual(len(EtagHandler.requests_seen), 1)
+
+    def test_evict(self):
+        cache = LicenseCache(':memory:', max_size=10)
+        cache.put('static', 'a', 200, b'x' * 6)
+        cache.put('static', 'b', 200, b'y' * 6)
+        self.assertIsNone(cache.get('static', 'a'))
+        self.assertIsNotNone(cache.get('static', 'b'))
+
+    def test_retry(self):
+        cache = LicenseCache(':memory:', transport=Transport(backoff=0))
+        resp = cache.fetch(self.url.replace('/license', '/flaky'), 'static')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, b'MIT License')
+        self.assertEqual(len(EtagHandler.requests_seen), 2)
+
+    def test_unreachable(self):
+        cache = LicenseCache(':memory:', ttl={'static': 0}, transport=Transport(retries=0))
+        cache.fetch(self.url, 'static')
+        self.server.shutdown()
+        self.server.server_close()
+        # the stale entry is served, a miss is a 504
+        resp = cache.fetch(self.url, 'static')
+        self.assertTrue(resp.from_cache)
+        self.assertEqual(resp.content, b'MIT License')
+        resp = cache.fetch(self.url + '/other', 'static')
+        self.assertEqual(resp.status_code, 504)
+
+    def test_budget(self):
+        cache = LicenseCache(':memory:', ttl={'static': 0}, transport=Transport(max_requests=1))
+        cache.fetch(self.url, 'static')
+        # no budget left, the stale entry is served
+        resp = cache.fetch(self.url, 'static')
+        self.assertTrue(resp.from_cache)
+        self.assertEqual(resp.content, b'MIT License')
+        resp = cache.fetch(self.url + '/other', 'static')
+        self.assertEqual(resp.status_code, 504)
+        self.assertEqual(len(EtagHandler.requests_seen), 1)
+
+    def test_max_time(self):
+        # neither a slow upstream nor the backoff of a failing one exceed the time budget
+        for path in ('/slow', '/down'):
+            transport = Transport(max_time=0.3)
+            start = time.monotonic()
+            with self.assertRaises(BudgetExceeded):
+                transport.get(self.url.replace('/license', path))
+            self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(len(EtagHandler.requests_seen), 2)
@@ -0,0 +1,134 @@
+import json
+import os
+from collections import defaultdict
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+
+from pylicenses.providers import COST_LOCAL, COST_SUBPROCESS, COST_NETWORK
+from pylicenses.providers.condachannel import CondaChannelProvider
+from pylicenses.providers.condalocal import CondaProvider
+from pylicenses.state import ScanState
+
+
+def write(path, text=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as fout:
+        fout.write(text if isinstance(text, str) else json.dumps(text))
+
+
+class CondaProviderNativeTests(TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        root = self.tmpdir.name
+        self.prefix = os.path.join(root, 'envs', 'test')
+        pkg_dir = os.path.join(root, 'pkgs', 'zlib-1.2.11-h7b6447c_3')
+        write(os.path.join(self.prefix, 'conda-meta', 'zlib-1.2.11-h7b6447c_3.json'), {
+            'name': 'zlib', 'version': '1.2.11', 'build': 'h7b6447c_3', 'build_number': 3,
+            'depends': ['libgcc-ng >=7.3.0'], 'license': 'zlib',
+            'extracted_package_dir': pkg_dir, 'files': ['lib/libz.so'],
+        })
+        write(os.path.join(pkg_dir, 'info', 'about.json'), {'home': 'http://zlib.net/', 'summary': 'zlib'})
+        write(os.path.join(pkg_dir, 'info', 'LICENSE.txt'), 'zlib license')
+        # an older build in the package cache must not be used
+        write(os.path.join(root, 'pkgs', 'zlib-1.2.10-h7b6447c_0', 'info', 'LICENSE.txt'), 'old license')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_native(self):
+        prov = CondaProvider(conda_prefix=self.prefix)
+        self.assertTrue(prov.is_native)
+        self.assertEqual(prov.root_prefix, self.tmpdir.name)
+        packages = defaultdict(dict)
+        prov.get_packages_info(packages)
+        info = packages['zlib']
+        self.assertIs(info, packages['zlib-1.2.11-h7b6447c_3'])
+        self.assertEqual(info['license'], 'zlib')
+        self.assertEqual(info['depends'], ['libgcc-ng >=7.3.0'])
+        self.assertEqual(info['home_page'], 'http://zlib.net/')
+        self.assertEqual(info['license_text'], 'zlib license')
+        self.assertEqual(info['license_trace'], 'conda local package')
+        self.assertNotIn('files', info)
+
+    def test_subset(self):
+        write(os.path.join(self.prefix, 'conda-meta', 'zlib-ng-2.0.7-h5eee18b_0.json'), {
+            'name': 'zlib-ng', 'version': '2.0.7', 'build': 'h5eee18b_0'})
+        prov = CondaProvider(conda_prefix=self.prefix)
+        packages = defaultdict(dict)
+        prov.get_packages_info(packages, subset=['zlib'])
+        self.assertEqual(set(packages), {'zlib', 'zlib-1.2.11-h7b6447c_3'})
+        self.assertEqual(packages['zlib']['license_text'], 'zlib license')
+        # the package cache was not scanned
+        self.assertEqual(prov.license_index._roots, {})
+
+    def test_not_native_fingerprints(self):
+        listed = [{'name': 'zlib', 'version': '1.2.11', 'build_string': 'h7b6447c_3',
+                   'dist_name': 'zlib-1.2.11-h7b6447c_3'}]
+        info = {'sys.prefix': self.tmpdir.name, 'active_prefix': None, 'default_prefix': self.prefix}
+        conda_json = lambda command, *args: {'list': listed, 'info': info}[command]
+        # not a conda environment, conda list reports on conda's default environment
+        with mock.patch.dict(os.environ, {'CONDA_PREFIX': self.tmpdir.name}), \
+                mock.patch('pylicenses.providers.condalocal.conda_json', conda_json):
+            prov = CondaProvider()
+            self.assertFalse(prov.is_native)
+            state = ScanState(fingerprints=prov.get_fingerprints())
+            self.assertEqual(list(state.fingerprints.values()), [('zlib-1.2.11-h7b6447c_3', 'zlib')])
+            self.assertEqual(prov.get_watch_paths(), [os.path.join(self.prefix, 'conda-meta')])
+            # a new build is a changed package
+            listed[0] = dict(listed[0], build_string='h7b6447c_4', dist_name='zlib-1.2.11-h7b6447c_4')
+            self.assertEqual(state.diff(prov.get_fingerprints()), ({'zlib'}, set()))
+            # a given prefix that is no conda environment has no packages
+            self.assertEqual(CondaProvider(conda_prefix=self.tmpdir.name).get_fingerprints(), {})
+
+
+class CondaChannelProviderTests(TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.repodata = os.path.join(self.tmpdir.name, 'repodata.json')
+        write(self.repodata, {
+            'info': {'subdir': 'linux-64'},
+            'packages': {
+                'requests-2.21.0-py37_0.tar.bz2': {
+                    'name': 'requests', 'version': '2.21.0', 'build': 'py37_0',
+                    'license': 'Apache 2.0', 'license_family': 'Apache',
+                },
+                'requests-2.21.0-py36_0.tar.bz2': {
+                    'name': 'requests', 'version': '2.21.0', 'build': 'py36_0', 'license': 'other',
+                },
+            },
+            'packages.conda': {
+                'zlib-1.2.11-h7b6447c_3.conda': {
+                    'name': 'zlib', 'version': '1.2.11', 'build': 'h7b6447c_3', 'license': 'zlib',
+                },
+            },
+        })
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_repodata(self):
+        prov = CondaChannelProvider(repodata=[self.tmpdir.name])
+        packages = {
+            'requests': {'name': 'requests', 'version': '2.21.0', 'build': 'py37_0'},
+            'zlib': {'name': 'zlib', 'version': '1.2.11', 'build': 'h7b6447c_3'},
+            'six': {'name': 'six', 'version': '1.12.0'},
+        }
+        infos = prov.get_packages_info(packages)
+        self.assertEqual(len(prov.index), 3)
+        self.assertEqual(infos['requests']['license'], 'Apache 2.0')
+        self.assertEqual(infos['requests']['license_family'], 'Apache')
+        self.assertEqual(infos['requests']['license_source'], 'conda channel repodata ' + self.repodata)
+        self.assertEqual(infos['zlib']['license'], 'zlib')
+        self.assertEqual(infos['zlib']['license_trace'], 'conda channel repository')
+        self.assertEqual(infos['six'], {})
+
+    def test_cost(self):
+        prov = CondaChannelProvider(repodata=[self.tmpdir.name])
+        self.assertEqual(prov.cost, COST_LOCAL)
+        # the cost is known without loading the repodata
+        self.assertIsNone(prov._index)
+        prov = CondaChannelProvider(repodata=['https://repo.anaconda.com/pkgs/main/linux-64'])
+        self.assertEqual(prov.cost, COST_NETWORK)
+        self.assertIsNone(prov._index)
+        prov = CondaChannelProvider(repodata=[os.path.join(self.tmpdir.name, 'missing')])
+        self.assertEqual(prov.cost, COST_SUBPROCESS)
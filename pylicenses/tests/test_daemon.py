@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from pylicenses import PyLicenses
+from pylicenses.client import LicenseClient, LicenseClientError
+from pylicenses.daemon import LicenseService, make_server
+
+METADATA = """Metadata-Version: 2.1
+Name: {name}
+Version: {version}
+License: {license}
+"""
+
+
+class LicenseDaemonTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.root, 'env')
+        self.site_packages = os.path.join(self.prefix, 'lib', 'python3.6', 'site-packages')
+        self.install('foo', '1.0', 'MIT', requires='bar')
+        self.install('bar', '2.0', 'GPL-3.0')
+        self.service = LicenseService([PyLicenses(prefix=self.prefix)], interval=0).start()
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(self.root)
+
+    def install(self, name, version, license, requires=None):
+        distinfo = os.path.join(self.site_packages, '{}-{}.dist-info'.format(name, version))
+        os.makedirs(distinfo)
+        with open(os.path.join(distinfo, 'METADATA'), 'w') as fout:
+            fout.write(METADATA.format(name=name, version=version, license=license))
+            fout.write('Requires-Dist: {}\n'.format(requires) if requires else '')
+        with open(os.path.join(distinfo, 'LICENSE'), 'w') as fout:
+            fout.write('{} license'.format(name))
+
+    def serve(self, address):
+        server = make_server(self.service, address)
+        self.servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def test_query(self):
+        self.serve(os.path.join(self.root, 'daemon.sock'))
+        client = LicenseClient(os.path.join(self.root, 'daemon.sock'))
+        self.assertEqual(client.envs()[0]['prefix'], self.prefix)
+        self.assertEqual([data['name'] for data in client.packages()], ['bar', 'foo'])
+        self.assertEqual([data['name'] for data in client.packages(license='gpl')], ['bar'])
+        self.assertNotIn('license_text', client.package('foo'))
+        self.assertEqual(client.package('foo', text=True)['license_text'], 'foo license')
+        self.assertEqual(client.why('bar')['path'], ['foo', 'bar'])
+        self.assertEqual(client.missing(), [])
+        with self.assertRaises(LicenseClientError) as cm:
+            client.package('baz')
+        self.assertEqual(cm.exception.status, 404)
+        with self.assertRaises(LicenseClientError):
+            client.packages(env='/no/such/env')
+
+    def test_refresh(self):
+        server = self.serve('127.0.0.1:0')
+        client = LicenseClient('127.0.0.1:{}'.format(server.server_address[1]))
+        self.assertEqual(client.refresh(), {'changed': [], 'removed': []})
+        # upgrade foo, install baz
+        shutil.rmtree(os.path.join(self.site_packages, 'foo-1.0.dist-info'))
+        self.install('foo', '1.1', 'Apache-2.0')
+        self.install('baz', '0.1', 'BSD')
+        self.assertEqual(client.refresh(), {'changed': ['baz', 'foo'], 'removed': []})
+        self.assertEqual(client.package('foo')['version'], '1.1')
+        self.assertEqual(client.package('foo')['license_expression'], 'Apache-2.0')
+        self.assertEqual(client.why('bar')['path'], ['bar'])
+        # the watcher notices the change of site-packages itself
+        shutil.rmtree(os.path.join(self.site_packages, 'baz-0.1.dist-info'))
+        self.assertEqual(self.service.envs[0].refresh(), (set(), {'baz'}))
+        self.assertEqual(len(client.packages()), 2)
@@ -0,0 +1,72 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pylicenses.diff import diff_packages, diff_snapshots, package_snapshot, write_diff_json
+from pylicenses.graph import DependencyGraph
+from pylicenses.report import CsvWriter, JsonLinesWriter, write_reports
+
+
+class DiffTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.old = {
+            'Foo_Bar': dict(name='Foo_Bar', version='1.0', license='MIT', license_text='MIT text'),
+            'baz': dict(name='baz', version='2.0', license='BSD', license_expression='BSD-3-Clause',
+                        license_text='BSD text'),
+            'gone': dict(name='gone', version='0.1', license='MIT', license_text='MIT text'),
+            'gone-0.1': None,
+        }
+        self.old['gone-0.1'] = self.old['gone']
+        self.new = {
+            'foo-bar': dict(name='foo-bar', version='1.1', license='MIT', license_text='MIT   text\n'),
+            'baz': dict(name='baz', version='2.0', license='GPL', license_expression='GPL-3.0-only',
+                        license_text='GPL text'),
+            'new': dict(name='new', version='3.0', license='MIT', license_text=None),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_diff(self):
+        changes = diff_snapshots(package_snapshot(self.old.items()), package_snapshot(self.new.items()))
+        self.assertEqual([(change['name'], change['change']) for change in changes], [
+            ('baz', 'license'),
+            ('baz', 'license_text'),
+            # whitespace changes of the text are ignored
+            ('foo-bar', 'version'),
+            ('gone', 'removed'),
+            ('new', 'added'),
+        ])
+        self.assertEqual(changes[0]['old'], 'BSD-3-Clause')
+        self.assertEqual(changes[0]['new'], 'GPL-3.0-only')
+        self.assertEqual(changes[2]['old'], '1.0')
+        self.assertEqual(changes[2]['new'], '1.1')
+        fout = io.StringIO()
+        write_diff_json(changes, fout)
+        result = json.loads(fout.getvalue())
+        self.assertEqual(result['counts'], {'added': 1, 'removed': 1, 'version': 1, 'license': 1,
+                                            'license_text': 1})
+        self.assertEqual(result['changes'], changes)
+
+    def test_pip_and_conda(self):
+        # a package listed by pip and by conda is compared once
+        snapshot = package_snapshot([('pyyaml', dict(name='pyyaml', version='6.0')),
+                                     ('PyYAML', dict(name='PyYAML', version='6.0', license='MIT'))])
+        self.assertEqual(list(snapshot), ['pyyaml'])
+        self.assertEqual(snapshot['pyyaml']['license'], 'MIT')
+
+    def test_reports(self):
+        # previous scans are read from the jsonl and csv reports
+        for writer in (JsonLinesWriter, CsvWriter):
+            path = os.path.join(self.root, writer.filename)
+            with open(path, 'w', newline='') as fout:
+                # the jsonl report's relationships are not packages
+                write_reports(self.old.items(), [writer(fout, graph=DependencyGraph.from_packages(self.old))])
+            self.assertEqual(diff_packages(path, self.old.items()), [])
+            self.assertEqual(len(diff_packages(path, self.new.items())), 5)
+        with self.assertRaises(ValueError):
+            diff_packages(os.path.join(self.root, 'THIRDPARTY-LICENSES'), self.new.items())
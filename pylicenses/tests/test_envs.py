@@ -0,0 +1,101 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pylicenses import PyLicenses
+from pylicenses.envs import MultiEnvLicenses, read_envs_file
+from pylicenses.providers.piplocal import PipProvider
+from pylicenses.records import PackageStore
+from pylicenses.report import write_license_trail
+
+METADATA = """Metadata-Version: 2.1
+Name: {name}
+Version: {version}
+License: {license}
+"""
+
+
+class MultiEnvTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def make_env(self, env, packages, license='MIT'):
+        prefix = os.path.join(self.root, env)
+        site_packages = os.path.join(prefix, 'lib', 'python3.6', 'site-packages')
+        for name, version in packages:
+            distinfo = os.path.join(site_packages, '{}-{}.dist-info'.format(name.lower(), version))
+            os.makedirs(distinfo)
+            with open(os.path.join(distinfo, 'METADATA'), 'w') as fout:
+                fout.write(METADATA.format(name=name, version=version, license=license))
+            with open(os.path.join(distinfo, 'LICENSE'), 'w') as fout:
+                fout.write('{} license'.format(name))
+        return prefix
+
+    def test_prefix(self):
+        prefix = self.make_env('a', [('Foo', '1.0')])
+        packages = PipProvider(prefix=prefix).get_packages_info(PackageStore())
+        self.assertEqual(packages['Foo']['version'], '1.0')
+        # the dist-info name is lower case, the license is found anyway
+        self.assertTrue(packages['Foo']['license_source'].endswith('LICENSE'))
+
+    def test_subset(self):
+        prefix = self.make_env('a', [('Foo', '1.0'), ('bar', '2.0'), ('baz', '3.0'), ('extra', '1.0')])
+        with open(os.path.join(prefix, 'lib', 'python3.6', 'site-packages', 'foo-1.0.dist-info', 'METADATA'),
+                  'a') as fout:
+            fout.write('Requires-Dist: bar[all] (>=2)\nRequires-Dist: extra ; extra == "all"\n')
+        with open(os.path.join(prefix, 'lib', 'python3.6', 'site-packages', 'bar-2.0.dist-info', 'METADATA'),
+                  'a') as fout:
+            fout.write('Requires-Dist: baz ; extra == "all"\n')
+        lic = PyLicenses(prefix=prefix).discover(subset=['foo'])
+        self.assertEqual(set(lic.packages), {'Foo'})
+        self.assertEqual(lic.packages['Foo']['license_text'], 'Foo license')
+        # bar is required with its extra all, Foo is not
+        lic = PyLicenses(prefix=prefix).discover(subset=['foo'], closure=True)
+        self.assertEqual(set(lic.packages), {'Foo', 'bar', 'baz'})
+        self.assertEqual(lic.missing_licenses(), {})
+
+    def test_merge(self):
+        env_a = self.make_env('a', [('Foo', '1.0'), ('bar', '2.0')])
+        env_b = self.make_env('b', [('Foo', '1.1')])
+        envs_file = os.path.join(self.root, 'envs.txt')
+        with open(envs_file, 'w') as fout:
+            fout.write('# environments\n{}\n\n{}\n'.format(env_a, env_b))
+        lic = MultiEnvLicenses(read_envs_file(envs_file), max_workers=2).discover()
+        self.assertEqual(set(lic.packages), {'Foo', 'bar'})
+        self.assertEqual(lic.packages['Foo']['envs'], {env_a: '1.0', env_b: '1.1'})
+        self.assertEqual(lic.packages['Foo']['license_text'], 'Foo license')
+        self.assertEqual(lic.missing_licenses(), {})
+        report = io.StringIO()
+        write_license_trail(lic.packages.items(), report)
+        self.assertIn('Environments: {} (1.0), {} (1.1)'.format(env_a, env_b), report.getvalue())
+        self.assertNotIn('License-Conflict', report.getvalue())
+
+    def test_merge_license_conflict(self):
+        env_a = self.make_env('a', [('Foo', '1.0')])
+        env_b = self.make_env('b', [('Foo', '2.0')], license='GPLv3')
+        with self.assertWarns(UserWarning):
+            lic = MultiEnvLicenses([env_a, env_b], max_workers=2).discover()
+        data = lic.packages['Foo']
+        self.assertEqual(data['license_conflict'], ['GPL-3.0-only', 'MIT'])
+        self.assertEqual(data['env_licenses'][env_b]['license'], 'GPLv3')
+        self.assertEqual(data['env_licenses'][env_a]['version'], '1.0')
+        report = io.StringIO()
+        write_license_trail(lic.packages.items(), report)
+        self.assertIn('License-Conflict: {} (1.0 MIT), {} (2.0 GPL-3.0-only)'.format(env_a, env_b),
+                      report.getvalue())
+
+    def test_merge_canonical_name(self):
+        # pip's PyYAML and conda's pyyaml are one package
+        env_a = self.make_env('a', [('PyYAML', '5.1')])
+        env_b = self.make_env('b', [('pyyaml', '6.0')], license='GPLv3')
+        with self.assertWarns(UserWarning):
+            lic = MultiEnvLicenses([env_a, env_b], max_workers=2).discover()
+        self.assertEqual(set(lic.packages), {'PyYAML'})
+        data = lic.packages['pyyaml']
+        self.assertEqual(data['envs'], {env_a: '5.1', env_b: '6.0'})
+        self.assertEqual(data['license_conflict'], ['GPL-3.0-only', 'MIT'])
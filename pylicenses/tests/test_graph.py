@@ -0,0 +1,101 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pylicenses.graph import DependencyGraph, parse_requirement, marker_environment
+from pylicenses.records import PackageStore
+
+
+class DependencyGraphTests(TestCase):
+    def setUp(self):
+        environment = dict(python_version='3.6', sys_platform='linux')
+        self.packages = PackageStore()
+        for name, requires in [
+            ('app', ['requests[socks] (>=2.0)', 'PyYAML', 'pywin32; sys_platform == "win32"']),
+            ('requests', ['urllib3>=1.21', 'idna; python_version >= "3"', 'PySocks; extra == "socks"',
+                          'chardet; extra == "security"']),
+            ('urllib3', []),
+            ('idna', []),
+            ('PySocks', []),
+            ('chardet', []),
+            ('pywin32', []),
+            ('tool', ['requests']),
+        ]:
+            self.packages[name] = {'name': name, 'requires_dist': requires}
+        # conda dependencies, names join pip names the PEP 503 way
+        self.packages['pyyaml'] = {'name': 'pyyaml', 'depends': ['python 3.6.* *_cpython', 'yaml >=0.1.7']}
+        self.packages['yaml'] = {'name': 'yaml'}
+        self.graph = DependencyGraph.from_packages(self.packages, environment=environment)
+
+    def test_requirements(self):
+        self.assertEqual(parse_requirement('idna; python_version >= "3"')[0], 'idna')
+        self.assertEqual(parse_requirement('python 3.6.* *_cpython')[0], 'python')
+        graph = self.graph
+        self.assertEqual(sorted(graph.dependencies('app')), ['pyyaml', 'requests'])
+        # markers are evaluated, extras only if requested
+        self.assertEqual(sorted(graph.dependencies('requests')), ['PySocks', 'idna', 'urllib3'])
+        self.assertEqual(graph.dependencies('PyYAML'), ['yaml'])
+        self.assertEqual(sorted(graph.dependents('requests')), ['app', 'tool'])
+
+    def test_queries(self):
+        graph = self.graph
+        self.assertEqual(sorted(graph.roots()), ['app', 'chardet', 'pywin32', 'tool'])
+        self.assertEqual(graph.closure(['app']),
+                         {'app', 'requests', 'urllib3', 'idna', 'PySocks', 'pyyaml', 'yaml'})
+        self.assertEqual(graph.closure(['urllib3'], reverse=True), {'urllib3', 'requests', 'app', 'tool'})
+        self.assertEqual(graph.why('yaml'), ['app', 'pyyaml', 'yaml'])
+        self.assertEqual(graph.why('app'), ['app'])
+
+    def test_export(self):
+        data = self.graph.as_dict()
+        self.assertEqual(len(data['nodes']), 10)
+        self.assertIn([data['nodes'].index('pyyaml'), data['nodes'].index('yaml')], data['edges'])
+        out = io.StringIO()
+        self.graph.write_json(out)
+        self.assertEqual(json.loads(out.getvalue()), data)
+        out = io.StringIO()
+        self.graph.write_dot(out)
+        self.assertEqual(out.getvalue().count('->'), len(data['edges']))
+
+    def test_extras(self):
+        # extras propagate through the closure, e.g. requests[socks] requests urllib3[socks]
+        packages = {
+            'app': {'name': 'app', 'requires_dist': ['requests[socks]']},
+            'requests': {'name': 'requests', 'requires_dist': ['urllib3[socks]; extra == "socks"']},
+            'urllib3': {'name': 'urllib3', 'requires_dist': ['PySocks; extra == "socks"', 'brotli; extra == "brotli"']},
+            'PySocks': {'name': 'PySocks'},
+            'brotli': {'name': 'brotli'},
+        }
+        graph = DependencyGraph.from_packages(packages, environment={})
+        self.assertEqual(graph.closure(['app']), {'app', 'requests', 'urllib3', 'PySocks'})
+
+    def test_prefix_environment(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        conda, venv, other = (os.path.join(root, name) for name in ('conda', 'venv', 'other'))
+        os.makedirs(os.path.join(conda, 'conda-meta'))
+        with open(os.path.join(conda, 'conda-meta', 'python-3.8.10-h5a7b7a9_0.json'), 'w') as fout:
+            json.dump({'name': 'python', 'version': '3.8.10', 'build': 'h5a7b7a9_0', 'subdir': 'win-64'}, fout)
+        environment = marker_environment(conda)
+        self.assertEqual(environment['python_full_version'], '3.8.10')
+        self.assertEqual(environment['python_version'], '3.8')
+        self.assertEqual(environment['sys_platform'], 'win32')
+        self.assertEqual(environment['platform_machine'], 'AMD64')
+        os.makedirs(venv)
+        with open(os.path.join(venv, 'pyvenv.cfg'), 'w') as fout:
+            fout.write('home = /usr/bin\nversion = 3.9.7\n')
+        self.assertEqual(marker_environment(venv), {'python_version': '3.9', 'python_full_version': '3.9.7'})
+        os.makedirs(os.path.join(other, 'lib', 'python3.6'))
+        environment = marker_environment(other)
+        self.assertEqual(environment, {'python_version': '3.6'})
+        # markers on values not known of the prefix keep the dependency
+        packages = {
+            'app': {'name': 'app', 'requires_dist': ['a; python_full_version >= "3.6.5"',
+                                                     'b; python_version < "3"', 'c; sys_platform == "win32"']},
+            'a': {'name': 'a'}, 'b': {'name': 'b'}, 'c': {'name': 'c'},
+        }
+        graph = DependencyGraph.from_packages(packages, environment=environment)
+        self.assertEqual(sorted(graph.dependencies('app')), ['a', 'c'])
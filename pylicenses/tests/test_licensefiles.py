@@ -0,0 +1,59 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from pylicenses.licensefiles import LicenseFileIndex, split_dist_info_name
+
+
+def write(path, text=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as fout:
+        fout.write(text)
+
+
+class LicenseFileIndexTests(TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.root = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_site_packages(self):
+        sp = os.path.join(self.root, 'site-packages')
+        write(os.path.join(sp, 'tornado-5.1.1.dist-info', 'LICENSE.txt'), 'tornado license')
+        write(os.path.join(sp, 'tornado-5.1.1.dist-info', 'METADATA'))
+        write(os.path.join(sp, 'attrs-19.1.0.dist-info', 'licenses', 'COPYING'))
+        write(os.path.join(sp, 'simplejson-3.0-py3.6.egg-info', 'LICENSE.txt'))
+        # license installed next to the package, listed in RECORD
+        write(os.path.join(sp, 'six', 'LICENSE'))
+        write(os.path.join(sp, 'six-1.12.0.dist-info', 'RECORD'), 'six/LICENSE,,\nsix/__init__.py,,\n')
+        # files in package code are not scanned
+        write(os.path.join(sp, 'tornado', 'test', 'LICENSE'))
+        index = LicenseFileIndex()
+        files = {(f.name, os.path.relpath(f.path, sp)) for f in index.site_packages(sp)}
+        self.assertEqual(files, {
+            ('tornado', 'tornado-5.1.1.dist-info/LICENSE.txt'),
+            ('attrs', 'attrs-19.1.0.dist-info/licenses/COPYING'),
+            ('simplejson', 'simplejson-3.0-py3.6.egg-info/LICENSE.txt'),
+            ('six', 'six/LICENSE'),
+        })
+        # results are reused
+        self.assertIs(index.site_packages(sp), index.site_packages(sp))
+
+    def test_conda_pkgs(self):
+        pkgs = os.path.join(self.root, 'pkgs')
+        write(os.path.join(pkgs, 'mkl-service-1.1.2-py36h17a0993_4', 'info', 'LICENSE.txt'))
+        write(os.path.join(pkgs, 'zlib-1.2.11-h7b6447c_3', 'info', 'licenses', 'LICENSE'))
+        write(os.path.join(pkgs, 'zlib-1.2.11-h7b6447c_3', 'include', 'COPYING'))
+        write(os.path.join(pkgs, 'cache', 'repodata.json'))
+        files = {(f.dist_name, f.name, os.path.basename(f.path))
+                 for f in LicenseFileIndex().conda_pkgs(pkgs)}
+        self.assertEqual(files, {
+            ('mkl-service-1.1.2-py36h17a0993_4', 'mkl-service', 'LICENSE.txt'),
+            ('zlib-1.2.11-h7b6447c_3', 'zlib', 'LICENSE'),
+        })
+
+    def test_split_dist_info_name(self):
+        self.assertEqual(split_dist_info_name('tornado-5.1.1.dist-info'), ('tornado-5.1.1', 'tornado'))
+        self.assertEqual(split_dist_info_name('foo-bar-1.0.dist-info'), ('foo-bar-1.0', 'foo-bar'))
@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pylicenses.lockfiles import LockfileLicenses
+from pylicenses.providers.lockfile import (parse_conda_spec, read_environment_yml, read_explicit,
+                                          read_requirements, read_spec, LockfileProvider)
+
+ENVIRONMENT_YML = """name: app
+channels:
+  - conda-forge
+dependencies:
+  - python=3.6
+  - conda-forge::six=1.12.0=py36_1000
+  - numpy >=1.16,<1.17  # a comment
+  - pip:
+    - requests==2.21.0
+    - tabulate
+prefix: /opt/conda/envs/app
+"""
+
+EXPLICIT = """# platform: linux-64
+@EXPLICIT
+https://repo.anaconda.com/pkgs/main/linux-64/six-1.12.0-py36_0.tar.bz2#e0c4bd8d
+https://conda.anaconda.org/conda-forge/noarch/idna-2.8-py_1000.conda
+"""
+
+
+class LockfileTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, filename, content):
+        path = os.path.join(self.tmpdir, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as fout:
+            fout.write(content)
+        return path
+
+    def test_requirements(self):
+        self.write('base.txt', 'tabulate==0.8.2  # via -r requirements.txt\n')
+        self.write('more.txt', 'idna==2.8\n')
+        # constraints only pin listed packages
+        self.write('constraints.txt', 'urllib3<2\nsix==1.12.0\n')
+        path = self.write('requirements.txt', '\n'.join([
+            '-r base.txt',
+            '--requirement=more.txt',
+            '-c constraints.txt',
+            '--index-url https://pypi.org/simple',
+            'requests==2.21.0 \\',
+            '    --hash=sha256:7bf2a778576d825600030a110f3c0e3e8edc51dfaafe1c146e39a2027784957b',
+            'six>=1.0',
+            'enum34==1.1.6; python_version < "3.4"',
+            '-e git+https://github.com/miraculixx/pylicenses.git#egg=pylicenses',
+        ]))
+        packages = read_requirements(path)
+        self.assertEqual([(p['name'], p.get('version')) for p in packages],
+                         [('tabulate', '0.8.2'), ('idna', '2.8'), ('requests', '2.21.0'), ('six', '1.12.0')])
+
+    def test_conda_spec(self):
+        self.assertEqual(parse_conda_spec('conda-forge::six=1.12.0=py36_1000'),
+                         {'name': 'six', 'version': '1.12.0', 'build': 'py36_1000',
+                          'channel': 'conda-forge', 'package_type': 'conda'})
+        self.assertEqual(parse_conda_spec('six 1.12.0 py36_0')['build'], 'py36_0')
+        self.assertEqual(parse_conda_spec('six==1.12.0')['version'], '1.12.0')
+        # fuzzy versions and ranges match several versions
+        self.assertNotIn('version', parse_conda_spec('python=3.6'))
+        self.assertEqual(parse_conda_spec('numpy >=1.16,<1.17'), {'name': 'numpy', 'package_type': 'conda'})
+
+    def test_environment_yml(self):
+        path = self.write('environment.yml', ENVIRONMENT_YML)
+        packages = read_environment_yml(path)
+        self.assertEqual([(p['name'], p['package_type']) for p in packages],
+                         [('python', 'conda'), ('six', 'conda'), ('numpy', 'conda'),
+                          ('requests', 'pypi'), ('tabulate', 'pypi')])
+
+    def test_explicit(self):
+        path = self.write('spec.txt', EXPLICIT)
+        packages = read_explicit(path)
+        self.assertEqual(packages[0], {
+            'name': 'six', 'version': '1.12.0', 'build': 'py36_0', 'package_type': 'conda',
+            'channel': 'pkgs/main',
+            'url': 'https://repo.anaconda.com/pkgs/main/linux-64/six-1.12.0-py36_0.tar.bz2'})
+        self.assertEqual(packages[1]['name'], 'idna')
+        self.assertEqual(read_spec(path), packages)
+
+    def test_provider(self):
+        # six is in the package cache, idna is not
+        conda_root = os.path.join(self.tmpdir, 'conda')
+        info = os.path.join(conda_root, 'pkgs', 'six-1.12.0-py36_0', 'info')
+        self.write(os.path.join(info, 'LICENSE.txt'), 'six license')
+        self.write(os.path.join(info, 'about.json'), json.dumps({'license': 'MIT', 'home': 'https://six'}))
+        path = self.write('spec.txt', EXPLICIT)
+        provider = LockfileProvider(specs=[path], conda_prefix=conda_root)
+        packages = provider.get_packages_info({})
+        self.assertEqual(packages['six']['license_source'], os.path.join(info, 'LICENSE.txt'))
+        self.assertEqual(packages['six']['license'], 'MIT')
+        self.assertEqual(packages['six']['home_page'], 'https://six')
+        self.assertNotIn('license_source', packages['idna'])
+
+    def test_discover(self):
+        repodata = self.write('repodata.json', json.dumps({'packages': {
+            'six-1.12.0-py36_1000.tar.bz2': {'name': 'six', 'version': '1.12.0', 'build': 'py36_1000',
+                                              'license': 'MIT'},
+        }}))
+        path = self.write('environment.yml', ENVIRONMENT_YML)
+        lic = LockfileLicenses([path], repodata=[repodata], prefix=self.tmpdir)
+        lic.providers['fallback'] = [prov for prov in lic.providers['fallback']
+                                     if type(prov).__name__ != 'PyPiProvider']
+        lic.discover()
+        self.assertEqual(lic.packages['six']['license_expression'], 'MIT')
+        self.assertEqual(lic.packages['six']['license_source'], 'conda channel repodata ' + repodata)
+        self.assertNotIn('license_text', lic.packages['six'])
+        self.assertEqual(set(lic.packages), {'python', 'six', 'numpy', 'requests', 'tabulate'})
@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+from pylicenses import PyLicenses
+from pylicenses.normalize import normalize, normalize_classifiers, license_ids, LICENSE_ALIASES
+from pylicenses.providers.pypi import github_license_key
+from pylicenses.records import PackageRecord
+
+
+class NormalizeTests(TestCase):
+    def test_names(self):
+        self.assertEqual(normalize('MIT License'), 'MIT')
+        self.assertEqual(normalize('Apache License, Version 2.0'), 'Apache-2.0')
+        self.assertEqual(normalize('BSD 3-clause'), 'BSD-3-Clause')
+        self.assertEqual(normalize('new BSD License'), 'BSD-3-Clause')
+        self.assertEqual(normalize('GPLv3'), 'GPL-3.0-only')
+        self.assertEqual(normalize('LGPLv2.1+'), 'LGPL-2.1-or-later')
+        self.assertEqual(normalize('GPL-2.0 or later'), 'GPL-2.0-or-later')
+        self.assertEqual(normalize('Zope Public License'), 'LicenseRef-Zope-Public-License')
+        # the version or variant is not known
+        self.assertEqual(normalize('GPL'), 'LicenseRef-GPL')
+        self.assertEqual(normalize('GNU LGPL'), 'LicenseRef-LGPL')
+        self.assertEqual(normalize('BSD License'), 'LicenseRef-BSD')
+        self.assertEqual(normalize('GPL+'), 'LicenseRef-GPL')
+        self.assertEqual(normalize('Apache Software License'), 'LicenseRef-Apache')
+        self.assertEqual(normalize('Python Software Foundation License'), 'PSF-2.0')
+        self.assertIsNone(normalize('UNKNOWN'))
+        self.assertIsNone(normalize('Copyright (c) 2018\n\nPermission is hereby granted'))
+
+    def test_expressions(self):
+        self.assertEqual(normalize('MIT/Apache 2.0'), 'MIT OR Apache-2.0')
+        self.assertEqual(normalize('Public-Domain, GPL'), 'LicenseRef-Public-Domain AND LicenseRef-GPL')
+        self.assertEqual(normalize('GPL3 with runtime exception'), 'GPL-3.0-only WITH GCC-exception-3.1')
+        self.assertEqual(normalize('MIT and (GPL or BSD)'), 'MIT AND (LicenseRef-GPL OR LicenseRef-BSD)')
+        self.assertEqual(normalize('(MIT OR Apache-2.0) AND BSD-3-Clause'),
+                         '(MIT OR Apache-2.0) AND BSD-3-Clause')
+        self.assertEqual(license_ids('(MIT OR Apache-2.0 WITH LLVM-exception) AND Zlib'),
+                         ['MIT', 'Apache-2.0', 'Zlib'])
+        self.assertEqual(github_license_key('GPL-3.0-only'), 'gpl-3.0')
+        self.assertEqual(github_license_key('LicenseRef-BSD'), 'bsd-2-clause')
+        self.assertIsNone(github_license_key('LicenseRef-Zope-Public-License'))
+
+    def test_idempotent(self):
+        # license references are kept, e.g. of a License-Expression or a previous scan
+        self.assertEqual(normalize('LicenseRef-bzip2-1.0.8'), 'LicenseRef-bzip2-1.0.8')
+        self.assertEqual(normalize('LicenseRef-TCL OR MIT'), 'LicenseRef-TCL OR MIT')
+        self.assertEqual(normalize('DocumentRef-spdx:LicenseRef-foo'), 'DocumentRef-spdx:LicenseRef-foo')
+        names = [name for spdx_id, aliases in LICENSE_ALIASES.items() for name in [spdx_id] + aliases]
+        names += ['Zope Public License', 'MIT and (GPL or BSD)', 'GPL3 with runtime exception',
+                  'LGPLv2.1+', 'Public-Domain, GPL']
+        for name in names:
+            expression = normalize(name)
+            self.assertEqual(normalize(expression), expression, name)
+
+    def test_classifiers(self):
+        self.assertEqual(normalize('License :: OSI Approved :: Apache Software License'), 'LicenseRef-Apache')
+        self.assertEqual(normalize('License :: OSI Approved :: BSD License'), 'LicenseRef-BSD')
+        self.assertEqual(normalize('License :: OSI Approved :: GNU Library or Lesser General Public License (LGPL)'),
+                         'LicenseRef-LGPL')
+        self.assertEqual(normalize_classifiers([
+            'Programming Language :: Python',
+            'License :: OSI Approved :: MIT License',
+            'License :: OSI Approved :: GNU General Public License v3 or later (GPLv3+)',
+            'License :: OSI Approved',
+        ]), 'MIT OR GPL-3.0-or-later')
+
+    def test_license_stats(self):
+        class NoProviderLicenses(PyLicenses):
+            PROVIDERS = {'primary': [], 'fallback': []}
+
+        lic = NoProviderLicenses()
+        lic._packages['a'] = PackageRecord(name='a', license='MIT License', license_source='x')
+        lic._packages['b'] = PackageRecord(name='b', license='mit', license_source='x')
+        lic._packages['c'] = PackageRecord(name='c', license='UNKNOWN', license_source='x',
+                                           classifiers=['License :: OSI Approved :: MIT License'])
+        lic.discover()
+        counts, by_license = lic.get_license_stats()
+        self.assertEqual(counts, {'MIT': 3})
+        self.assertEqual(lic.packages['c']['license_expression'], 'MIT')
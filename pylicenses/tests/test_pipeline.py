@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pylicenses import PyLicenses
+from pylicenses.pipeline import merge_record, consume, LicenseStats
+from pylicenses.providers import PackageProvider, COST_NETWORK
+from pylicenses.records import PackageRecord, PackageStore
+
+
+class StreamingProvider(PackageProvider):
+    """
+    a primary provider that only implements the streaming protocol
+    """
+
+    def iter_packages_info(self, packages, subset=None):
+        yield 'foo', {'name': 'foo', 'version': '1.0', 'license': 'MIT'}
+        yield 'foo-1.0', {'name': 'foo'}
+        yield 'bar', {'name': 'bar', 'version': '2.0'}
+        yield 'foo', {'license_text': 'MIT text'}
+
+
+class DictProvider(PackageProvider):
+    """
+    a fallback provider returning a dict, asserting what was finalized before it ran
+    """
+    cost = COST_NETWORK
+    finalized = None
+
+    def __init__(self, lic=None):
+        self.lic = lic
+
+    def get_packages_info(self, packages):
+        DictProvider.finalized = list(self.lic.finalized)
+        return {pkg: {'license': 'BSD', 'license_text': 'BSD text'} for pkg in packages}
+
+
+class StreamingLicenses(PyLicenses):
+    PROVIDERS = {'primary': [StreamingProvider], 'fallback': [DictProvider]}
+    PLUGIN_KINDS = ()
+
+    def __init__(self, **kwargs):
+        self.finalized = []
+        super().__init__(consumers=[lambda pkg, data: self.finalized.append(pkg)], **kwargs)
+        self.providers['fallback'][0].lic = self
+
+
+class PipelineTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_discover(self):
+        lic = StreamingLicenses().discover()
+        self.assertIs(lic.packages['foo-1.0'], lic.packages['foo'])
+        self.assertEqual(lic.packages['foo']['license_text'], 'MIT text')
+        self.assertEqual(lic.packages['bar']['license_expression'], 'LicenseRef-BSD')
+        # foo was passed on before the fallback provider ran, every package once
+        self.assertEqual(DictProvider.finalized, ['foo'])
+        self.assertEqual(lic.finalized, ['foo', 'bar'])
+        # rediscovered packages are passed on again
+        lic.discover(subset=['bar'])
+        self.assertEqual(lic.finalized, ['foo', 'bar', 'bar'])
+
+    def test_merge_record(self):
+        for packages in (PackageStore(), {}):
+            record = merge_record(packages, 'foo', {'name': 'foo', 'version': '1.0'})
+            self.assertIs(merge_record(packages, 'foo-1.0', {'name': 'foo'}), record)
+            merge_record(packages, 'foo-1.0', {'license': 'MIT'})
+            self.assertIs(packages['foo-1.0'], packages['foo'])
+            self.assertEqual(packages['foo']['license'], 'MIT')
+
+    def test_consume(self):
+        path = os.path.join(self.root, 'LICENSE')
+        with open(path, 'w') as fout:
+            fout.write('MIT text')
+        data = PackageRecord(name='foo', license_source=path, license_expression='MIT')
+        stats = LicenseStats()
+        texts = []
+        consume([stats, lambda pkg, data: texts.append(data['license_text'])], 'foo', data)
+        self.assertEqual(texts, ['MIT text'])
+        self.assertEqual(dict(stats.counts), {'MIT': 1})
+        # the text is released, and read again when needed
+        self.assertFalse(data.is_text_loaded)
+        self.assertEqual(data['license_text'], 'MIT text')
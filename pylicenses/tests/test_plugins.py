@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from pylicenses import PyLicenses
+from pylicenses.plugins import ProviderRegistry
+from pylicenses.providers import PackageProvider
+from pylicenses.providers.spdx import SpdxProvider
+
+
+class PluginProvider(PackageProvider):
+    kind = 'fallback'
+
+
+class ProviderRegistryTests(TestCase):
+    def test_builtins(self):
+        registry = ProviderRegistry(group=None)
+        self.assertIs(registry.get('spdx'), SpdxProvider)
+        self.assertIs(registry.resolve('pylicenses.providers.spdx:SpdxProvider'), SpdxProvider)
+        self.assertIs(registry.resolve(SpdxProvider), SpdxProvider)
+        with self.assertRaises(KeyError):
+            registry.get('npm')
+        registry.register('npm', PluginProvider)
+        self.assertIs(registry.get('npm'), PluginProvider)
+
+    def test_entry_points(self):
+        with TemporaryDirectory() as tmpdir:
+            distinfo = os.path.join(tmpdir, 'pylicenses_npm-1.0.dist-info')
+            os.makedirs(distinfo)
+            with open(os.path.join(distinfo, 'METADATA'), 'w') as fout:
+                fout.write('Metadata-Version: 2.1\nName: pylicenses-npm\nVersion: 1.0\n')
+            with open(os.path.join(distinfo, 'entry_points.txt'), 'w') as fout:
+                fout.write('[pylicenses.providers]\nnpm = {}:PluginProvider\n'
+                           'broken = pylicenses_no_such_module:Provider\n'.format(__name__))
+            sys.path.insert(0, tmpdir)
+            try:
+                registry = ProviderRegistry()
+                self.assertEqual(registry.plugins(), ['broken', 'npm'])
+                self.assertIs(registry.get('npm'), PluginProvider)
+                # a plugin that fails to load is skipped
+                with self.assertWarns(UserWarning):
+                    self.assertEqual(registry.plugin_classes(), [('npm', PluginProvider)])
+                self.assertEqual(registry.plugin_classes(), [('npm', PluginProvider)])
+            finally:
+                sys.path.remove(tmpdir)
+
+    def test_provider_classes(self):
+        class MyLicenses(PyLicenses):
+            PROVIDERS = {'primary': [], 'fallback': ['spdx', PluginProvider]}
+            PLUGIN_KINDS = ()
+
+        self.assertEqual(MyLicenses.provider_classes(),
+                         {'primary': [], 'fallback': [SpdxProvider, PluginProvider]})
+        lic = MyLicenses()
+        self.assertIsInstance(lic.providers['fallback'][0], SpdxProvider)
+
+    def test_lazy_imports(self):
+        # importing the cli must not import network, subprocess or pip modules
+        code = ('import sys, pylicenses.__main__; '
+                'print(sorted(m for m in ("requests", "sh", "tabulate", "pip") if m in sys.modules))')
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        out = subprocess.check_output([sys.executable, '-c', code], env=env)
+        self.assertEqual(out.decode().strip(), '[]')
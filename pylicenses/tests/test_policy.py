@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pylicenses import PyLicenses
+from pylicenses.cache import LicenseCache
+from pylicenses.policy import Policy, PolicyViolation
+
+METADATA = """Metadata-Version: 2.1
+Name: {name}
+Version: {version}
+License: {license}
+"""
+
+
+class PolicyTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.root, 'env')
+        self.site_packages = os.path.join(self.prefix, 'lib', 'python3.6', 'site-packages')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def install(self, name, version, license):
+        distinfo = os.path.join(self.site_packages, '{}-{}.dist-info'.format(name, version))
+        os.makedirs(distinfo)
+        with open(os.path.join(distinfo, 'METADATA'), 'w') as fout:
+            fout.write(METADATA.format(name=name, version=version, license=license))
+
+    def test_verdict(self):
+        policy = Policy(allow=['MIT', 'bsd-*'], deny=['GPL-*'], review=['LGPL-*'],
+                        exceptions={'Read_Line': ['GPL-3.0-only'], 'anything': '*'})
+        self.assertEqual(policy.verdict('MIT'), 'allow')
+        self.assertEqual(policy.verdict('BSD-3-Clause'), 'allow')
+        self.assertEqual(policy.verdict('GPL-3.0-only'), 'deny')
+        self.assertEqual(policy.verdict('LGPL-2.1-only'), 'review')
+        # not listed while there is an allow list
+        self.assertEqual(policy.verdict('Apache-2.0'), 'review')
+        self.assertEqual(policy.verdict(None), 'review')
+        # a choice takes the best, a combination the worst
+        self.assertEqual(policy.verdict('MIT OR GPL-2.0-only'), 'allow')
+        self.assertEqual(policy.verdict('MIT AND (GPL-2.0-only OR LGPL-3.0-only)'), 'review')
+        self.assertEqual(policy.verdict('GPL-3.0-only WITH GCC-exception-3.1'), 'deny')
+        self.assertEqual(policy.verdict('GPL-3.0-only', name='read-line'), 'allow')
+        self.assertEqual(policy.verdict('GPL-2.0-only', name='read-line'), 'deny')
+        self.assertEqual(policy.verdict('AGPL-3.0-only', name='anything'), 'allow')
+        # a rule on the license with its exception precedes the license's
+        policy = Policy(deny=['GPL-*'], allow=['GPL-3.0-only WITH GCC-exception-3.1'])
+        self.assertEqual(policy.verdict('GPL-3.0-only WITH GCC-exception-3.1'), 'allow')
+        self.assertEqual(policy.verdict('Apache-2.0'), 'review')
+        self.assertEqual(Policy(deny=['GPL-*']).verdict('Apache-2.0'), 'allow')
+
+    def test_load(self):
+        path = os.path.join(self.root, 'policy.json')
+        with open(path, 'w') as fout:
+            json.dump({'allow': ['MIT'], 'exceptions': {'foo': '*'}, 'unknown': 'deny'}, fout)
+        policy = Policy.load(path, allow=['ISC'], deny=None, fail_fast=True)
+        self.assertEqual(policy.verdict('ISC'), 'allow')
+        self.assertEqual(policy.verdict('MIT'), 'allow')
+        self.assertEqual(policy.verdict(None), 'deny')
+        self.assertTrue(policy.fail_fast)
+        with open(path, 'w') as fout:
+            json.dump({'alow': ['MIT']}, fout)
+        with self.assertRaises(ValueError):
+            Policy.load(path)
+
+    def test_discover(self):
+        self.install('foo', '1.0', 'MIT')
+        self.install('bar', '2.0', 'GPLv3')
+        self.install('baz', '0.1', 'UNKNOWN')
+        policy = Policy(allow=['MIT'], deny=['GPL-*'])
+        cache = LicenseCache(':memory:', offline=True)
+        lic = PyLicenses(prefix=self.prefix, cache=cache, policy=policy).discover()
+        self.assertEqual([(finding['name'], finding['verdict']) for finding in policy.violations()],
+                         [('bar', 'deny')])
+        self.assertEqual(policy.findings['baz'], dict(name='baz', version='0.1', license=None, verdict='review'))
+        self.assertEqual(len(lic.packages), 3)
+
+    def test_fail_fast(self):
+        self.install('foo', '1.0', 'MIT')
+        self.install('bar', '2.0', 'GPLv3')
+        lic = PyLicenses(prefix=self.prefix, policy=Policy(deny=['GPL-*'], fail_fast=True))
+        with self.assertRaises(PolicyViolation) as cm:
+            lic.discover()
+        self.assertEqual(cm.exception.finding['name'], 'bar')
+        self.assertIn('GPL-3.0-only', str(cm.exception))
+        # no fallback provider was asked
+        self.assertIsNone(lic.scheduler)
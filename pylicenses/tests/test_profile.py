@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pylicenses import PyLicenses, profile
+from pylicenses.profile import Profiler
+from pylicenses.providers.piplocal import PipProvider
+from pylicenses.providers.spdx import SpdxProvider
+from pylicenses.records import read_text
+
+
+class ProfiledLicenses(PyLicenses):
+    PROVIDERS = {'primary': [PipProvider], 'fallback': [SpdxProvider]}
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.prefix = tempfile.mkdtemp()
+        site_packages = os.path.join(self.prefix, 'lib', 'python3.6', 'site-packages')
+        for name, license_file in (('foo', True), ('bar', False)):
+            distinfo = os.path.join(site_packages, '{}-1.0.dist-info'.format(name))
+            os.makedirs(distinfo)
+            with open(os.path.join(distinfo, 'METADATA'), 'w') as fout:
+                fout.write('Metadata-Version: 2.1\nName: {}\nVersion: 1.0\nLicense: MIT\n'.format(name))
+            if license_file:
+                with open(os.path.join(distinfo, 'LICENSE'), 'w') as fout:
+                    fout.write('foo license')
+
+    def tearDown(self):
+        shutil.rmtree(self.prefix)
+
+    def test_discover(self):
+        events = []
+        profiler = Profiler(callbacks=[events.append])
+        ProfiledLicenses(prefix=self.prefix, profiler=profiler).discover()
+        data = profiler.as_dict()
+        self.assertEqual(set(data['phases']), {'primary', 'fallback', 'normalize'})
+        self.assertEqual(data['providers']['PipProvider']['resolved'], 1)
+        self.assertEqual(data['providers']['SpdxProvider']['offered'], 1)
+        self.assertEqual(data['providers']['SpdxProvider']['resolved'], 1)
+        self.assertGreater(data['counters']['files_scanned'], 0)
+        self.assertGreater(data['counters']['bytes_read'], 0)
+        self.assertIn('provider', {event['event'] for event in events})
+        # the profiler is only active during discovery
+        self.assertIsNone(profile.active())
+
+    def test_counters(self):
+        profiler = Profiler()
+        with profiler.activate():
+            profile.count('cache_hits', 3)
+            profile.count('cache_misses')
+            profile.http('https://pypi.org/pypi/six/json', 0.25, 200)
+            profile.http('https://pypi.org/pypi/foo/json', 0.5, 404)
+        profile.count('cache_hits')
+        data = profiler.as_dict()
+        self.assertEqual(data['cache_hit_rate'], 0.75)
+        self.assertEqual(data['hosts']['pypi.org']['requests'], 2)
+        self.assertEqual(data['hosts']['pypi.org']['max'], 0.5)
+        self.assertEqual(data['hosts']['pypi.org']['status'], {'200': 1, '404': 1})
+        # bytes, not characters
+        path = os.path.join(self.prefix, 'NOTICE')
+        with open(path, 'w', encoding='utf8') as fout:
+            fout.write('\u00a9 Jos\u00e9')
+        with profiler.activate():
+            read_text(path)
+        self.assertEqual(profiler.counters['bytes_read'], 8)
+        merged = Profiler()
+        merged.merge(data)
+        merged.merge(data)
+        self.assertEqual(merged.as_dict()['hosts']['pypi.org']['requests'], 4)
+        self.assertEqual(merged.as_dict()['counters']['cache_hits'], 6)
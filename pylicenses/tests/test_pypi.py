@@ -0,0 +1,163 @@
+import base64
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from pylicenses.providers import PackageProvider, COST_NETWORK
+from pylicenses.providers.pypi import PyPiProvider, GithubRateLimiter
+from pylicenses.records import PackageRecord
+from pylicenses.scheduler import ProviderScheduler
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    """
+    serve pypi /pypi/<pkg>/json and github /licenses/<name>, /repos/<ref>/license locally
+
+    Packages named mit-* are MIT licensed, mit-github-* have a github repository.
+    """
+    hits = Counter()
+    latency = 0.2
+    # requests being served, and the max at any time
+    inflight = 0
+    max_inflight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = FakeUpstreamHandler
+        with cls.lock:
+            cls.hits[self.path] += 1
+            cls.inflight += 1
+            cls.max_inflight = max(cls.max_inflight, cls.inflight)
+        try:
+            time.sleep(self.latency)
+            self.respond()
+        finally:
+            with cls.lock:
+                cls.inflight -= 1
+
+    def respond(self):
+        if self.path.startswith('/pypi/'):
+            pkg = self.path.split('/')[2]
+            body = {'info': {'author': 'someone', 'license': 'Artistic-2.0', 'home_page': 'https://example.com/' + pkg}}
+            if pkg.startswith('mit-'):
+                host = 'github.com/owner' if pkg.startswith('mit-github-') else 'example.com'
+                body['info'].update(license='MIT', home_page='https://{}/{}'.format(host, pkg))
+        elif self.path.startswith('/repos/'):
+            content = base64.b64encode(b'Copyright (c) 2020 owner\n\nPermission is hereby granted')
+            body = {'license': {'name': 'MIT License', 'spdx_id': 'MIT'}, 'content': content.decode('ascii')}
+        elif self.path.startswith('/licenses/'):
+            body = {'body': 'Artistic License text', 'html_url': 'http://choosealicense.com/licenses/artistic-2.0/'}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        content = json.dumps(body).encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('X-RateLimit-Remaining', '100')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class SlowProvider(PackageProvider):
+    """
+    a network provider resolving every package after a delay
+    """
+    cost = COST_NETWORK
+
+    def get_packages_info(self, packages):
+        time.sleep(1)
+        return {pkg: {'license_source': '/slow/' + pkg} for pkg in packages}
+
+
+class PyPiProviderTests(TestCase):
+    def setUp(self):
+        FakeUpstreamHandler.hits = Counter()
+        FakeUpstreamHandler.inflight = FakeUpstreamHandler.max_inflight = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeUpstreamHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def provider(self, **kwargs):
+        prov = PyPiProvider(**kwargs)
+        prov.PYPI_URL = prov.GITHUB_API_URL = self.url
+        return prov
+
+    def test_concurrent_resolution(self):
+        packages = {'pkg{}'.format(i): {'name': 'pkg{}'.format(i)} for i in range(8)}
+        prov = self.provider(concurrency=8)
+        infos = prov.get_packages_info(packages)
+        self.assertEqual(set(infos), set(packages))
+        for info in infos.values():
+            self.assertEqual(info['license_text'], 'Artistic License text')
+        # the records of the packages are left to the caller to update
+        self.assertEqual(packages['pkg0'], {'name': 'pkg0'})
+        # the lookups overlapped
+        self.assertGreater(FakeUpstreamHandler.max_inflight, 1)
+        # the license is queried only once, despite 8 packages in flight
+        self.assertEqual(FakeUpstreamHandler.hits['/licenses/artistic-2.0'], 1)
+        # sequential lookups never overlap
+        FakeUpstreamHandler.max_inflight = 0
+        self.provider(concurrency=1).get_packages_info({'pkg0': {'name': 'pkg0'}, 'pkg1': {'name': 'pkg1'}})
+        self.assertEqual(FakeUpstreamHandler.max_inflight, 1)
+
+    def test_declared_order(self):
+        # pypi answers first, but the slow provider is declared first and wins
+        missing = {'mit-github-foo': PackageRecord(name='mit-github-foo')}
+        record = missing['mit-github-foo']
+        ProviderScheduler([SlowProvider(), self.provider()]).run(missing)
+        self.assertEqual(missing, {})
+        self.assertEqual(FakeUpstreamHandler.hits['/pypi/mit-github-foo/json'], 1)
+        self.assertEqual(record['license_source'], '/slow/mit-github-foo')
+        self.assertNotIn('license_trace', record)
+        self.assertNotIn('author', record)
+
+    def test_github_license_from_corpus(self):
+        prov = self.provider()
+        license = prov.get_github_license('MIT License', '')
+        self.assertEqual(license['license_spdx_id'], 'MIT')
+        self.assertIn('Permission is hereby granted', license['license_text'])
+        self.assertNotIn('license_trace', license)
+        self.assertEqual(sum(FakeUpstreamHandler.hits.values()), 0)
+
+    def test_repository_license_before_corpus(self):
+        prov = self.provider()
+        infos = prov.get_packages_info({'mit-github-foo': {'name': 'mit-github-foo'},
+                                        'mit-bar': {'name': 'mit-bar'}})
+        # the repository's license includes its copyright notice
+        info = infos['mit-github-foo']
+        self.assertEqual(info['license_trace'], 'github-repository-license')
+        self.assertIn(b'Copyright (c) 2020 owner', info['license_text'])
+        # without a repository license the text is taken from the corpus
+        info = infos['mit-bar']
+        self.assertEqual(info['license_trace'], 'pypi')
+        self.assertEqual(info['license_spdx_id'], 'MIT')
+        self.assertIn('<copyright holders>', info['license_text'])
+
+    def test_rate_limiter(self):
+        limiter = GithubRateLimiter()
+        limiter.update({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 0.2)})
+        start = time.time()
+        self.assertTrue(limiter.wait())
+        self.assertGreaterEqual(time.time() - start, 0.15)
+        # other callers are not blocked while one waits for the reset
+        limiter.update({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 0.5)})
+        waiting = threading.Thread(target=limiter.wait)
+        waiting.start()
+        time.sleep(0.1)
+        self.assertTrue(limiter._lock.acquire(timeout=0.2))
+        limiter._lock.release()
+        waiting.join()
+        # reset too far in the future, do not wait
+        limiter.update({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 3600)})
+        self.assertFalse(limiter.wait())
@@ -0,0 +1,79 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+
+from pylicenses.records import PackageRecord, PackageStore, intern_text, MAX_INTERNED_TEXTS
+
+
+class PackageRecordTests(TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.license_file = os.path.join(self.tmpdir.name, 'LICENSE')
+        with open(self.license_file, 'w') as fout:
+            fout.write('MIT License')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_lazy_license_text(self):
+        record = PackageRecord(name='six', license_source=self.license_file, summary='py2/3')
+        self.assertFalse(record.is_text_loaded)
+        self.assertIn('license_text', record)
+        self.assertEqual(record['summary'], 'py2/3')
+        self.assertEqual(record['license_text'], 'MIT License')
+        self.assertTrue(record.is_text_loaded)
+        # texts are interned
+        other = PackageRecord(name='idna', license_source=self.license_file)
+        self.assertIs(other['license_text'], record['license_text'])
+        # a new source resets the text
+        record['license_source'] = 'https://pypi.org/pypi/six/json'
+        self.assertNotIn('license_text', record)
+        self.assertIsNone(record.get('license_text'))
+
+    def test_local_source_is_checked_once(self):
+        record = PackageRecord(name='six', license_source=self.license_file)
+        with mock.patch('os.path.isfile', return_value=True) as isfile:
+            for _ in range(3):
+                self.assertIn('license_text', record)
+                self.assertEqual(len(record), 3)
+        self.assertEqual(isfile.call_count, 1)
+        # a new or removed source is checked again
+        record['license_source'] = os.path.join(self.tmpdir.name, 'COPYING')
+        self.assertNotIn('license_text', record)
+        record['license_source'] = self.license_file
+        self.assertIn('license_text', record)
+        del record['license_source']
+        self.assertNotIn('license_text', record)
+
+    def test_intern_text_is_bounded(self):
+        text = intern_text('first {}'.format('text'))
+        self.assertIs(intern_text('first {}'.format('text')), text)
+        for i in range(MAX_INTERNED_TEXTS):
+            intern_text('text {}'.format(i))
+        # the least recently used text was released
+        self.assertIsNot(intern_text('first {}'.format('text')), text)
+
+    def test_update_copies_unloaded_text_lazily(self):
+        license = PackageRecord(name='six', license_source=self.license_file)
+        record = PackageRecord(name='six', version='1.12.0')
+        record.update(license)
+        self.assertFalse(license.is_text_loaded)
+        self.assertFalse(record.is_text_loaded)
+        # a plain dict loads the text on update
+        data = {'name': 'six'}
+        data.update(license)
+        self.assertEqual(data['license_text'], 'MIT License')
+
+    def test_store_aliases(self):
+        packages = PackageStore()
+        packages['six'].update(name='six', version='1.12.0')
+        packages['six-1.12.0'] = packages['six']
+        packages.update({'zlib-1.2.11-0': {'name': 'zlib', 'license': 'zlib'}})
+        self.assertEqual(list(packages), ['six', 'zlib'])
+        self.assertIs(packages['six-1.12.0'], packages['six'])
+        self.assertEqual(packages['zlib-1.2.11-0']['license'], 'zlib')
+        self.assertIsNone(packages.get('unknown'))
+        self.assertNotIn('unknown', packages)
+        self.assertEqual(packages.aliases('zlib'), ['zlib-1.2.11-0'])
+        del packages['six']
+        self.assertNotIn('six-1.12.0', packages)
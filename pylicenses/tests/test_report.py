@@ -0,0 +1,121 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import TestCase
+
+from pylicenses.graph import DependencyGraph
+from pylicenses.records import PackageRecord
+from pylicenses.report import (write_license_trail, license_text_id, write_reports, JsonLinesWriter,
+                               CsvWriter, SpdxWriter, CycloneDxWriter)
+
+MIT = 'MIT License\n\nPermission is hereby granted, free of charge,\nto any person'
+
+
+class LicenseTrailTests(TestCase):
+    packages = {
+        'six': {'name': 'six', 'version': '1.12.0', 'license': 'MIT', 'license_text': MIT},
+        'six-1.12.0': {'name': 'six'},
+        'idna': {'name': 'idna', 'license': 'MIT', 'license_text': MIT.replace('\n', '\n  ') + '\n'},
+        'pip': {'name': 'pip', 'license': 'MIT', 'license_text': MIT.encode('utf8')},
+        'zlib': {'name': 'zlib', 'license': 'zlib', 'license_text': 'zlib license'},
+    }
+
+    def test_full(self):
+        fout = StringIO()
+        write_license_trail(self.packages.items(), fout)
+        report = fout.getvalue()
+        self.assertEqual(report.count('Permission is hereby granted'), 3)
+        self.assertNotIn('Package: six-1.12.0', report)
+
+    def test_dedup(self):
+        fout = StringIO()
+        write_license_trail(self.packages.items(), fout, dedup=True)
+        report = fout.getvalue()
+        mit_id = license_text_id(MIT)
+        self.assertEqual(report.count('Permission is hereby granted'), 1)
+        self.assertEqual(report.count('Licence Text: [{}]'.format(mit_id)), 3)
+        self.assertIn('Licence-Text-Id: {}\n{}'.format(mit_id, MIT), report)
+        self.assertIn('Licence-Text-Id: {}\nzlib license'.format(license_text_id('zlib license')), report)
+        self.assertTrue(report.endswith('-- ** end of report **\n'))
+
+
+class ReportWriterTests(TestCase):
+    def setUp(self):
+        self.packages = {
+            'requests': {'name': 'requests', 'version': '2.21.0', 'license': 'Apache 2.0',
+                         'license_expression': 'Apache-2.0', 'license_text': 'apache license',
+                         'requires_dist': ['idna (>=2.5)'], 'required_by': set()},
+            'idna': {'name': 'idna', 'version': '2.8', 'license': 'BSD-like',
+                     'license_expression': 'LicenseRef-BSD-like', 'license_text': 'idna license',
+                     'build': 'py_0'},
+            'idna-2.8': {'name': 'idna'},
+        }
+        self.graph = DependencyGraph.from_packages(self.packages)
+
+    def write(self, writer_class, **kwargs):
+        fout = StringIO()
+        write_reports(self.packages.items(), [writer_class(fout, **kwargs)])
+        return fout.getvalue()
+
+    def test_jsonl(self):
+        lines = self.write(JsonLinesWriter).splitlines()
+        self.assertEqual(len(lines), 2)
+        record = json.loads(lines[0])
+        self.assertEqual(record['license_text'], 'apache license')
+        self.assertNotIn('required_by', record)
+        # a writer used as consumer gets the graph once all packages are written
+        fout = StringIO()
+        writer = JsonLinesWriter(fout)
+        writer.open()
+        writer.write('requests', self.packages['requests'])
+        writer.write('idna', self.packages['idna'])
+        writer.graph = self.graph
+        writer.close()
+        records = [json.loads(line) for line in fout.getvalue().splitlines()]
+        self.assertEqual([record.get('name') for record in records[:2]], ['requests', 'idna'])
+        self.assertEqual(records[2:], [
+            {'relationships': {'name': 'idna', 'required_by': ['requests'], 'is_primary': False}},
+            {'relationships': {'name': 'requests', 'required_by': [], 'is_primary': True}},
+        ])
+
+    def test_csv(self):
+        rows = list(csv.DictReader(StringIO(self.write(CsvWriter))))
+        self.assertEqual([row['name'] for row in rows], ['requests', 'idna'])
+        self.assertEqual(rows[1]['license_text_id'], license_text_id('idna license'))
+
+    def test_spdx(self):
+        document = json.loads(self.write(SpdxWriter, graph=self.graph))
+        self.assertEqual(document['spdxVersion'], 'SPDX-2.3')
+        self.assertEqual([p['licenseConcluded'] for p in document['packages']],
+                         ['Apache-2.0', 'LicenseRef-BSD-like'])
+        relationships = {(r['spdxElementId'], r['relationshipType'], r['relatedSpdxElement'])
+                         for r in document['relationships']}
+        self.assertIn(('SPDXRef-Package-requests', 'DEPENDS_ON', 'SPDXRef-Package-idna'), relationships)
+        self.assertIn(('SPDXRef-DOCUMENT', 'DESCRIBES', 'SPDXRef-Package-idna'), relationships)
+        self.assertEqual(document['hasExtractedLicensingInfos'],
+                         [{'licenseId': 'LicenseRef-BSD-like', 'name': 'BSD-like',
+                           'extractedText': 'idna license'}])
+        self.assertNotEqual(SpdxWriter.spdx_ref('foo_bar'), SpdxWriter.spdx_ref('foo-bar'))
+
+    def test_cyclonedx(self):
+        document = json.loads(self.write(CycloneDxWriter, graph=self.graph))
+        components = {c['name']: c for c in document['components']}
+        self.assertEqual(components['requests']['purl'], 'pkg:pypi/requests@2.21.0')
+        self.assertEqual(components['idna']['purl'], 'pkg:conda/idna@2.8?build=py_0')
+        self.assertEqual(components['idna']['licenses'], [{'expression': 'LicenseRef-BSD-like'}])
+        self.assertIn({'ref': 'requests', 'dependsOn': ['idna']}, document['dependencies'])
+        # without a graph there are no dependencies
+        self.assertNotIn('dependencies', json.loads(self.write(CycloneDxWriter)))
+
+    def test_release_texts(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, 'LICENSE')
+            with open(source, 'w') as fout:
+                fout.write('foo license')
+            record = PackageRecord(name='foo', license_source=source)
+            fout = StringIO()
+            write_reports([('foo', record)], [JsonLinesWriter(fout), CsvWriter(StringIO())])
+            self.assertEqual(json.loads(fout.getvalue())['license_text'], 'foo license')
+            self.assertFalse(record.is_text_loaded)
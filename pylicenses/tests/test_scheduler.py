@@ -0,0 +1,105 @@
+import threading
+from unittest import TestCase
+
+from pylicenses.providers import PackageProvider, COST_LOCAL, COST_NETWORK
+from pylicenses.records import PackageRecord
+from pylicenses.scheduler import ProviderScheduler
+
+
+class FakeProvider(PackageProvider):
+    def __init__(self, cost, infos, accepts=None):
+        self.cost = cost
+        self.infos = infos
+        self._accepts = accepts
+        self.calls = []
+
+    def accepts(self, pkg, data):
+        return self._accepts is None or self._accepts(pkg, data)
+
+    def get_packages_info(self, packages):
+        self.calls.append(sorted(packages))
+        return {pkg: self.infos.get(pkg, {}) for pkg in packages}
+
+
+class SlowProvider(PackageProvider):
+    """
+    a provider yielding its records one by one, each after an event is set
+    """
+    cost = COST_NETWORK
+
+    def __init__(self, infos):
+        self.infos = infos
+        self.events = {pkg: threading.Event() for pkg in infos}
+        self.yielded = []
+
+    def accepts(self, pkg, data):
+        return pkg in self.infos
+
+    def iter_packages_info(self, packages, subset=None):
+        for pkg in sorted(packages):
+            if pkg in self.infos:
+                self.events[pkg].wait(5)
+                self.yielded.append(pkg)
+                yield pkg, self.infos[pkg]
+
+
+class ProviderSchedulerTests(TestCase):
+    def test_cheapest_first(self):
+        # network provider declared first, but local providers run first
+        network = FakeProvider(COST_NETWORK, {
+            'b': {'license': 'MIT'},
+            'c': {'license_source': 'https://example.com/c'},
+        })
+        names = FakeProvider(COST_LOCAL, {'a': {'license': 'MIT'}})
+        texts = FakeProvider(COST_LOCAL, {'a': {'license_source': '/corpus/MIT'},
+                                          'b': {'license_source': '/corpus/MIT'}},
+                             accepts=lambda pkg, data: bool(data.get('license')))
+        missing = {pkg: PackageRecord(name=pkg) for pkg in 'abcd'}
+        scheduler = ProviderScheduler([network, names, texts])
+        scheduler.run(missing)
+        self.assertEqual(list(missing), ['d'])
+        # a resolved locally in two passes, network only asked for the rest once
+        self.assertEqual(network.calls, [['b', 'c', 'd']])
+        # b got its license name from the network and is offered locally again
+        self.assertEqual(names.calls, [['a', 'b', 'c', 'd'], ['b']])
+        self.assertEqual(texts.calls, [['a'], ['b']])
+
+    def test_no_network_if_resolved(self):
+        network = FakeProvider(COST_NETWORK, {})
+        local = FakeProvider(COST_LOCAL, {'a': {'license_source': '/a/LICENSE'}})
+        missing = {'a': PackageRecord(name='a')}
+        ProviderScheduler([local, network]).run(missing)
+        self.assertEqual(missing, {})
+        self.assertEqual(network.calls, [])
+
+    def test_declared_order(self):
+        # the second provider is done first, its record of a waits for the first provider
+        first = SlowProvider({'a': {'license_source': '/first/a'}})
+        second = FakeProvider(COST_NETWORK, {'a': {'license_source': '/second/a'},
+                                             'b': {'license_source': '/second/b'}})
+        resolved = []
+
+        def on_resolved(pkg, data):
+            resolved.append(pkg)
+            first.events['a'].set()
+
+        missing = {pkg: PackageRecord(name=pkg) for pkg in 'ab'}
+        records = dict(missing)
+        ProviderScheduler([first, second], on_resolved=on_resolved).run(missing)
+        self.assertEqual(resolved, ['b', 'a'])
+        self.assertEqual(records['a']['license_source'], '/first/a')
+
+    def test_stop_early(self):
+        # on_update raising on the first record stops the provider before its next record
+        slow = SlowProvider({'a': {'license': 'GPL'}, 'b': {'license': 'MIT'}})
+        slow.events['a'].set()
+
+        def on_update(pkg, data):
+            raise ValueError(pkg)
+
+        missing = {pkg: PackageRecord(name=pkg) for pkg in 'ab'}
+        with self.assertRaises(ValueError) as cm:
+            ProviderScheduler([slow], on_update=on_update).run(missing)
+        self.assertEqual(str(cm.exception), 'a')
+        slow.events['b'].set()
+        self.assertEqual(slow.yielded, ['a'])
@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+from pylicenses.providers.spdx import SpdxProvider
+from pylicenses.records import PackageRecord
+from pylicenses.spdx import get_corpus, get_matcher
+
+
+class SpdxCorpusTests(TestCase):
+    def test_resolve(self):
+        corpus = get_corpus()
+        self.assertEqual(corpus.resolve('mit'), 'MIT')
+        self.assertEqual(corpus.resolve('GPL-3.0-or-later'), 'GPL-3.0')
+        self.assertEqual(corpus.lookup('BSD 3'), 'BSD-3-Clause')
+        self.assertEqual(corpus.lookup('Apache 2.0'), 'Apache-2.0')
+        self.assertIsNone(corpus.lookup('Proprietary'))
+
+    def test_match(self):
+        corpus = get_corpus()
+        matcher = get_matcher()
+        bsd3 = corpus.text('BSD-3-Clause').replace('<year>, <copyright holder>', '2018, Patrick Senti')
+        self.assertEqual(matcher.match(bsd3)[0], 'BSD-3-Clause')
+        # reflowed text with a different copyright still matches
+        mit = 'Copyright 2019 Kenneth Reitz\n\n' + ' '.join(corpus.text('MIT').split()[6:])
+        self.assertEqual(matcher.match(mit)[0], 'MIT')
+        self.assertEqual(matcher.match(corpus.text('BSD-2-Clause'))[0], 'BSD-2-Clause')
+        self.assertEqual(matcher.match('all rights reserved, do not copy'), (None, 0.0))
+
+    def test_provider(self):
+        packages = {
+            'six': PackageRecord(name='six', license='MIT'),
+            'xz': PackageRecord(name='xz', license='Public-Domain'),
+        }
+        infos = SpdxProvider().get_packages_info(packages)
+        packages['six'].update(infos['six'])
+        self.assertEqual(packages['six']['license_spdx_id'], 'MIT')
+        self.assertIn('Permission is hereby granted', packages['six']['license_text'])
+        self.assertEqual(infos['xz'], {})
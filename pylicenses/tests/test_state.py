@@ -0,0 +1,79 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from pylicenses import PyLicenses
+from pylicenses.providers import PackageProvider, normalize_subset, in_subset
+from pylicenses.state import file_fingerprint
+
+
+class DirectoryProvider(PackageProvider):
+    """
+    packages are files in a directory, the license text is the file content
+    """
+    root = None
+    calls = []
+
+    def get_fingerprints(self):
+        return {entry.path: (file_fingerprint(entry.path), entry.name)
+                for entry in os.scandir(self.root)}
+
+    def get_packages_info(self, packages, subset=None):
+        subset = normalize_subset(subset)
+        self.calls.append(subset)
+        for entry in os.scandir(self.root):
+            if not in_subset(entry.name, subset):
+                continue
+            with open(entry.path) as fin:
+                packages[entry.name].update(name=entry.name, license_text=fin.read())
+        return packages
+
+
+class DirectoryLicenses(PyLicenses):
+    PROVIDERS = {
+        'primary': [DirectoryProvider],
+        'fallback': [],
+    }
+
+
+class IncrementalDiscoverTests(TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.root = DirectoryProvider.root = os.path.join(self.tmpdir.name, 'env')
+        self.state = os.path.join(self.tmpdir.name, 'state.json')
+        os.makedirs(self.root)
+        for name in ('six', 'requests', 'tornado'):
+            self.write(name, 'license of ' + name)
+        DirectoryProvider.calls = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        with open(os.path.join(self.root, name), 'w') as fout:
+            fout.write(text)
+
+    def test_incremental(self):
+        lic = DirectoryLicenses().discover_incremental(self.state)
+        self.assertEqual(DirectoryProvider.calls, [None])
+        self.assertEqual(set(lic.packages), {'six', 'requests', 'tornado'})
+        # nothing changed, nothing is discovered
+        lic = DirectoryLicenses().discover_incremental(self.state)
+        self.assertEqual(len(DirectoryProvider.calls), 1)
+        self.assertEqual(lic.packages['six']['license_text'], 'license of six')
+        # one changed, one added, one removed
+        self.write('six', 'new license of six')
+        self.write('Flask', 'license of flask')
+        os.remove(os.path.join(self.root, 'tornado'))
+        lic = DirectoryLicenses().discover_incremental(self.state)
+        self.assertEqual(DirectoryProvider.calls[-1], normalize_subset({'six', 'Flask'}))
+        self.assertEqual(set(lic.packages), {'six', 'requests', 'Flask'})
+        self.assertEqual(lic.packages['six']['license_text'], 'new license of six')
+        self.assertEqual(lic.packages['requests']['license_text'], 'license of requests')
+
+    def test_in_subset(self):
+        subset = normalize_subset(['typing_extensions'])
+        self.assertTrue(in_subset('typing-extensions', subset))
+        self.assertTrue(in_subset('Typing.Extensions', subset))
+        self.assertFalse(in_subset('typing', subset))
+        self.assertTrue(in_subset('anything', None))
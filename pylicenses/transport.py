@@ -0,0 +1,164 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from pylicenses import profile
+
+
+class BudgetExceeded(Exception):
+    """
+    the run's request or time budget is used up
+    """
+    pass
+
+
+class TransportError(Exception):
+    """
+    a request failed after all retries, e.g. the host is unreachable
+    """
+    pass
+
+
+class Transport(object):
+    """
+    Shared HTTP transport of all network lookups
+
+    A single requests.Session keeps a keep-alive connection pool per host,
+    sized to the number of concurrent lookups, so that connections (and
+    their TLS handshakes) are reused. Every request has a connect and read
+    timeout. Connection errors and transient server errors (500, 502,
+    503, 504) are retried by get() with exponential backoff, honoring
+    Retry-After.
+
+    The optional budget limits the number of requests and the seconds
+    spent on the network in a run. Every attempt, including retries, is
+    counted against it, its timeouts and the backoff before it are cut to
+    the remaining time. Once the budget is used up, get() raises
+    BudgetExceeded instead of making requests, so that a run finishes in
+    predictable time.
+    """
+    #: 403 and 429 rate limits are left to the caller, see GithubRateLimiter
+    RETRY_STATUS = (500, 502, 503, 504)
+
+    def __init__(self, timeout=(5, 30), retries=3, backoff=0.5, pool_size=16,
+                 max_requests=None, max_time=None):
+        """
+
+        :param timeout: seconds, or tuple of (connect, read) seconds
+        :param retries: max number of retries of a request
+        :param backoff: backoff factor, the n-th retry waits backoff * 2 ** (n - 1)
+           seconds
+        :param pool_size: max connections kept per host, should be at least
+           the number of concurrent lookups
+        :param max_requests: max number of requests including retries, defaults to unlimited
+        :param max_time: max seconds from the first request, defaults to unlimited
+        """
+        self.timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.max_requests = max_requests
+        self.max_time = max_time
+        self.requests = 0
+        self.started = None
+        self._lock = threading.Lock()
+        self._session = None
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = self.make_session()
+            return self._session
+
+    def make_session(self):
+        # requests is only imported once the network is accessed
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        # retries are made by get(), within the budget
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def remaining(self):
+        """
+        return the seconds left of the time budget, or None if unlimited
+        """
+        if not self.max_time or self.started is None:
+            return self.max_time or None
+        return self.max_time - (time.monotonic() - self.started)
+
+    def reserve(self):
+        """
+        count a request against the budget
+
+        :return: the (connect, read) timeout, reduced to the remaining time budget
+        """
+        with self._lock:
+            self.started = self.started or time.monotonic()
+            remaining = self.remaining()
+            if (self.max_requests is not None and self.requests >= self.max_requests) or \
+                    (remaining is not None and remaining <= 0):
+                profile.count('http_budget_exceeded')
+                raise BudgetExceeded('request budget of {} requests, {} seconds used up'.format(
+                    self.max_requests, self.max_time))
+            self.requests += 1
+        if remaining is None:
+            return self.timeout
+        return tuple(min(timeout, remaining) for timeout in self.timeout)
+
+    def retry_delay(self, attempt, resp=None):
+        """
+        return the seconds to wait before retry number attempt (from 1)
+        """
+        retry_after = resp.headers.get('Retry-After') if resp is not None else None
+        if retry_after:
+            try:
+                return max(float(retry_after), 0)
+            except ValueError:
+                pass
+            try:
+                return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+            except (TypeError, ValueError):
+                pass
+        return self.backoff * 2 ** (attempt - 1)
+
+    def get(self, url, auth=None, headers=None):
+        """
+        GET url
+
+        :return: the requests.Response
+        :raises: BudgetExceeded if the budget is used up, TransportError if
+           the request failed after all retries
+        """
+        attempt = 0
+        while True:
+            timeout = self.reserve()
+            try:
+                resp = self.session.get(url, auth=auth, headers=headers, timeout=timeout)
+            except ValueError as e:
+                # e.g. an invalid url, retrying does not help
+                raise TransportError('GET {} failed: {}'.format(url, e)) from e
+            except OSError as e:
+                # requests.RequestException is an OSError
+                if attempt >= self.retries:
+                    raise TransportError('GET {} failed: {}'.format(url, e)) from e
+                resp = None
+            else:
+                if resp.status_code not in self.RETRY_STATUS or attempt >= self.retries:
+                    return resp
+            attempt += 1
+            profile.count('http_retries')
+            delay = self.retry_delay(attempt, resp)
+            remaining = self.remaining()
+            # the next reserve() raises BudgetExceeded if the wait used up the budget
+            time.sleep(max(min(delay, remaining), 0) if remaining is not None else delay)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
@@ -10,8 +10,11 @@ os.chdir(os.path.normpath(os.path.join(os.path.abspath(__file__), os.pardir)))
 setup(
     name='pylicenses',
     version=version,
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     include_package_data=True,
+    package_data={
+        'pylicenses.spdx': ['licenses/*.txt'],
+    },
     license='MIT',
     description='License scanning and documentation for conda and pip envs',
     long_description=README,
@@ -29,5 +32,10 @@ setup(
         'sh==1.12.14',
         'requests==2.21.0',
         'tabulate==0.8.2',
+        'packaging',
     ],
+    extras_require={
+        # .conda package archives are zstd compressed
+        'conda': ['zstandard'],
+    },
 )